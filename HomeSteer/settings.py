@@ -83,10 +83,13 @@ SOCIALACCOUNT_PROVIDERS =  { 'facebook':
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'utils.middleware.QueryProfileMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'utils.middleware.ReplicaMiddleware',
+    'accounts.middleware.MemberContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -104,6 +107,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'accounts.context_processors.member_context',
             ],
         },
     },
@@ -142,6 +146,31 @@ DATABASES = {
     }
 }
 
+# ------------- Read Replica -------------
+# The chart, analytics, search and export views read from the 'replica'
+# alias when there is one (see utils.routers). REPLICA_STICKY_SECONDS is
+# the lag the replica may have: a user who wrote something reads from the
+# primary for that long. The pins are kept in the cache, share it between
+# the worker processes like the charts (see Cache below).
+# Locally two SQLite files will do, e.g.
+#   DATABASES = {
+#       'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3'},
+#       'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'replica.sqlite3',
+#                   'TEST': {'MIRROR': 'default'}},
+#   }
+# with `manage.py sync_replica` standing in for the replication.
+REPLICA_DB_HOST = config('REPLICA_DB_HOST', default='')
+if REPLICA_DB_HOST:
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        HOST        = REPLICA_DB_HOST,
+        USER        = config('REPLICA_DB_USER', default=DATABASES['default']['USER']),
+        PASSWORD    = config('REPLICA_DB_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        TEST        = {'MIRROR': 'default'},
+    )
+DATABASE_ROUTERS        = ['utils.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS  = config('REPLICA_STICKY_SECONDS', default=15, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -207,3 +236,28 @@ COOL_PAGINATOR_NEXT_NAME        = "next"
 COOL_PAGINATOR_PREVIOUS_NAME    = "previous"
 COOL_PAGINATOR_SIZE             = "SMALL"
 COOL_PAGINATOR_ELASTIC          = "300px"
+
+# ------------- Suspicious Activity -------------
+# Above 1, forbidden attempts are buffered in memory and written in batches:
+# when the buffer is full, or after the first request finishing at least
+# SUSPICIOUS_FLUSH_INTERVAL seconds after the last write
+SUSPICIOUS_BUFFER_SIZE          = config('SUSPICIOUS_BUFFER_SIZE', default=0, cast=int)
+SUSPICIOUS_FLUSH_INTERVAL       = config('SUSPICIOUS_FLUSH_INTERVAL', default=30, cast=int)
+
+# ------------- Query Profiling -------------
+# Per view statement counts and timings, see utils.profiling. On in
+# development only unless asked for, it wraps every statement.
+QUERY_PROFILING                 = config('QUERY_PROFILING', default=DEBUG, cast=bool)
+
+# ------------- Cache -------------
+# Chart pages are cached per room and month. The local-memory cache is per
+# process: with several worker processes use the file based cache
+# (CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache) so a
+# data change invalidates the charts of every worker.
+CACHES = {
+    'default': {
+        'BACKEND'   : config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION'  : config('CACHE_LOCATION', default='homesteer'),
+    }
+}
+CHART_CACHE_TIMEOUT             = config('CHART_CACHE_TIMEOUT', default=3600, cast=int)
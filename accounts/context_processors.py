@@ -0,0 +1,6 @@
+def member_context(request):
+    """
+    Makes request.member_context (see accounts.middleware) available to
+    every template as `member_context`.
+    """
+    return {'member_context': getattr(request, 'member_context', None)}
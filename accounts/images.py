@@ -0,0 +1,158 @@
+import io
+import os
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+# square thumbnails of the profile image, twice the size of the avatar
+# classes of style.css for high density screens
+PROFILE_IMAGE_SIZES = {
+    'md'    : 64,
+    'xl'    : 180,
+    'card'  : 480,
+}
+DEFAULT_IMAGE_SIZE  = 'md'
+# css class of the <img> -> thumbnail shown in it
+IMAGE_CLASS_SIZES   = {
+    'user-avatar-md'    : 'md',
+    'user-avatar-xl'    : 'xl',
+    'img-fluid'         : 'card',
+}
+THUMBNAIL_FORMATS   = (
+    ('jpg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+)
+WEBP_SUPPORTED      = features.check('webp')
+# seconds an image whose variants could not be built is served as the
+# original before building them is tried again
+VARIANTS_RETRY_TIMEOUT = 60 * 5
+
+# EXIF orientation of phone photos -> transposition making them upright
+EXIF_ORIENTATION    = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+
+class ImageVariant(object):
+    def __init__(self, url, webp_url=None):
+        self.url        = url
+        self.webp_url   = webp_url
+
+
+def variant_name(name, size, extension):
+    """
+    profile/x/profile_x.jpg -> profile/x/profile_x.md.jpg, next to the original.
+    """
+    root, _ = os.path.splitext(name)
+    return '%s.%s.%s' % (root, size, extension)
+
+
+def variant_names(name):
+    return [
+        variant_name(name, size, extension)
+        for size in PROFILE_IMAGE_SIZES
+        for extension, image_format, options in THUMBNAIL_FORMATS
+        if image_format != 'WEBP' or WEBP_SUPPORTED
+    ]
+
+
+def variants_key(name):
+    return 'profile-image-variants:%s' % name
+
+
+def upright(image):
+    try:
+        orientation = (image._getexif() or {}).get(EXIF_ORIENTATION)
+    except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+        orientation = None
+    if orientation in ORIENTATION_TRANSPOSE:
+        image = image.transpose(ORIENTATION_TRANSPOSE[orientation])
+    return image
+
+
+def flatten(image):
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image       = image.convert('RGBA')
+        background  = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def build_variants(field_file):
+    """
+    Writes the thumbnails (JPEG and WebP) of every size of
+    PROFILE_IMAGE_SIZES next to the original. Raises OSError when the
+    original cannot be read as an image.
+    """
+    storage = field_file.storage
+    largest = max(PROFILE_IMAGE_SIZES.values())
+    with storage.open(field_file.name, 'rb') as source:
+        image = Image.open(source)
+        # a JPEG is decoded at the smallest scale still covering the thumbnails
+        image.draft('RGB', (largest * 2, largest * 2))
+        image.load()
+    image = flatten(upright(image))
+    for size, pixels in PROFILE_IMAGE_SIZES.items():
+        thumbnail = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+        for extension, image_format, options in THUMBNAIL_FORMATS:
+            if image_format == 'WEBP' and not WEBP_SUPPORTED:
+                continue
+            buffer  = io.BytesIO()
+            thumbnail.save(buffer, image_format, **options)
+            name    = variant_name(field_file.name, size, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def ensure_variants(field_file, rebuild=False):
+    """
+    True when the variants of the image exist, building them if needed
+    (always with `rebuild`). Success is cached for good, so the storage is
+    only asked once per image; a failure is retried after
+    VARIANTS_RETRY_TIMEOUT.
+    """
+    key     = variants_key(field_file.name)
+    built   = None if rebuild else cache.get(key)
+    if built is None:
+        built = not rebuild and all(field_file.storage.exists(name) for name in variant_names(field_file.name))
+        if not built:
+            try:
+                build_variants(field_file)
+                built = True
+            except (OSError, ValueError, Image.DecompressionBombError):
+                built = False
+        cache.set(key, built, None if built else VARIANTS_RETRY_TIMEOUT)
+    return built
+
+
+def delete_variants(field_file):
+    storage = field_file.storage
+    for name in variant_names(field_file.name):
+        if storage.exists(name):
+            storage.delete(name)
+    cache.delete(variants_key(field_file.name))
+
+
+def profile_image_variant(field_file, size=DEFAULT_IMAGE_SIZE):
+    """
+    URLs of the `size` thumbnail of a profile image and of its WebP
+    version, the original when no thumbnail can be made.
+    """
+    if size not in PROFILE_IMAGE_SIZES:
+        size = DEFAULT_IMAGE_SIZE
+    if not ensure_variants(field_file):
+        return ImageVariant(field_file.url)
+    storage = field_file.storage
+    return ImageVariant(
+        storage.url(variant_name(field_file.name, size, 'jpg')),
+        storage.url(variant_name(field_file.name, size, 'webp')) if WEBP_SUPPORTED else None
+    )
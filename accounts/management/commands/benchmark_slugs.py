@@ -0,0 +1,40 @@
+import random
+import string
+import time
+from django.core.management.base import BaseCommand
+from accounts.utils import time_ordered_id, time_ordered_ids
+
+
+def legacy_slug_suffix():
+    # the former time_str_mix_slug(), kept here for comparison
+    random_str  = ''.join(random.choice(string.ascii_lowercase + string.digits) for _ in range(4))
+    random_num  = ''.join(random.choice('1234567890') for _ in range(4))
+    return (
+        random_str + time.strftime("%m") + random_num + time.strftime("%H%M%S") +
+        time.strftime("%d") + random_num + time.strftime("%Y")
+    )
+
+
+class Command(BaseCommand):
+    help = "Compare the speed and uniqueness of slug suffix generators."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help="Suffixes per generator (default 100000).")
+
+    def handle(self, *args, **options):
+        count       = options['count']
+        generators  = (
+            ('legacy random/strftime', lambda: [legacy_slug_suffix() for _ in range(count)]),
+            ('time ordered, one by one', lambda: [time_ordered_id() for _ in range(count)]),
+            ('time ordered, batch', lambda: time_ordered_ids(count)),
+        )
+        for label, generate in generators:
+            start       = time.perf_counter()
+            suffixes    = generate()
+            elapsed     = time.perf_counter() - start
+            self.stdout.write("%-26s %8.3f us/slug  %6s duplicate(s)  %s sorted" % (
+                label,
+                elapsed * 1000000 / count,
+                count - len(set(suffixes)),
+                'is' if suffixes == sorted(suffixes) else 'not',
+            ))
@@ -0,0 +1,124 @@
+import datetime
+from django.utils.functional import SimpleLazyObject, cached_property
+from django.contrib.auth import get_user_model
+from rooms.models import ManagerialSetting
+from memberships.models import Membership, MemberRequest
+from tracker.models import Meal
+from .models import UserProfile
+from utils.models import Notification, NotificationInbox
+from utils.inbox import NOTIFICATION_PREVIEW_SIZE
+
+
+class MemberContext(object):
+    """
+    Membership, room, role flags and navbar data of the requesting user.
+    Every attribute is resolved on first use and kept for the request.
+    """
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def membership(self):
+        if not self.user.is_authenticated:
+            return None
+        membership = Membership.objects.select_related('room').filter(user=self.user).first()
+        # keep request.user.membership from querying again
+        get_user_model().membership.related.set_cached_value(self.user, membership)
+        return membership
+
+    @cached_property
+    def room(self):
+        if self.membership is None:
+            return None
+        return self.membership.room
+
+    @cached_property
+    def is_pending_member(self):
+        if not self.user.is_authenticated:
+            return False
+        return MemberRequest.objects.filter(user=self.user).exists()
+
+    @property
+    def is_member(self):
+        return self.membership is not None
+
+    @property
+    def is_creator(self):
+        return self.is_member and self.room.creator_id == self.user.pk
+
+    @property
+    def is_manager(self):
+        return self.is_member and self.membership.role == 2
+
+    @property
+    def is_supervisor(self):
+        return self.is_member and self.membership.role == 1
+
+    @property
+    def is_modifier(self):
+        return self.is_creator or self.is_manager
+
+    @property
+    def is_maintainer(self):
+        return self.is_creator or self.is_manager or self.is_supervisor
+
+    @cached_property
+    def room_setting(self):
+        if not self.is_member:
+            return False
+        return ManagerialSetting.objects.filter(room=self.room).first() or False
+
+    @cached_property
+    def meal_slug(self):
+        if not self.is_member:
+            return None
+        now = datetime.datetime.now()
+        meal = Meal.objects.filter(member=self.membership, meal_date=now.date()).only('slug').last()
+        if meal is None:
+            return None
+        return meal.slug
+
+    @cached_property
+    def profile(self):
+        if not self.user.is_authenticated:
+            return None
+        return UserProfile.objects.select_related('notification_inbox').filter(user=self.user).first()
+
+    @cached_property
+    def notification_count(self):
+        """
+        Unread notifications, read from the denormalised inbox counter.
+        """
+        try:
+            return self.profile.notification_inbox.unread
+        except (AttributeError, NotificationInbox.DoesNotExist):
+            return 0
+
+    @cached_property
+    def notifications(self):
+        """
+        The newest notifications shown in the navbar.
+        """
+        if self.profile is None:
+            return None
+        return list(Notification.objects.inbox(self.profile).select_related(
+            'sender__user__profile'
+        ).prefetch_related('sender__user__socialaccount_set')[:NOTIFICATION_PREVIEW_SIZE])
+
+
+def get_member_context(request):
+    if not hasattr(request, 'member_context'):
+        request.member_context = MemberContext(request.user)
+    return request.member_context
+
+
+class MemberContextMiddleware(object):
+    """
+    Exposes the MemberContext of the current user as request.member_context.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.member_context = SimpleLazyObject(lambda: MemberContext(request.user))
+        return self.get_response(request)
@@ -1,10 +1,12 @@
 from django.db import models
 from django.urls import reverse
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
+from django_cleanup.signals import cleanup_pre_delete
 from django.db.models import Q
 from .utils import time_str_mix_slug, upload_image_path
+from .images import ensure_variants, delete_variants
 from django.contrib.auth.models import User
 
 class UserQuerySet(models.query.QuerySet):
@@ -117,3 +119,20 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance, slug=slug_binding)
     instance.profile.save()
+
+@receiver(pre_save, sender=UserProfile)
+def mark_profile_image_upload(sender, instance, **kwargs):
+    # an uploaded file is only committed to the storage by this save
+    instance._image_uploaded = bool(instance.image) and not instance.image._committed
+
+@receiver(post_save, sender=UserProfile)
+def create_profile_image_variants(sender, instance, **kwargs):
+    if getattr(instance, '_image_uploaded', False):
+        instance._image_uploaded = False
+        ensure_variants(instance.image, rebuild=True)
+
+@receiver(cleanup_pre_delete)
+def delete_profile_image_variants(sender, file, **kwargs):
+    field = getattr(file, 'field', None)
+    if field is not None and field.model is UserProfile and field.name == 'image':
+        delete_variants(file)
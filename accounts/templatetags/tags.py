@@ -1,110 +1,114 @@
-from django import template
 import datetime
-from django.db.models import Q
-from accounts.models import UserProfile
-from rooms.models import ManagerialSetting
-from memberships.models import Membership, MemberRequest
-from tracker.models import Meal, TrackerField
-from utils.models import Notification
+from django import template
+from django.core.cache import cache
+from accounts.middleware import get_member_context as get_request_member_context
+from tracker.cache import CHART_CACHE_TIMEOUT, chart_cache_key, chart_cacheable
+from accounts.images import IMAGE_CLASS_SIZES, DEFAULT_IMAGE_SIZE, profile_image_variant
 
 register = template.Library()
 
+
+def get_member_context(context):
+    return get_request_member_context(context['request'])
+
 @register.simple_tag(takes_context=True)
 def is_pending_member_tag(context):
-    request     = context['request']
-    if MemberRequest.objects.filter(user=request.user).exists():
-        return True
-    return False
+    return get_member_context(context).is_pending_member
 
 
 @register.simple_tag(takes_context=True)
 def is_member_tag(context):
-    request     = context['request']
-    if Membership.objects.filter(user=request.user).exists():
-        return True
-    return False
+    return get_member_context(context).is_member
 
 @register.simple_tag(takes_context=True)
 def member_tag(context):
-    request     = context['request']
-    if Membership.objects.filter(user=request.user).exists():
-        return Membership.objects.filter(user=request.user).first()
-    return False
+    return get_member_context(context).membership or False
 
 @register.simple_tag(takes_context=True)
 def is_creator_tag(context):
-    request     = context['request']
-    member      = request.user.membership
-    if member.room.creator == request.user:
-        is_creator = True
-        return is_creator
-    return False
+    return get_member_context(context).is_creator
 
 @register.simple_tag(takes_context=True)
 def is_manager_tag(context):
-    request     = context['request']
-    member      = request.user.membership
-    if member.role == 2:
-        return True
-    return False
+    return get_member_context(context).is_manager
 
 @register.simple_tag(takes_context=True)
 def is_supervisor_tag(context):
-    request     = context['request']
-    member      = request.user.membership
-    if member.role == 1:
-        return True
-    return False
+    return get_member_context(context).is_supervisor
 
 @register.simple_tag(takes_context=True)
 def is_modifier_tag(context):
-    request     = context['request']
-    member      = request.user.membership
-    if member.room.creator == request.user or member.role == 2:
-        return True
-    return False
+    return get_member_context(context).is_modifier
 
 @register.simple_tag(takes_context=True)
 def is_maintainer_tag(context):
-    request     = context['request']
-    member      = request.user.membership
-    if member.room.creator == request.user or member.role == 2 or member.role == 1:
-        return True
-    return False
+    return get_member_context(context).is_maintainer
 
 @register.simple_tag(takes_context=True)
 def meal_slug_tag(context):
-    request         = context['request']
-    now             = datetime.datetime.now()
-    member          = request.user.membership
-    existed_meal_filter = Meal.objects.filter(
-                    Q(meal_date__day=now.day, meal_date__month=now.month, meal_date__year=now.year),
-                    member=member
-                    )
-    if existed_meal_filter.exists():
-        existed_meal_check = Meal.objects.filter(
-                    Q(meal_date__day=now.day, meal_date__month=now.month, meal_date__year=now.year),
-                    member=member
-                    ).last()
-        return existed_meal_check.slug
-    return None
+    return get_member_context(context).meal_slug
         
 @register.simple_tag(takes_context=True)
 def notification_tag(context):
-    request     = context['request']
-    user        = request.user
-    if UserProfile.objects.filter(user=user).exists():
-        user_instance = UserProfile.objects.get(user=user)
-        notification_receiver_filter = Notification.objects.filter(receiver=user_instance).order_by('-updated_at')
-        if notification_receiver_filter.exists():
-            return notification_receiver_filter
-    return None
+    return get_member_context(context).notifications
+
+@register.simple_tag(takes_context=True)
+def notification_count_tag(context):
+    return get_member_context(context).notification_count
 
 @register.simple_tag(takes_context=True)
 def room_setting_tag(context):
-    request     = context['request']
-    member      = request.user.membership
-    room_setting_filter = ManagerialSetting.objects.filter(room=member.room)
-    if room_setting_filter.exists():
-        return room_setting_filter.first()
-    return False
\ No newline at end of file
+    return get_member_context(context).room_setting
+
+@register.simple_tag
+def profile_image(profile, css_class=''):
+    """
+    Thumbnail of a profile image fitting its avatar class, eg.
+
+        {% profile_image instance.profile 'user-avatar-xl' as avatar %}
+
+    gives avatar.url (JPEG) and avatar.webp_url (None without WebP).
+    """
+    size = DEFAULT_IMAGE_SIZE
+    for css in str(css_class).split():
+        size = IMAGE_CLASS_SIZES.get(css, size)
+    return profile_image_variant(profile.image, size)
+
+
+class RoomCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, vary_on):
+        self.nodelist       = nodelist
+        self.fragment_name  = fragment_name
+        self.vary_on        = vary_on
+
+    def render(self, context):
+        room = get_member_context(context).room
+        if room is None:
+            return self.nodelist.render(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        today   = datetime.date.today()
+        key     = chart_cache_key('fragment-' + self.fragment_name, room.pk, today, *vary_on)
+        value   = cache.get(key)
+        if value is None:
+            value = self.nodelist.render(context)
+            if chart_cacheable(room.pk, today):
+                cache.set(key, value, CHART_CACHE_TIMEOUT)
+        return value
+
+@register.tag('room_cache')
+def do_room_cache(parser, token):
+    """
+    Caches the enclosed fragment for the room of the user until its data
+    for the month changes (see tracker.cache), eg.
+
+        {% room_cache 'meal-chart' time|date:"Ymd" %} ... {% endroom_cache %}
+
+    Extra arguments vary the fragment. Nothing specific to the requesting
+    user may be rendered inside unless it is one of them.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError("'%s' tag requires a fragment name." % bits[0])
+    nodelist = parser.parse(('endroom_cache',))
+    parser.delete_first_token()
+    return RoomCacheNode(nodelist, bits[1].strip('\'"'), [parser.compile_filter(bit) for bit in bits[2:]])
@@ -1,6 +1,8 @@
+import datetime
 import os
 import random
 import string
+import threading
 import time
 from django.utils.text import slugify
 
@@ -33,18 +35,69 @@ def random_string_generator(size=4, chars=string.ascii_lowercase + string.digits
 def random_number_generator(size=4, chars='1234567890'):
     return ''.join(random.choice(chars) for _ in range(size))
 
+# Crockford's base32, lower case so ids can be used in slugs as they are
+ID_ALPHABET     = '0123456789abcdefghjkmnpqrstvwxyz'
+ID_LENGTH       = 26
+_id_random      = random.SystemRandom()
+_id_lock        = threading.Lock()
+_id_last        = [0, 0, None]
+
+def _encode_id(value):
+    chars = []
+    for _ in range(ID_LENGTH):
+        value, index = divmod(value, 32)
+        chars.append(ID_ALPHABET[index])
+    return ''.join(reversed(chars))
+
+def time_ordered_ids(count):
+    """
+    Returns `count` unique identifiers in increasing order, eg. for the
+    slugs of a bulk_create.
+
+    An identifier is a 48 bit millisecond timestamp followed by 80 random
+    bits (the ULID layout) written in 26 base32 characters. Within the
+    same millisecond the random part of the process is incremented, so
+    identifiers never repeat and sort by creation time. Across processes
+    a clash would need the same millisecond and the same 80 random bits,
+    hence no database lookup is needed before using one.
+    """
+    ids = []
+    with _id_lock:
+        last_time, last_random, pid = _id_last
+        if pid != os.getpid():
+            # a forked worker must not continue the sequence of its parent
+            last_time = 0
+        for _ in range(count):
+            now = int(time.time() * 1000)
+            if now > last_time:
+                last_time, last_random = now, _id_random.getrandbits(80)
+            else:
+                last_random += 1
+                if last_random >> 80:
+                    # random part exhausted, borrow the next millisecond
+                    last_time, last_random = last_time + 1, _id_random.getrandbits(79)
+            ids.append(_encode_id(last_time << 80 | last_random))
+        _id_last[:] = [last_time, last_random, os.getpid()]
+    return ids
+
+def time_ordered_id():
+    return time_ordered_ids(1)[0]
+
+def time_ordered_id_time(identifier):
+    """
+    Creation time (seconds since the epoch) of a time_ordered_ids() value.
+    """
+    value = 0
+    for char in identifier:
+        value = value * 32 + ID_ALPHABET.index(char)
+    return (value >> 80) / 1000
+
 def time_str_mix_slug():
-    timestamp_m     = time.strftime("%Y")
-    timestamp_d     = time.strftime("%m")
-    timestamp_y     = time.strftime("%d")
-    timestamp_now   = time.strftime("%H%M%S")
-    random_str      = random_string_generator()
-    random_num      = random_number_generator()
-    bindings        = (
-        random_str + timestamp_d + random_num + timestamp_now +
-         timestamp_y + random_num + timestamp_m
-    )
-    return bindings
+    """
+    Unique suffix for slugs, see time_ordered_ids().
+    """
+    return time_ordered_id()
+
 # print(random_string_generator())
 
 # print(random_string_generator(size=50))
@@ -53,18 +106,43 @@ def unique_slug_generator(instance, new_slug=None):
     """
     This is for a Django project and it assumes your instance 
     has a model with a slug field and a title character (char) field.
+    The time ordered suffix keeps the slug unique without querying.
     """
     if new_slug is not None:
-        slug = new_slug
-    else:
-        slug = slugify(instance.title)
-
-    Klass = instance.__class__
-    qs_exists = Klass.objects.filter(slug=slug).exists()
-    if qs_exists:
-        new_slug = "{slug}-{randstr}".format(
-                    slug=slug,
-                    randstr=random_string_generator(size=4)
-                )
-        return unique_slug_generator(instance, new_slug=new_slug)
-    return slug
\ No newline at end of file
+        return new_slug
+    return "{slug}-{suffix}".format(slug=slugify(instance.title), suffix=time_ordered_id())
+
+def month_bounds(date):
+    """
+    Returns the first day of the month of `date` and the first day of the
+    following month.
+    """
+    start   = datetime.date(date.year, date.month, 1)
+    end     = (start + datetime.timedelta(days=32)).replace(day=1)
+    return start, end
+
+def month_range(field, date, until=None):
+    """
+    Filter kwargs matching the month of `date` on a date or datetime field,
+    eg. Meal.objects.filter(**month_range('meal_date', now)).
+
+    A half-open range on the column itself can use an index, unlike the
+    __month/__year lookups which wrap the column in EXTRACT(). With
+    `until` the range stops at that day (inclusive).
+    """
+    start, end = month_bounds(date)
+    if until is not None:
+        end = min(end, day_bounds(until)[1])
+    return {field + '__gte': start, field + '__lt': end}
+
+def day_bounds(date):
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    return date, date + datetime.timedelta(days=1)
+
+def day_range(field, date):
+    """
+    Filter kwargs matching the day of `date`, see month_range().
+    """
+    start, end = day_bounds(date)
+    return {field + '__gte': start, field + '__lt': end}
@@ -1,15 +1,14 @@
 from django.shortcuts import render
-from django.http import HttpResponseRedirect, Http404
+from django.http import Http404
 from django.views.generic import DetailView, UpdateView, ListView
 from .models import UserProfile
-from suspicious.models import Suspicious
+from memberships.mixins import MemberPassesTestMixin
 from .forms import UserProfileUpdateForm
 from django import forms
 from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
-import datetime
 
 @method_decorator(login_required, name='dispatch')
 class UserProfileView(DetailView):
@@ -20,43 +19,27 @@ class UserProfileView(DetailView):
         return UserProfile.objects.get(slug=self.kwargs['slug'])
 
 @method_decorator(login_required, name='dispatch')
-class UserProfileUpdateView(UpdateView):
-    template_name   = 'profile/update.html'
-    form_class      = UserProfileUpdateForm
+class UserProfileUpdateView(MemberPassesTestMixin, UpdateView):
+    template_name        = 'profile/update.html'
+    form_class           = UserProfileUpdateForm
+    membership_required  = False
 
     def get_object(self):
         return UserProfile.objects.get(slug=self.kwargs['slug'])
         
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(UserProfileUpdateView, self).user_passes_test(request):
             self.object = self.get_object()
-            return self.object.user == request.user
+            return self.object.user_id == request.user.pk
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(UserProfileUpdateView, self).dispatch(request, *args, **kwargs)
-
     def get_success_url(self):
         slug = self.kwargs['slug']
         messages.add_message(self.request, messages.SUCCESS, 
         "Your profile has been updated successfully !")
         return reverse('profile', kwargs={'slug': slug})
 
+
 class UserPublicProfileView(DetailView):
     queryset        = UserProfile.objects.all()
     template_name   = 'profile/public.html'
@@ -102,4 +85,4 @@ class UserListView(ListView):
         user_counter    = users.count()
         context["total_users"] = user_counter
         return context
-    
\ No newline at end of file
+    
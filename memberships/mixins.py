@@ -0,0 +1,51 @@
+from django.contrib import messages
+from django.http import HttpResponseRedirect
+from django.urls import reverse
+from accounts.middleware import get_member_context
+from suspicious.utils import record_suspicious_attempt
+
+
+class MemberPassesTestMixin(object):
+    """
+    Role based access for class based views.
+
+    The membership of request.user is resolved once per request with its
+    room (see accounts.middleware). When user_passes_test() fails the
+    attempt is recorded as suspicious and the user is sent home.
+
+    allowed_roles       -- Membership roles let in, None lets any member in
+    allow_room_creator  -- let the room creator in whatever the role is
+    membership_required -- False skips the membership and role check
+    """
+    allowed_roles       = None
+    allow_room_creator  = False
+    membership_required = True
+    permission_denied_message = "You are not allowed. Your account is being tracked for suspicious activity !"
+
+    def get_membership(self):
+        return get_member_context(self.request).membership
+
+    def has_role(self):
+        member_context = get_member_context(self.request)
+        if not member_context.is_member:
+            return False
+        if self.allowed_roles is None or member_context.membership.role in self.allowed_roles:
+            return True
+        return self.allow_room_creator and member_context.is_creator
+
+    def user_passes_test(self, request):
+        if not request.user.is_authenticated:
+            return False
+        if self.membership_required:
+            return self.has_role()
+        return True
+
+    def handle_no_permission(self):
+        record_suspicious_attempt(self.request.user)
+        messages.add_message(self.request, messages.ERROR, self.permission_denied_message)
+        return HttpResponseRedirect(reverse('home'))
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.user_passes_test(request):
+            return self.handle_no_permission()
+        return super(MemberPassesTestMixin, self).dispatch(request, *args, **kwargs)
@@ -1,7 +1,8 @@
 from django.shortcuts import render
 from .models import MemberRequest, Membership
 from accounts.models import UserProfile
-from tracker.models import TrackerField, MemberTrack
+from tracker.cache import bump_room_cache
+from tracker.models import TrackerField, MemberTrack, ledger_receivers_paused
 from utils.models import Notification
 from rooms.models import Room
 from django.http import Http404, HttpResponseRedirect
@@ -12,15 +13,16 @@ from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.views.generic import UpdateView
 from .forms import MemberUpdateForm
-from suspicious.models import Suspicious
-import datetime
+from .mixins import MemberPassesTestMixin
+from django.db import transaction
 from django.db.models import Q
 from django import forms
 
 @method_decorator(login_required, name='dispatch')
-class MemberUpdateView(UpdateView):
-    template_name = 'membership/update.html'
-    form_class      = MemberUpdateForm
+class MemberUpdateView(MemberPassesTestMixin, UpdateView):
+    template_name  = 'membership/update.html'
+    form_class     = MemberUpdateForm
+    allowed_roles  = (Membership.MANAGER,)
 
     def get_object(self):
         slug = self.kwargs['slug']
@@ -61,30 +63,11 @@ class MemberUpdateView(UpdateView):
         return super().form_valid(form)
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(MemberUpdateView, self).user_passes_test(request):
             self.object = self.get_object()
-            if self.object.room == request.user.membership.room:
-                if request.user.membership.role == 2 :
-                    return True
+            return self.object.room_id == self.get_membership().room_id
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(MemberUpdateView, self).dispatch(request, *args, **kwargs)
 
 @login_required
 def member_request_create(request, slug):
@@ -110,26 +93,11 @@ def member_request_create(request, slug):
             slug_binding    = user_instance.username.lower()+'-'+time_str_mix_slug()
             MemberRequest.objects.get_or_create(user=user_instance, room=room_instance, slug=slug_binding)
             # ----------- Notification Starts -----------
-            notify_type = "join_room"
-            if UserProfile.objects.filter(user=user_instance).exists():
-                notify_user_instance = UserProfile.objects.get(user=user_instance)
-                notify_slug = notify_user_instance.user.username.lower()+'-'+time_str_mix_slug()
-                notification_filter = Notification.objects.filter(sender=notify_user_instance,receiver=notify_user_instance, notify_type__iexact="join_room")
-                if notification_filter.exists():
-                    counter = notification_filter.first().counter + 1
-                    notification_filter.update(
-                        counter = counter,
-                        updated_at = datetime.datetime.now()
-                    )
-                else:
-                    Notification.objects.create(
-                        sender=notify_user_instance,
-                        receiver=notify_user_instance,
-                        slug=notify_slug,
-                        notify_type=notify_type,
-                        room_identifier=slug,
-                        counter=1
-                    )
+            notify_user_instance = UserProfile.objects.select_related('user').filter(user=user_instance).first()
+            if notify_user_instance is not None:
+                Notification.objects.notify(
+                    notify_user_instance, notify_user_instance, "join_room", room_identifier=slug
+                )
             # ----------- Notification Ends -----------
             messages.add_message(request, messages.SUCCESS,
             "Your request sent successfully !")
@@ -153,35 +121,28 @@ def member_request_confirm(request, slug):
                 url = reverse('rooms:room_detail', kwargs={'slug': room_instance.slug})
             else:
                 slug_binding    = user_instance.username.lower()+'-'+time_str_mix_slug()
-                Membership.objects.get_or_create(user=user_instance, room=room_instance, slug=slug_binding)
-                membership_check = Membership.objects.filter(user=user_instance)
-                if membership_check.exists():
-                    url = reverse('rooms:room_detail', kwargs={'slug': room_instance.slug})
-                    created_filter  = MemberRequest.objects.filter(user=user_instance)
-                    if created_filter.exists():
-                        created_filter.delete()
-                    tracker_filter = TrackerField.objects.filter(room=room_instance)
-                    if tracker_filter.exists():
-                        member_track_filter = MemberTrack.objects.filter(member__user=user_instance)
-                        if not member_track_filter.exists():
-                            for field in tracker_filter:
-                                MemberTrack.objects.create(
-                                    member=membership_check.first(),
-                                    tracker_field=field,
-                                    cost=0.00
-                                )
-                    # ----------- Notification Deletion Starts -----------
-                    notify_type = "join_room"
-                    notify_user = member_instance.user
-                    if UserProfile.objects.filter(user=notify_user).exists():
-                        notify_user_instance = UserProfile.objects.get(user=notify_user)
-                        notification_filter = Notification.objects.filter(receiver=notify_user_instance, notify_type__iexact="join_room")
-                        if notification_filter.exists():
-                            notification_filter.delete()
-                    # ----------- Notification Deletion Ends -----------
-                    messages.add_message(request, messages.SUCCESS,
-                    "\'%s\' is now member of your room !" %user_instance.username)
-                    return HttpResponseRedirect(url)
+                with transaction.atomic():
+                    membership, _ = Membership.objects.get_or_create(
+                        user=user_instance, room=room_instance, defaults={'slug': slug_binding}
+                    )
+                    MemberRequest.objects.filter(user=user_instance).delete()
+                    MemberTrack.objects.allocate(
+                        room_instance, TrackerField.objects.filter(room=room_instance).values_list('pk', flat=True),
+                        [membership], cost=0
+                    )
+                url = reverse('rooms:room_detail', kwargs={'slug': room_instance.slug})
+                # ----------- Notification Deletion Starts -----------
+                notify_type = "join_room"
+                notify_user = member_instance.user
+                if UserProfile.objects.filter(user=notify_user).exists():
+                    notify_user_instance = UserProfile.objects.get(user=notify_user)
+                    notification_filter = Notification.objects.filter(receiver=notify_user_instance, notify_type__iexact="join_room")
+                    if notification_filter.exists():
+                        notification_filter.delete()
+                # ----------- Notification Deletion Ends -----------
+                messages.add_message(request, messages.SUCCESS,
+                "\'%s\' is now member of your room !" %user_instance.username)
+                return HttpResponseRedirect(url)
     return HttpResponseRedirect(url)
 
 @login_required
@@ -216,13 +177,7 @@ def member_request_delete_all(request, slug):
             requests_filter = MemberRequest.objects.filter(room=room_instance).all()
             # Notification Delete Starts
             if requests_filter.exists():
-                for requests in requests_filter:
-                    user_filter = UserProfile.objects.filter(user=requests.user)
-                    if requests_filter.exists():
-                        for user in user_filter:
-                            deletion_filter = Notification.objects.filter(receiver=user)
-                            if requests_filter.exists():
-                                deletion_filter.delete()
+                Notification.objects.filter(receiver__user__in=requests_filter.values('user')).delete()
                 # Notification Delete Ends
                 # Requests Delete Starts
                 requests_filter.delete()
@@ -238,10 +193,15 @@ def member_delete(request, slug):
     url = reverse('home')
     if request.user.is_authenticated:
         member_filter       = Membership.objects.filter(slug=slug)
-        if member_filter.exists():
-            member_filter.delete()
+        member_instance     = member_filter.only('room').first()
+        if member_instance is not None:
+            # the ledger rows of the member go with it, no row of the
+            # member needs booking out one by one
+            with transaction.atomic(), ledger_receivers_paused():
+                member_filter.delete()
+                bump_room_cache(member_instance.room_id)
             # url             = request.META.get('HTTP_REFERER', '/')
             messages.add_message(request, messages.SUCCESS,
             "Membership removed successfully !")
             return HttpResponseRedirect(url)
-    return HttpResponseRedirect(url)
\ No newline at end of file
+    return HttpResponseRedirect(url)
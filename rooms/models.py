@@ -1,9 +1,10 @@
 from django.db import models
 from django.urls import reverse
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import Q, F, Sum, Count, Case, When
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from search.utils import query_terms
 
 class RoomQuerySet(models.query.QuerySet):
     def active(self):
@@ -17,14 +18,32 @@ class RoomQuerySet(models.query.QuerySet):
     def latest(self):
         return self.filter().order_by('-created_at')
     def search(self, query):
-        lookups = (Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(creator__username__icontains=query) |
-                Q(creator__first_name__icontains=query) |
-                Q(creator__last_name__icontains=query) |
-                Q(creator__email__icontains=query)
-                )
-        return self.filter(lookups).distinct()
+        """
+        Ranked prefix search on the room search tokens (see search.models).
+        Every term of the query has to prefix a token of the room. Tokens
+        matched in the title weigh more than creator names, which weigh
+        more than the email and description, whole word matches count
+        double.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return self.none()
+        matches     = Q()
+        term_hits   = {}
+        for index, term in enumerate(terms):
+            term_match  = Q(search_tokens__token__startswith=term)
+            matches     |= term_match
+            if len(terms) > 1:
+                term_hits['search_hits_%s' % index] = Count('search_tokens', filter=term_match)
+        rank = Sum(Case(
+            When(search_tokens__token__in=terms, then=F('search_tokens__weight') * 2),
+            default=F('search_tokens__weight'),
+            output_field=models.IntegerField()
+        ))
+        queryset = self.filter(matches).annotate(search_rank=rank, **term_hits)
+        if term_hits:
+            queryset = queryset.filter(**{name + '__gt': 0 for name in term_hits})
+        return queryset.order_by('-search_rank', '-created_at')
 
 class RoomManager(models.Manager):
     def get_queryset(self):
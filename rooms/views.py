@@ -11,12 +11,12 @@ from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django import forms
 from memberships.models import Membership, MemberRequest
-from django.http import HttpResponseRedirect
-from suspicious.models import Suspicious
+from memberships.mixins import MemberPassesTestMixin
 from tracker.models import TrackerField
 from django.core.paginator import Paginator
-import datetime
-from django.db.models import Q
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Exists, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
 
 @method_decorator(login_required, name='dispatch')
 class RoomCreateView(CreateView):
@@ -66,9 +66,10 @@ class RoomCreateView(CreateView):
 
 
 @method_decorator(login_required, name='dispatch')
-class RoomUpdateView(UpdateView):
-    template_name   = 'rooms/update.html'
-    form_class      = RoomUpdateForm
+class RoomUpdateView(MemberPassesTestMixin, UpdateView):
+    template_name        = 'rooms/update.html'
+    form_class           = RoomUpdateForm
+    membership_required  = False
 
     def get_object(self):
         slug = self.kwargs['slug']
@@ -90,29 +91,11 @@ class RoomUpdateView(UpdateView):
         return reverse('rooms:room_detail', kwargs={'slug': slug})
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(RoomUpdateView, self).user_passes_test(request):
             self.object = self.get_object()
-            return self.object.creator == request.user
+            return self.object.creator_id == request.user.pk
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(RoomUpdateView, self).dispatch(request, *args, **kwargs)
-
 
 class RoomListView(ListView):
     template_name   = 'rooms/index.html'
@@ -120,7 +103,7 @@ class RoomListView(ListView):
 
     def get_queryset(self, *args, **kwargs):
         request = self.request
-        query   = Room.objects.all().latest().active().privacy_public()
+        query   = Room.objects.all().latest().active().privacy_public().select_related('creator__profile')
         return query
 
     def get_context_data(self, **kwargs):
@@ -142,61 +125,87 @@ class RoomListView(ListView):
         context['total_members']        = count_members
         return context
 
+class CountedPaginator(Paginator):
+    """
+    Paginator of rows whose number is already known, it runs no COUNT.
+    """
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super(CountedPaginator, self).__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
 class RoomDetailView(DetailView):
-    template_name   = 'rooms/detail.html'
+    """
+    The room with its member and join request counts comes from one
+    annotated query, the members with their users and profiles from a
+    second one; the role counts and the membership of the user are taken
+    from that list.
+    """
+    template_name           = 'rooms/detail.html'
+    member_requests_per_page = 7
 
     def get_object(self, *args, **kwargs):
-        slug = self.kwargs.get('slug')
-        try:
-            instance = Room.objects.get(slug=slug, is_active=True)
-        except Room.DoesNotExist:
+        request_count = MemberRequest.objects.filter(room=OuterRef('pk')).order_by().values('room').annotate(
+            count=Count('pk')
+        ).values('count')
+        instance = Room.objects.filter(slug=self.kwargs.get('slug'), is_active=True).select_related(
+            'creator__profile'
+        ).annotate(
+            has_tracker             = Exists(TrackerField.objects.filter(room=OuterRef('pk'))),
+            member_requests_count   = Coalesce(Subquery(request_count, output_field=IntegerField()), 0),
+        ).first()
+        if instance is None:
             raise Http404("Not Found !!!")
-        except Room.MultipleObjectsReturned:
-            qs = Room.objects.filter(slug=slug, is_active=True)
-            instance = qs.first()
-        except:
-            raise Http404("Something went wrong !!!")
         return instance
 
+    def get_members(self):
+        members = list(Membership.objects.filter(room=self.object).select_related(
+            'user__profile'
+        ).prefetch_related('user__socialaccount_set'))
+        creator_cache = get_user_model().creator.related
+        for member in members:
+            # user.creator is looked up for every member card
+            creator_cache.set_cached_value(member.user, self.object if member.user_id == self.object.creator_id else None)
+            if member.user_id == self.object.creator_id:
+                Room.creator.field.set_cached_value(self.object, member.user)
+        return members
+
     def get_context_data(self, **kwargs):
         context             = super(RoomDetailView, self).get_context_data(**kwargs)
-        room_instance       = self.object.id
         room_object         = self.object
         user_instance       = self.request.user
-        member_filter       = Membership.objects.filter(room_id=room_instance)
-        if member_filter.exists():
-            context['total_members']        = member_filter.count()
-            context['members']              = member_filter
-            members = Membership.objects.all()
-            maintainers_filter = members.filter(
-                Q(role=1) | Q(role=2),
-                room_id=room_instance
-            )
-            context['maintainers_count'] = maintainers_filter.count()
-            if self.request.user.is_authenticated:
-                member_instance     = Membership.objects.filter(room_id=room_instance, user=user_instance)
-                if member_instance.exists():
-                    member_object   = Membership.objects.get(room_id=room_instance, user=user_instance)
-                    context['member_instance']      = member_object
-            cost_sector_filter = TrackerField.objects.filter(room=room_instance)
-            if cost_sector_filter.count() >= 1:
+        members             = self.get_members()
+        if members:
+            context['total_members']        = len(members)
+            context['members']              = members
+            context['maintainers_count']    = len([
+                member for member in members if member.role in (Membership.SUPERVISOR, Membership.MANAGER)
+            ])
+            if user_instance.is_authenticated:
+                for member in members:
+                    if member.user_id == user_instance.pk:
+                        context['member_instance'] = member
+            if room_object.has_tracker:
                 context['has_tracker'] = True
         if user_instance.is_authenticated:
-            request_filter = MemberRequest.objects.filter(room_id=room_instance)
-            context['member_requests_count']    = request_filter.count()
-            if request_filter.exists():
-                paginator2      = Paginator(request_filter, 7)
-                page2           = self.request.GET.get('page')
-                member_requests = paginator2.get_page(page2)
-                context['member_requests'] = member_requests
+            context['member_requests_count']    = room_object.member_requests_count
+            if room_object.member_requests_count:
+                request_filter  = MemberRequest.objects.filter(room=room_object).select_related(
+                    'user__profile'
+                ).prefetch_related('user__socialaccount_set')
+                paginator2      = CountedPaginator(
+                    request_filter, self.member_requests_per_page, room_object.member_requests_count
+                )
+                context['member_requests'] = paginator2.get_page(self.request.GET.get('page'))
             else:
                 context['member_requests'] = "No requests to join"
         return context
 
 @method_decorator(login_required, name='dispatch')
-class RoomDeleteView(DeleteView):
-    model           = Room
-    template_name   = 'rooms/delete.html'
+class RoomDeleteView(MemberPassesTestMixin, DeleteView):
+    model                = Room
+    template_name        = 'rooms/delete.html'
+    membership_required  = False
 
     def get_object(self):
         return Room.objects.get(slug=self.kwargs['slug'])
@@ -212,35 +221,18 @@ class RoomDeleteView(DeleteView):
         return reverse('rooms:room_list')
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(RoomDeleteView, self).user_passes_test(request):
             self.object = self.get_object()
-            return self.object.creator == request.user
+            return self.object.creator_id == request.user.pk
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(RoomDeleteView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class ManagerialSettingUpdateView(UpdateView):
-    template_name   = 'rooms/settings.html'
-    form_class      = ManagerialSettingForm
-    model           = ManagerialSetting
+class ManagerialSettingUpdateView(MemberPassesTestMixin, UpdateView):
+    template_name        = 'rooms/settings.html'
+    form_class           = ManagerialSettingForm
+    model                = ManagerialSetting
+    membership_required  = False
 
     def get_object(self):
         user = self.request.user
@@ -273,25 +265,7 @@ class ManagerialSettingUpdateView(UpdateView):
         return reverse('rooms:managerial_setting')
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(ManagerialSettingUpdateView, self).user_passes_test(request):
             self.object = self.get_object()
-            return self.object.room.creator == request.user
+            return self.object.room.creator_id == request.user.pk
         return False
-
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(ManagerialSettingUpdateView, self).dispatch(request, *args, **kwargs)
\ No newline at end of file
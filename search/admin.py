@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import RoomSearchToken
 
-# Register your models here.
+class RoomSearchTokenAdmin(admin.ModelAdmin):
+    list_display    = ['__str__', 'room', 'weight']
+    search_fields   = ['token']
+    class Meta:
+        model = RoomSearchToken
+
+admin.site.register(RoomSearchToken, RoomSearchTokenAdmin)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from rooms.models import Room
+from search.models import RoomSearchToken
+
+
+class Command(BaseCommand):
+    help = "Rebuild the room search tokens."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room', help="Only rebuild the room with this slug.")
+
+    def handle(self, *args, **options):
+        rooms = Room.objects.get_queryset()
+        if options['room']:
+            rooms = rooms.filter(slug=options['room'])
+            if not rooms.exists():
+                raise CommandError("No room found with slug '%s'." % options['room'])
+        tokens = RoomSearchToken.objects.rebuild(rooms=rooms)
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt: %s token(s) written." % tokens))
@@ -0,0 +1,62 @@
+# Generated by Django 2.1.3 on 2026-10-18 19:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from search.utils import tokenize, TOKEN_MAX_LENGTH
+
+
+def build_search_index(apps, schema_editor):
+    Room            = apps.get_model('rooms', 'Room')
+    RoomSearchToken = apps.get_model('search', 'RoomSearchToken')
+    written         = []
+    for room in Room.objects.select_related('creator'):
+        creator = room.creator
+        tokens  = {}
+        for text, weight in (
+            (room.title, 4), (creator.username, 2), (creator.first_name, 2),
+            (creator.last_name, 2), (creator.email, 1), (room.description, 1)
+        ):
+            for token in tokenize(text):
+                tokens[token] = max(weight, tokens.get(token, 0))
+        if creator.email:
+            email = creator.email.lower()[:TOKEN_MAX_LENGTH]
+            tokens[email] = max(1, tokens.get(email, 0))
+        written.extend(RoomSearchToken(room=room, token=token, weight=weight) for token, weight in tokens.items())
+    RoomSearchToken.objects.bulk_create(written, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('rooms', '0006_auto_20190113_0315'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomSearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=50, verbose_name='token')),
+                ('weight', models.PositiveSmallIntegerField(choices=[(1, 'Description or email'), (2, 'Creator name'), (4, 'Title')], default=1, verbose_name='weight')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='rooms.Room', verbose_name='room')),
+            ],
+            options={
+                'verbose_name': 'Room Search Token',
+                'verbose_name_plural': 'Room Search Tokens',
+                'ordering': ['room', '-weight'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='roomsearchtoken',
+            index=models.Index(fields=['token', 'room'], name='search_token_room_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='roomsearchtoken',
+            unique_together={('room', 'token')},
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
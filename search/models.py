@@ -1,3 +1,100 @@
-from django.db import models
+from django.db import models, transaction
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rooms.models import Room
+from .utils import tokenize, TOKEN_MAX_LENGTH
 
-# Create your models here.
+
+class RoomSearchTokenManager(models.Manager):
+    def document(self, room):
+        """
+        Returns {token: weight} for the searchable text of a room, keeping
+        the highest weight of a token found in several fields.
+        """
+        creator = room.creator
+        fields  = (
+            (room.title, RoomSearchToken.TITLE),
+            (creator.username, RoomSearchToken.CREATOR),
+            (creator.first_name, RoomSearchToken.CREATOR),
+            (creator.last_name, RoomSearchToken.CREATOR),
+            (creator.email, RoomSearchToken.DETAIL),
+            (room.description, RoomSearchToken.DETAIL),
+        )
+        tokens = {}
+        for text, weight in fields:
+            for token in tokenize(text):
+                tokens[token] = max(weight, tokens.get(token, 0))
+        if creator.email:
+            # lets a full address match as well
+            email = creator.email.lower()[:TOKEN_MAX_LENGTH]
+            tokens[email] = max(RoomSearchToken.DETAIL, tokens.get(email, 0))
+        return tokens
+
+    def index_room(self, room):
+        tokens = self.document(room)
+        with transaction.atomic():
+            self.filter(room=room).delete()
+            self.bulk_create([
+                self.model(room=room, token=token, weight=weight) for token, weight in tokens.items()
+            ])
+
+    def rebuild(self, rooms=None):
+        """
+        Re-indexes the given rooms (all by default). Returns the number of
+        tokens written.
+        """
+        if rooms is None:
+            rooms = Room.objects.get_queryset()
+        written = []
+        with transaction.atomic():
+            self.filter(room__in=rooms).delete()
+            for room in rooms.select_related('creator'):
+                written.extend(
+                    self.model(room=room, token=token, weight=weight)
+                    for token, weight in self.document(room).items()
+                )
+            self.bulk_create(written, batch_size=500)
+        return len(written)
+
+
+class RoomSearchToken(models.Model):
+    DETAIL  = 1
+    CREATOR = 2
+    TITLE   = 4
+    WEIGHT_CHOICES = (
+        (DETAIL, 'Description or email'),
+        (CREATOR, 'Creator name'),
+        (TITLE, 'Title')
+    )
+    room        = models.ForeignKey(
+        Room, on_delete=models.CASCADE, related_name='search_tokens', verbose_name=('room')
+    )
+    token       = models.CharField(max_length=TOKEN_MAX_LENGTH, verbose_name=('token'))
+    weight      = models.PositiveSmallIntegerField(choices=WEIGHT_CHOICES, default=1, verbose_name=('weight'))
+
+    objects     = RoomSearchTokenManager()
+
+    class Meta:
+        verbose_name        = "Room Search Token"
+        verbose_name_plural = "Room Search Tokens"
+        ordering            = ["room", "-weight"]
+        unique_together     = ("room", "token")
+        indexes             = [models.Index(fields=['token', 'room'], name='search_token_room_idx')]
+
+    def __str__(self):
+        return self.token
+
+
+@receiver(post_save, sender=Room)
+def index_room_on_save(sender, instance, **kwargs):
+    RoomSearchToken.objects.index_room(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def index_room_on_creator_save(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(['last_login']):
+        return
+    room = Room.objects.get_queryset().filter(creator=instance).first()
+    if room is not None:
+        RoomSearchToken.objects.index_room(room)
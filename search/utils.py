@@ -0,0 +1,26 @@
+import re
+
+TOKEN_RE            = re.compile(r'\w+', re.UNICODE)
+TOKEN_MAX_LENGTH    = 50
+QUERY_MAX_TERMS     = 5
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase word tokens, eg. "John.Doe@Mail" gives
+    ['john', 'doe', 'mail'].
+    """
+    if not text:
+        return []
+    return [token[:TOKEN_MAX_LENGTH] for token in TOKEN_RE.findall(text.lower())]
+
+
+def query_terms(query):
+    """
+    Distinct search terms of a query in their original order.
+    """
+    terms = []
+    for term in tokenize(query):
+        if term not in terms:
+            terms.append(term)
+    return terms[:QUERY_MAX_TERMS]
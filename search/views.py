@@ -5,19 +5,26 @@ from rooms.models import Room
 class SearchRoomView(ListView):
     template_name   = "search/view.html"
     paginate_by     = 6
+    replica_reads   = True
+    # ranked matches fetched at most, counts above it are shown as "limit+"
+    result_limit    = 120
 
     def get_context_data(self, *args, **kwargs):
         context             = super(SearchRoomView, self).get_context_data(*args, **kwargs)
         query               = self.request.GET.get('q')
-        result_counter      = self.object_list.count()
         context['query']    = query
-        context['count']    = result_counter
+        if query:
+            context['count']        = len(self.object_list)
+            context['count_capped'] = len(self.object_list) >= self.result_limit
+        else:
+            context['count']        = self.object_list.count()
         return context
-        
+
     def get_queryset(self, *args, **kwargs):
         request     = self.request
         method_dict = request.GET
         query       = method_dict.get('q', None)
-        if query is not None:    
-            return Room.objects.search(query)
-        return Room.objects.all()
\ No newline at end of file
+        if query:
+            # one query for the page and the (approximate) count
+            return list(Room.objects.search(query).select_related('creator')[:self.result_limit])
+        return Room.objects.all()
@@ -0,0 +1,40 @@
+# Generated by Django 2.1.3 on 2026-10-18 19:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def merge_duplicates(apps, schema_editor):
+    Suspicious  = apps.get_model('suspicious', 'Suspicious')
+    kept        = {}
+    for suspicious in Suspicious.objects.order_by('user_id', 'first_attempt', 'id'):
+        first = kept.get(suspicious.user_id)
+        if first is None:
+            kept[suspicious.user_id] = suspicious
+            continue
+        first.attempt       += suspicious.attempt
+        first.last_attempt  = max(first.last_attempt, suspicious.last_attempt)
+        suspicious.delete()
+        Suspicious.objects.filter(pk=first.pk).update(attempt=first.attempt, last_attempt=first.last_attempt)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suspicious', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='suspicious',
+            name='attempt',
+            field=models.PositiveIntegerField(default=1, verbose_name='attempts'),
+        ),
+        migrations.AlterField(
+            model_name='suspicious',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='suspicious', to=settings.AUTH_USER_MODEL, verbose_name='user'),
+        ),
+    ]
@@ -1,14 +1,69 @@
-from django.db import models
+import datetime
+from collections import defaultdict
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
 from django.conf import settings
 
+
+class SuspiciousManager(models.Manager):
+    def record(self, user_id, count=1, when=None):
+        """
+        Adds `count` attempts to a user with one UPDATE ... SET attempt =
+        attempt + count. The row is created on the first attempt, a
+        concurrent insert of the same user is caught by the unique key and
+        turned into another increment.
+        """
+        when = when or datetime.datetime.now()
+        if self.filter(user_id=user_id).update(attempt=F('attempt') + count, last_attempt=when):
+            return
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id, attempt=count)
+        except IntegrityError:
+            self.filter(user_id=user_id).update(attempt=F('attempt') + count, last_attempt=when)
+
+    def record_many(self, attempts, when=None):
+        """
+        Writes a batch of {user_id: count} attempts in one transaction. The
+        existing rows are read and locked first, users among them sharing
+        the same count are incremented by one UPDATE and the rest are
+        inserted with a single bulk_create.
+        """
+        when = when or datetime.datetime.now()
+        with transaction.atomic():
+            existing    = set(
+                self.select_for_update().filter(user_id__in=list(attempts)).values_list('user_id', flat=True)
+            )
+            by_count    = defaultdict(list)
+            for user_id in existing:
+                by_count[attempts[user_id]].append(user_id)
+            for count, user_ids in by_count.items():
+                self.filter(user_id__in=user_ids).update(attempt=F('attempt') + count, last_attempt=when)
+            missing     = [
+                self.model(user_id=user_id, attempt=count)
+                for user_id, count in attempts.items() if user_id not in existing
+            ]
+            if not missing:
+                return
+            try:
+                with transaction.atomic():
+                    self.bulk_create(missing)
+            except IntegrityError:
+                # another process inserted some of them meanwhile
+                for suspicious in missing:
+                    self.record(suspicious.user_id, suspicious.attempt, when)
+
+
 class Suspicious(models.Model):
-    user            = models.ForeignKey(
+    user            = models.OneToOneField(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='suspicious', verbose_name=('user')
     )
-    attempt         = models.PositiveSmallIntegerField(default=1, verbose_name=('attempts'))
+    attempt         = models.PositiveIntegerField(default=1, verbose_name=('attempts'))
     first_attempt   = models.DateTimeField(auto_now_add=True, verbose_name=('first attempt'))
     last_attempt    = models.DateTimeField(auto_now=True, verbose_name=('last attempt'))
 
+    objects         = SuspiciousManager()
+
     def __str__(self):
         return self.user.username
 
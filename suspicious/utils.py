@@ -0,0 +1,82 @@
+import atexit
+import datetime
+import threading
+from collections import Counter
+from django.conf import settings
+from django.core.signals import request_finished
+from .models import Suspicious
+
+
+class SuspiciousBuffer(object):
+    """
+    Collects suspicious attempts in process memory and writes them with
+    Suspicious.objects.record_many() once `size` attempts are pending, or
+    at the end of the first request (of any view) handled `interval`
+    seconds after the last flush. Whatever is left is flushed when the
+    process exits.
+    """
+    def __init__(self, size, interval):
+        self.size       = size
+        self.interval   = interval
+        self.pending    = Counter()
+        self.count      = 0
+        self.flushed_at = datetime.datetime.now()
+        self.lock       = threading.Lock()
+
+    def is_due(self):
+        return self.count >= self.size or (
+            self.count and (datetime.datetime.now() - self.flushed_at).total_seconds() >= self.interval
+        )
+
+    def add(self, user_id):
+        with self.lock:
+            self.pending[user_id] += 1
+            self.count += 1
+            due = self.is_due()
+        if due:
+            self.flush()
+
+    def flush_if_due(self, **kwargs):
+        with self.lock:
+            due = self.is_due()
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            attempts, self.pending  = self.pending, Counter()
+            self.count              = 0
+            self.flushed_at         = datetime.datetime.now()
+        if attempts:
+            Suspicious.objects.record_many(attempts, when=self.flushed_at)
+
+
+_buffer = None
+
+
+def get_suspicious_buffer():
+    """
+    Returns the process wide buffer, or None when SUSPICIOUS_BUFFER_SIZE is
+    not above 1 and attempts are written immediately.
+    """
+    global _buffer
+    size = getattr(settings, 'SUSPICIOUS_BUFFER_SIZE', 0)
+    if size <= 1:
+        return None
+    if _buffer is None:
+        _buffer = SuspiciousBuffer(size, getattr(settings, 'SUSPICIOUS_FLUSH_INTERVAL', 30))
+        atexit.register(_buffer.flush)
+        request_finished.connect(_buffer.flush_if_due, dispatch_uid='suspicious_buffer_flush')
+    return _buffer
+
+
+def record_suspicious_attempt(user):
+    """
+    Counts one more forbidden attempt of user. The attempt is written
+    right away with an atomic increment, or queued when buffering is on.
+    """
+    buffer = get_suspicious_buffer()
+    if buffer is None:
+        Suspicious.objects.record(user.pk)
+    else:
+        buffer.add(user.pk)
@@ -7,7 +7,10 @@ from .models import (
     Shopping,
     CashDepositField,
     CashDepositMember,
-    TotalHolder
+    TotalHolder,
+    MonthlyLedger,
+    MealSchedule,
+    ClosedMonth
 )
 
 class MealAdmin(admin.ModelAdmin):
@@ -15,6 +18,11 @@ class MealAdmin(admin.ModelAdmin):
     class Meta:
         model       = Meal
 
+class MealScheduleAdmin(admin.ModelAdmin):
+    list_display    = ['member', 'get_room', 'value', 'start_date', 'end_date', 'expanded_until', 'updated_at']
+    class Meta:
+        model       = MealSchedule
+
 class MealUpdateRequestAdmin(admin.ModelAdmin):
     list_display    = ['member', 'slug', 'meal_should_be', 'request_to', 'updated_at', 'get_room']
     class Meta:
@@ -25,6 +33,11 @@ class TrackerFieldAdmin(admin.ModelAdmin):
     class Meta:
         model       = TrackerField
 
+class MonthlyLedgerAdmin(admin.ModelAdmin):
+    list_display    = ['member', 'get_room', 'year', 'month', 'meal_total', 'shopping_total', 'monthly_shopping_total', 'cost_sector_total', 'deposit_total', 'updated_at']
+    class Meta:
+        model       = MonthlyLedger
+
 class MemberTrackAdmin(admin.ModelAdmin):
     list_display    = ['member', 'get_room', 'tracker_field', 'cost', 'updated_at']
 
@@ -55,11 +68,19 @@ class TotalHolderAdmin(admin.ModelAdmin):
     class Meta:
         model       = TrackerField
 
+class ClosedMonthAdmin(admin.ModelAdmin):
+    list_display    = ['room', 'year', 'month', 'meals', 'shoppings', 'deposits', 'closed_by', 'updated_at']
+    class Meta:
+        model       = ClosedMonth
+
 admin.site.register(Meal, MealAdmin)
+admin.site.register(MealSchedule, MealScheduleAdmin)
 admin.site.register(MealUpdateRequest, MealUpdateRequestAdmin)
 admin.site.register(TrackerField, TrackerFieldAdmin)
 admin.site.register(MemberTrack, MemberTrackAdmin)
 admin.site.register(Shopping, ShoppingAdmin)
 admin.site.register(CashDepositField, CashDepositFieldAdmin)
 admin.site.register(CashDepositMember, CashDepositMemberAdmin)
-admin.site.register(TotalHolder, TotalHolderAdmin)
\ No newline at end of file
+admin.site.register(TotalHolder, TotalHolderAdmin)
+admin.site.register(MonthlyLedger, MonthlyLedgerAdmin)
+admin.site.register(ClosedMonth, ClosedMonthAdmin)
\ No newline at end of file
@@ -0,0 +1,56 @@
+import datetime
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from accounts.utils import time_ordered_id, time_ordered_id_time
+from utils.routers import reading_from_replica
+
+CHART_CACHE_TIMEOUT = getattr(settings, 'CHART_CACHE_TIMEOUT', 60 * 60)
+
+
+def version_key(room_id, date):
+    return 'room-chart-version:%s:%s' % (room_id, date.strftime("%Y%m"))
+
+
+def room_cache_version(room_id, date):
+    """
+    Data version of a room and month. A missing version gets a new unique
+    value, so fragments cached before an eviction are never served again.
+    """
+    key     = version_key(room_id, date)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time_ordered_id(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_room_cache(room_id, *dates):
+    """
+    Invalidates the cached charts of a room for the months of `dates` and
+    the current month, once the running transaction commits (a reader
+    between the bump and the commit would cache the old data again).
+    """
+    if room_id is None:
+        return
+    keys = {version_key(room_id, datetime.date.today())}
+    keys.update(version_key(room_id, date) for date in dates if date is not None)
+    transaction.on_commit(lambda: cache.set_many({key: time_ordered_id() for key in keys}, None))
+
+
+def chart_cache_key(name, room_id, date, *vary):
+    parts = [name, room_id, date.strftime("%Y%m"), room_cache_version(room_id, date)] + list(vary)
+    return 'room-chart:' + ':'.join(str(part) for part in parts)
+
+
+def chart_cacheable(room_id, date):
+    """
+    Whether a chart of the room built now may be cached. Read from the
+    replica shortly after the data changed it may miss the change, which
+    the cache would keep under the new version: it is served, not cached.
+    """
+    if not reading_from_replica():
+        return True
+    changed = time_ordered_id_time(room_cache_version(room_id, date))
+    return time.time() - changed > settings.REPLICA_STICKY_SECONDS
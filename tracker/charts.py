@@ -0,0 +1,147 @@
+import datetime
+import hashlib
+from decimal import Decimal
+from django.db.models import Max
+from accounts.utils import month_range
+from memberships.models import Membership
+from rooms.models import ManagerialSetting
+from .cache import room_cache_version
+from .models import Meal, Shopping, MemberTrack, TrackerField, CashDepositField, CashDepositMember
+from .utils import build_meal_chart
+
+# tables whose rows show up on a chart, with the lookup from a row to its room
+CHART_SOURCES = {
+    'meals'     : ((Meal, 'member__room'), (Membership, 'room')),
+    'costs'     : ((MemberTrack, 'member__room'), (TrackerField, 'room'), (Membership, 'room')),
+    'shopping'  : ((Shopping, 'created_by__room'), (ManagerialSetting, 'room'), (Membership, 'room')),
+    'deposits'  : ((CashDepositMember, 'member__room'), (CashDepositField, 'room'), (Membership, 'room')),
+}
+
+
+def chart_etag(room, chart):
+    """
+    ETag of the data of a chart: the latest updated_at of the room across
+    the chart tables, read in one UNION ALL statement, and the room cache
+    version (bumped on deletes too, which leave no updated_at behind).
+    The date is part of it as the meal totals stop at today.
+    """
+    latest = [
+        model.objects.filter(**{lookup: room}).order_by().values(lookup).annotate(
+            latest=Max('updated_at')
+        ).values_list('latest', flat=True)
+        for model, lookup in CHART_SOURCES[chart]
+    ]
+    stamps = [stamp for stamp in latest[0].union(*latest[1:], all=True) if stamp is not None]
+    today  = datetime.date.today()
+    parts  = [
+        chart, room.pk, today.isoformat(), max(stamps).isoformat() if stamps else '', room_cache_version(room.pk, today)
+    ]
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def member_data(member):
+    return {
+        'id'        : member.pk,
+        'username'  : member.user.username,
+        'name'      : member.user.profile.get_smallname(),
+    }
+
+
+def meal_chart_data(room):
+    today   = datetime.date.today()
+    chart   = build_meal_chart(room, today.replace(day=1), today + datetime.timedelta(days=1), total_until=today)
+    return {
+        'members'       : [member_data(member) for member in chart['members']],
+        'rows'          : [
+            {
+                'date'  : row['date'],
+                'meals' : [meal.meal_today if meal is not None else None for meal in row['cells']],
+                'total' : row['total'],
+            } for row in chart['rows']
+        ],
+        'member_totals' : chart['member_totals'],
+        'grand_total'   : chart['grand_total'],
+    }
+
+
+def field_chart_data(members, fields, entries):
+    """
+    Members x fields matrix of (field id, member id, value) entries with
+    the member and room totals.
+    """
+    columns         = {member.pk: index for index, member in enumerate(members)}
+    cells           = {field.pk: [Decimal('0.00')] * len(members) for field in fields}
+    member_totals   = [Decimal('0.00')] * len(members)
+    for field_id, member_id, value in entries:
+        if field_id not in cells or member_id not in columns:
+            continue
+        cells[field_id][columns[member_id]] += value or 0
+        member_totals[columns[member_id]]   += value or 0
+    return {
+        'members'       : [member_data(member) for member in members],
+        'fields'        : [{'id': field.pk, 'title': field.title, 'values': cells[field.pk]} for field in fields],
+        'member_totals' : member_totals,
+        'grand_total'   : sum(member_totals, Decimal('0.00')),
+    }
+
+
+def room_members(room):
+    return list(Membership.objects.filter(room=room).select_related('user__profile').order_by('created_at'))
+
+
+def cost_chart_data(room):
+    entries = MemberTrack.objects.filter(member__room=room).values_list('tracker_field_id', 'member_id', 'cost')
+    return field_chart_data(room_members(room), list(TrackerField.objects.filter(room=room).order_by('created_at')), entries)
+
+
+def deposit_chart_data(room):
+    entries = CashDepositMember.objects.filter(
+        member__room=room, **month_range('created_at', datetime.date.today())
+    ).values_list('deposit_field_id', 'member_id', 'amount')
+    return field_chart_data(
+        room_members(room), list(CashDepositField.objects.filter(room=room).order_by('created_at')), entries
+    )
+
+
+def shopping_chart_data(room):
+    """
+    Shoppings of the month. In a member dependent room the monthly
+    (managerial) shoppings are listed apart, like on the shopping chart.
+    """
+    setting         = ManagerialSetting.objects.filter(room=room).only('shopping_type').first()
+    shopping_type   = setting.shopping_type if setting is not None else ManagerialSetting.INDIVIDUAL_MEMBER_DEPENDENT_SHOPPING
+    members         = room_members(room)
+    usernames       = {member.pk: member.user.username for member in members}
+    data            = {
+        'shopping_type'     : shopping_type,
+        'members'           : [member_data(member) for member in members],
+        'shoppings'         : [],
+        'monthly_shoppings' : [],
+        'totals'            : {'shopping': Decimal('0.00'), 'monthly_shopping': Decimal('0.00')},
+    }
+    shoppings = Shopping.objects.filter(
+        created_by__room=room, **month_range('date', datetime.date.today())
+    ).order_by('-date', '-id').values_list('created_by_id', 'date', 'item', 'quantity', 'quantity_unit', 'cost', 'shop_type')
+    for member_id, date, item, quantity, unit, cost, shop_type in shoppings:
+        if shopping_type == ManagerialSetting.ROOM_MANAGER_DEPENDENT_SHOPPING and shop_type != Shopping.MANAGERIAL:
+            continue
+        key = 'monthly_shopping' if shop_type == Shopping.MANAGERIAL else 'shopping'
+        data[key + 's'].append({
+            'member'    : usernames.get(member_id),
+            'date'      : date,
+            'item'      : item,
+            'quantity'  : quantity,
+            'unit'      : unit or None,
+            'cost'      : cost,
+        })
+        data['totals'][key] += cost
+    data['totals']['grand_total'] = data['totals']['shopping'] + data['totals']['monthly_shopping']
+    return data
+
+
+CHART_DATA = {
+    'meals'     : meal_chart_data,
+    'costs'     : cost_chart_data,
+    'shopping'  : shopping_chart_data,
+    'deposits'  : deposit_chart_data,
+}
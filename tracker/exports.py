@@ -0,0 +1,163 @@
+import csv
+import datetime
+from decimal import Decimal
+from django.db.models import Sum, F
+from accounts.utils import month_bounds, month_range
+from .models import (
+    Meal, MealSchedule, Shopping, MemberTrack, CashDepositMember, MonthlyLedger,
+    ArchivedMeal, ArchivedShopping, ArchivedCashDepositMember, ClosedMonth
+)
+
+EXPORT_CHUNK_SIZE   = 2000
+EXPORT_MAX_MONTHS   = 36
+EXPORT_SECTIONS     = ('meals', 'shopping', 'costs', 'deposits', 'totals')
+
+
+class Echo(object):
+    """
+    File-like object handing every written line back to the csv writer.
+    """
+    def write(self, value):
+        return value
+
+
+def parse_month(value):
+    return datetime.datetime.strptime(value, "%Y-%m").date()
+
+
+def export_months(start=None, end=None):
+    """
+    First days of the months from `start` to `end` ('YYYY-MM', both
+    included). Either defaults to the other one, both to the current month.
+    Raises ValueError on a malformed or too long range.
+    """
+    start   = parse_month(start) if start else None
+    end     = parse_month(end) if end else None
+    start   = start or end or datetime.date.today().replace(day=1)
+    end     = end or start
+    if end < start:
+        raise ValueError("The range ends before it starts.")
+    months = [start]
+    while months[-1] < end:
+        months.append(month_bounds(months[-1])[1])
+        if len(months) > EXPORT_MAX_MONTHS:
+            raise ValueError("At most %s months can be exported at once." % EXPORT_MAX_MONTHS)
+    return months
+
+
+def meal_rows(room, month, model=Meal):
+    yield from model.objects.filter(
+        member__room=room, **month_range('meal_date', month)
+    ).order_by('meal_date', 'id').values_list(
+        'meal_date', 'member__user__username', 'meal_today', 'meal_next_day', 'auto_entry', 'confirmed_by__user__username'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def shopping_rows(room, month, model=Shopping):
+    shop_types = dict(Shopping.SHOP_TYPE_CHOICES)
+    rows = model.objects.filter(
+        created_by__room=room, **month_range('date', month)
+    ).order_by('date', 'id').values_list(
+        'date', 'created_by__user__username', 'item', 'quantity', 'quantity_unit', 'cost', 'shop_type'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for row in rows:
+        yield row[:6] + (shop_types.get(row[6], row[6]),)
+
+
+def cost_rows(room, month, model=MemberTrack):
+    yield from model.objects.filter(
+        member__room=room, **month_range('created_at', month)
+    ).order_by('created_at', 'id').values_list(
+        'created_at', 'tracker_field__title', 'member__user__username', 'cost'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def deposit_rows(room, month, model=CashDepositMember):
+    yield from model.objects.filter(
+        member__room=room, **month_range('created_at', month)
+    ).order_by('created_at', 'id').values_list(
+        'created_at', 'deposit_field__title', 'member__user__username', 'amount'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def total_rows(room, months):
+    """
+    Per member totals of the months, summed from the same MonthlyLedger
+    rows TotalHolder shows on the charts. Like the charts, meals entered
+    for the days after today are not counted and the auto entry days not
+    written as meals yet are.
+    """
+    ledgers = MonthlyLedger.objects.for_room(room).filter(
+        year__gte=months[0].year, year__lte=months[-1].year
+    ).order_by().values('member_id', 'year', 'month', 'member__user__username').annotate(
+        meal_total              = Sum('meal_total'),
+        shopping_total          = Sum('shopping_total'),
+        monthly_shopping_total  = Sum('monthly_shopping_total'),
+        cost_sector_total       = Sum('cost_sector_total'),
+        deposit_total           = Sum('deposit_total'),
+    )
+    today       = datetime.date.today()
+    upcoming    = dict(Meal.objects.filter(
+        member__room=room, meal_date__gt=max(today, months[0] - datetime.timedelta(days=1)),
+        meal_date__lt=month_bounds(months[-1])[1]
+    ).order_by().values_list('member_id').annotate(total=Sum(F('meal_today'))))
+    pending     = MealSchedule.objects.pending_totals(room, months[0], month_bounds(months[-1])[1] - datetime.timedelta(days=1))
+    wanted      = {(month.year, month.month) for month in months}
+    fields      = ('meal_total', 'shopping_total', 'monthly_shopping_total', 'cost_sector_total', 'deposit_total')
+    totals      = {}
+    for ledger in ledgers:
+        if (ledger['year'], ledger['month']) not in wanted:
+            continue
+        member = totals.setdefault(
+            ledger['member_id'], [ledger['member__user__username']] + [Decimal('0.00')] * len(fields)
+        )
+        for index, field in enumerate(fields, 1):
+            member[index] += ledger[field] or 0
+    for member_id, row in sorted(totals.items(), key=lambda item: item[1][0]):
+        row[1] += (pending.get(member_id) or 0) - (upcoming.get(member_id) or 0)
+        yield row
+
+
+EXPORT_COLUMNS = {
+    'meals'     : ('date', 'member', 'meal', 'meal next day', 'auto entry', 'confirmed by'),
+    'shopping'  : ('date', 'member', 'item', 'quantity', 'unit', 'cost', 'type'),
+    'costs'     : ('date', 'cost sector', 'member', 'cost'),
+    'deposits'  : ('date', 'deposit field', 'member', 'amount'),
+    'totals'    : ('member', 'meals', 'shopping', 'monthly shopping', 'cost sector', 'deposit'),
+}
+EXPORT_ROWS = {
+    'meals'     : meal_rows,
+    'shopping'  : shopping_rows,
+    'costs'     : cost_rows,
+    'deposits'  : deposit_rows,
+}
+# where the rows of closed months went
+EXPORT_ARCHIVES = {
+    'meals'     : ArchivedMeal,
+    'shopping'  : ArchivedShopping,
+    'deposits'  : ArchivedCashDepositMember,
+}
+
+
+def export_rows(room, section, months):
+    """
+    Header and rows of a section, queried one month at a time so only a
+    chunk of rows is held in memory while the response streams. Closed
+    months are read from the archive first.
+    """
+    yield EXPORT_COLUMNS[section]
+    if section == 'totals':
+        yield from total_rows(room, months)
+        return
+    closed  = ClosedMonth.objects.months(room) if section in EXPORT_ARCHIVES else set()
+    rows    = EXPORT_ROWS[section]
+    for month in months:
+        if (month.year, month.month) in closed:
+            yield from rows(room, month, EXPORT_ARCHIVES[section])
+        yield from rows(room, month)
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
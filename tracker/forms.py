@@ -7,11 +7,12 @@ from .models import (
     Shopping,
     CashDepositField,
     CashDepositMember,
-    TotalHolder
+    TotalHolder,
+    MonthlyLedger
 )
 from rooms.models import ManagerialSetting
 from memberships.models import Membership
-from suspicious.models import Suspicious
+from suspicious.utils import record_suspicious_attempt
 import re
 from django.contrib import messages
 from django.core.validators import MinValueValidator
@@ -19,8 +20,10 @@ from decimal import Decimal
 import datetime
 import time
 from django.urls import reverse
-from django.db.models import Q
-from accounts.utils import time_str_mix_slug
+from django.db import transaction
+from django.db.models import Q, Case, When, Value, DecimalField
+from accounts.utils import time_str_mix_slug, month_range
+from .cache import bump_room_cache
 from django.db.models import F, Sum
 
 
@@ -70,26 +73,18 @@ class TrackerFieldCreateForm(forms.ModelForm):
         user        = self.request.user
         room        = user.membership.room
         slug_binding    = title.lower()+'-'+time_str_mix_slug()
-        TrackerField.objects.create(
-            title = title,
-            description = description,
-            room = room,
-            slug = slug_binding
-        )
+        with transaction.atomic():
+            tracker_instance = TrackerField.objects.create(
+                title = title,
+                description = description,
+                room = room,
+                slug = slug_binding
+            )
+            MemberTrack.objects.allocate(
+                room, [tracker_instance], Membership.objects.filter(room=room).values_list('pk', flat=True), cost=0
+            )
         messages.add_message(self.request, messages.SUCCESS,
         "Cost sector \"%s\" created successfully !" %title)
-        tracker_filter = TrackerField.objects.filter(room=room, slug=slug_binding)
-        if tracker_filter.exists():
-            now             = datetime.datetime.now()
-            tracker_instance = TrackerField.objects.get(room=room, slug=slug_binding)
-            member_filter   = Membership.objects.filter(room=room)
-            if member_filter.exists():
-                for member in member_filter:
-                    MemberTrack.objects.create(
-                        member=member,
-                        tracker_field=tracker_instance,
-                        cost=0
-                    )
 
 
 class TrackerFieldUpdateForm(forms.ModelForm):
@@ -140,24 +135,17 @@ class AssignFieldToMemberForm(forms.ModelForm):
             )
             if maintainer_filter.exists():
                 tracker_fields  = TrackerField.objects.filter(room=room_instance)
-                tracked_members = MemberTrack.objects.all()
-                for i in range(len(tracker_fields)):
-                    title = tracker_fields[i].title
-                    field_name = '%s' % (title, )
+                # the current cost of every field, read at once (the latest row wins)
+                costs           = dict(MemberTrack.objects.filter(
+                    member__slug=self.slug, tracker_field__room=room_instance
+                ).order_by('id').values_list('tracker_field_id', 'cost'))
+                for tracker_field in tracker_fields:
+                    field_name = '%s' % (tracker_field.title, )
                     self.fields[field_name] = forms.DecimalField(
                         required=False, decimal_places=2, max_digits=7, validators=[MinValueValidator(Decimal('0.00'))]
                         )
-                    try:
-                        self.fields[field_name].help_text = tracker_fields[i].description
-                        cost_filter = tracked_members.filter(member__slug=self.slug, tracker_field__title=field_name)
-                        if cost_filter.exists():
-                            for cost_instance in cost_filter:
-                                cost_instant = cost_instance.cost
-                            self.initial[field_name] = cost_instant
-                        else:
-                            self.initial[field_name] = 0.00
-                    except IndexError:
-                        self.initial[field_name] = ""
+                    self.fields[field_name].help_text = tracker_field.description
+                    self.initial[field_name] = costs.get(tracker_field.pk, 0.00)
 
     class Meta:
         model   = MemberTrack
@@ -180,41 +168,35 @@ class AssignFieldToMemberForm(forms.ModelForm):
             if member_objects.exists():
                 member = Membership.objects.get(slug=member_instance)
                 if maintainer_filter.exists():
-                    now                 = datetime.datetime.now()
-                    for fields in self.cleaned_data:
-                        tracker_fields = TrackerField.objects.filter(title=fields)
-                        if tracker_fields.exists():
-                            tracker_field = TrackerField.objects.get(title=fields, room=room_instance)
-                            value = self.cleaned_data.get(fields)
-                            member_track_filter = MemberTrack.objects.filter(
-                                member=member, tracker_field = tracker_field
+                    costs = {
+                        field.pk: self.cleaned_data.get(field.title)
+                        for field in TrackerField.objects.filter(room=room_instance, title__in=list(self.cleaned_data))
+                    }
+                    with transaction.atomic():
+                        tracks      = MemberTrack.objects.filter(member=member, tracker_field_id__in=list(costs))
+                        allocated   = dict(tracks.values_list('tracker_field_id', 'created_at'))
+                        if allocated:
+                            # one UPDATE for every allocated field (no bulk_update before Django 2.2)
+                            tracks.update(
+                                cost=Case(
+                                    *[When(tracker_field_id=field_id, then=Value(cost)) for field_id, cost in costs.items()],
+                                    output_field=DecimalField(max_digits=7, decimal_places=2)
+                                ),
+                                updated_at=datetime.datetime.now()
                             )
-                            if member_track_filter.exists():
-                                member_track_filter.update(
-                                    cost = value
-                                )
-                            else:
-                                MemberTrack.objects.get_or_create(
-                                    member = member,
-                                    tracker_field = tracker_field,
-                                    cost = value
-                                )
+                        MemberTrack.objects.bulk_create([
+                            MemberTrack(member=member, tracker_field_id=field_id, cost=cost)
+                            for field_id, cost in costs.items() if field_id not in allocated
+                        ])
+                        bump_room_cache(room_instance.pk, *allocated.values())
+                    MonthlyLedger.objects.refresh(member)
                     messages.add_message(self.request, messages.SUCCESS,
                     "Cost Fields allocated successfully !")
                 else:
                     messages.add_message(self.request, messages.WARNING,
                     "Something went wrong !")
         else:
-            instance_user   = self.request.user
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
+            record_suspicious_attempt(self.request.user)
             messages.add_message(self.request, messages.ERROR, 
                 "You are not allowed. Your account is being tracked for suspicious activity !"
             )
@@ -239,9 +221,6 @@ class MealUpdateForm(forms.ModelForm):
         super(MealUpdateForm, self).__init__(*args, **kwargs)
         next_day        = (datetime.date.today() + datetime.timedelta(days=1))
         tomorrow        = next_day.strftime("%B-%d-%Y")
-        tomorrow_day    = next_day.strftime("%d")
-        tomorrow_month  = next_day.strftime("%m")
-        tomorrow_year   = next_day.strftime("%Y")
         self.fields['meal_now'].label = "Meal Today"
         self.fields['meal_now'].help_text = "Meal of today (%s)" % time.strftime("%B-%d-%Y")
         self.fields['meal_now'].widget.attrs['readonly'] = True
@@ -251,14 +230,14 @@ class MealUpdateForm(forms.ModelForm):
         now                 = datetime.datetime.now()
         if existed_meal_filter.exists():
             existed_meal_instance = existed_meal_filter.filter(
-                        Q(meal_date__day=now.day, meal_date__month=now.month, meal_date__year=now.year)
+                        Q(meal_date=now.date())
                         ).last()
             meal_tomorrow_filter = existed_meal_filter.filter(
-                        Q(meal_date__day=tomorrow_day, meal_date__month=tomorrow_month, meal_date__year=tomorrow_year)
+                        Q(meal_date=next_day)
                     )
             if meal_tomorrow_filter.exists():
                 meal_tomorrow_instance = existed_meal_filter.filter(
-                        Q(meal_date__day=tomorrow_day, meal_date__month=tomorrow_month, meal_date__year=tomorrow_year)
+                        Q(meal_date=next_day)
                     ).last()
             if existed_meal_instance:
                 if existed_meal_instance.meal_date.strftime("%m-%d-%Y") == now.strftime("%m-%d-%Y"):
@@ -584,7 +563,10 @@ class AssignCashDepositToMemberForm(forms.ModelForm):
             )
             if maintainer_filter.exists():
                 deposit_field  = CashDepositField.objects.filter(room=room_instance)
-                deposited_members = CashDepositMember.objects.all()
+                # the amounts of the member by field title, the last deposit of a title wins
+                deposited_amounts = dict(CashDepositMember.objects.filter(
+                    member__slug=self.slug, deposit_field__room=room_instance
+                ).values_list('deposit_field__title', 'amount'))
                 for i in range(len(deposit_field)):
                     title = deposit_field[i].title
                     field_name = '%s' % (title, )
@@ -593,11 +575,8 @@ class AssignCashDepositToMemberForm(forms.ModelForm):
                         )
                     try:
                         self.fields[field_name].help_text = deposit_field[i].description
-                        deposit_filter = deposited_members.filter(member__slug=self.slug, deposit_field__title=field_name)
-                        if deposit_filter.exists():
-                            for deposit in deposit_filter:
-                                amount = deposit.amount
-                            self.initial[field_name] = amount
+                        if field_name in deposited_amounts:
+                            self.initial[field_name] = deposited_amounts[field_name]
                         else:
                             self.initial[field_name] = 0.00
                     except IndexError:
@@ -631,7 +610,7 @@ class AssignCashDepositToMemberForm(forms.ModelForm):
                             deposit_field = CashDepositField.objects.get(title=fields, room=room_instance)
                             value = self.cleaned_data.get(fields)
                             member_deposit_filter = CashDepositMember.objects.filter(
-                                member=member, deposit_field = deposit_field, created_at__month=now.month, created_at__year=now.year
+                                member=member, deposit_field = deposit_field, **month_range('created_at', now)
                             )
                             if member_deposit_filter.exists():
                                 member_deposit_filter.update(
@@ -643,22 +622,60 @@ class AssignCashDepositToMemberForm(forms.ModelForm):
                                     deposit_field = deposit_field,
                                     amount = value
                                 )
+                    MonthlyLedger.objects.refresh(member, now.year, now.month)
                     messages.add_message(self.request, messages.SUCCESS,
                     "Cost Deposit Fields allocated successfully !")
                 else:
                     messages.add_message(self.request, messages.WARNING,
                     "Something went wrong !")
         else:
-            instance_user   = self.request.user
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
+            record_suspicious_attempt(self.request.user)
             messages.add_message(self.request, messages.ERROR, 
                 "You are not allowed. Your account is being tracked for suspicious activity !"
             )
+
+
+class MealGridForm(forms.Form):
+    member          = forms.IntegerField(widget=forms.HiddenInput)
+    meal_today      = forms.DecimalField(
+        required=False, max_digits=4, decimal_places=2, min_value=Decimal('0.00'), label="Today"
+    )
+    meal_next_day   = forms.DecimalField(
+        required=False, max_digits=4, decimal_places=2, min_value=Decimal('0.00'), label="Tomorrow"
+    )
+
+class BaseMealGridFormSet(forms.BaseFormSet):
+    """
+    One MealGridForm per member of the room, `members` are the members the
+    grid may change.
+    """
+    def __init__(self, *args, **kwargs):
+        self.members = {member.pk: member for member in kwargs.pop('members')}
+        super(BaseMealGridFormSet, self).__init__(*args, **kwargs)
+        for form in self.forms:
+            try:
+                form.member_instance = self.members.get(int(form['member'].value()))
+            except (TypeError, ValueError):
+                form.member_instance = None
+
+    def clean(self):
+        if any(self.errors):
+            return
+        seen = set()
+        for form in self.forms:
+            member_id = form.cleaned_data.get('member')
+            if member_id not in self.members or member_id in seen:
+                raise forms.ValidationError("The meal grid does not match the members of your room. Please reload it !")
+            seen.add(member_id)
+
+    def get_entries(self):
+        """
+        {member id: (meal today, meal next day)} of every row, save_meal_grid
+        skips the ones matching the stored meals.
+        """
+        return {
+            form.cleaned_data['member']: (form.cleaned_data['meal_today'], form.cleaned_data['meal_next_day'])
+            for form in self.forms
+        }
+
+MealGridFormSet = forms.formset_factory(MealGridForm, formset=BaseMealGridFormSet, extra=0)
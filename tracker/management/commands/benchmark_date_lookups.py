@@ -0,0 +1,63 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand, CommandError
+from accounts.utils import month_range
+from memberships.models import Membership
+from tracker.models import Meal, Shopping, CashDepositMember
+from utils.models import Notification
+
+
+class Command(BaseCommand):
+    help = "Compare query plans and timings of __month/__year lookups against month ranges."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--member', help="Slug of the member to query, defaults to the first one.")
+        parser.add_argument('--repeat', type=int, default=50, help="Runs per query (default 50).")
+
+    def handle(self, *args, **options):
+        if options['member']:
+            member = Membership.objects.filter(slug=options['member']).select_related('user').first()
+        else:
+            member = Membership.objects.select_related('user').order_by('created_at').first()
+        if member is None:
+            raise CommandError("No member found.")
+        now     = datetime.datetime.now()
+        cases   = (
+            (
+                "Meal of today",
+                Meal.objects.filter(member=member, meal_date__day=now.day, meal_date__month=now.month, meal_date__year=now.year),
+                Meal.objects.filter(member=member, meal_date=now.date()),
+            ),
+            (
+                "Meals of the month",
+                Meal.objects.filter(member=member, meal_date__month=now.month, meal_date__year=now.year),
+                Meal.objects.filter(member=member, **month_range('meal_date', now)),
+            ),
+            (
+                "Individual shoppings of the month",
+                Shopping.objects.filter(created_by=member, shop_type=0, date__month=now.month, date__year=now.year),
+                Shopping.objects.filter(created_by=member, shop_type=0, **month_range('date', now)),
+            ),
+            (
+                "Deposits of the month",
+                CashDepositMember.objects.filter(member=member, created_at__month=now.month, created_at__year=now.year),
+                CashDepositMember.objects.filter(member=member, **month_range('created_at', now)),
+            ),
+            (
+                "Notifications of the month",
+                Notification.objects.filter(receiver__user_id=member.user_id, updated_at__month=now.month, updated_at__year=now.year),
+                Notification.objects.filter(receiver__user_id=member.user_id, **month_range('updated_at', now)),
+            ),
+        )
+        for title, old, new in cases:
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            for label, queryset in (('extract', old), ('range', new)):
+                self.stdout.write("  %s: %.3f ms" % (label, self.timeit(queryset, options['repeat'])))
+                for line in queryset.explain().splitlines():
+                    self.stdout.write("      " + line)
+
+    def timeit(self, queryset, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset.all())
+        return (time.perf_counter() - start) * 1000 / repeat
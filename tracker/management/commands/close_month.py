@@ -0,0 +1,38 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from rooms.models import Room
+from tracker.models import ClosedMonth
+
+
+class Command(BaseCommand):
+    help = (
+        "Close a finished month: summarise it in the monthly ledger and move its meals, "
+        "shoppings and deposits to the archive tables. Defaults to the previous month of every room."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room', help="Only close the room with this slug.")
+        parser.add_argument('--year', type=int, help="Year of the month to close.")
+        parser.add_argument('--month', type=int, help="Month to close (1-12).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows moved per transaction (default 1000).")
+
+    def handle(self, *args, **options):
+        previous = datetime.date.today().replace(day=1) - datetime.timedelta(days=1)
+        year     = options['year'] or previous.year
+        month    = options['month'] or previous.month
+        if not 1 <= month <= 12:
+            raise CommandError("Month must be between 1 and 12.")
+        rooms = Room.objects.get_queryset().order_by('pk')
+        if options['room']:
+            rooms = rooms.filter(slug=options['room'])
+            if not rooms.exists():
+                raise CommandError("No room found with slug '%s'." % options['room'])
+        for room in rooms.iterator():
+            try:
+                closed = ClosedMonth.objects.close(room, year, month, batch_size=options['batch_size'])
+            except ValueError as error:
+                raise CommandError(str(error))
+            self.stdout.write("%s: %s meals, %s shoppings, %s deposits archived" % (
+                room.slug, closed.meals, closed.shoppings, closed.deposits
+            ))
+        self.stdout.write(self.style.SUCCESS("%04d-%02d closed." % (year, month)))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from memberships.models import Membership
+from tracker.models import MonthlyLedger
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly ledger from meals, shoppings, cost sectors and deposits."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room', help="Only rebuild members of the room with this slug.")
+        parser.add_argument('--year', type=int, help="Only rebuild this year.")
+        parser.add_argument('--month', type=int, help="Only rebuild this month (1-12).")
+
+    def handle(self, *args, **options):
+        month = options['month']
+        if month is not None and not 1 <= month <= 12:
+            raise CommandError("Month must be between 1 and 12.")
+        members = Membership.objects.all()
+        if options['room']:
+            members = members.filter(room__slug=options['room'])
+            if not members.exists():
+                raise CommandError("No members found for room '%s'." % options['room'])
+        rows = MonthlyLedger.objects.rebuild(members=members, year=options['year'], month=month)
+        self.stdout.write(self.style.SUCCESS("Ledger rebuilt: %s row(s) written." % rows))
@@ -0,0 +1,159 @@
+import datetime
+import json
+import math
+import subprocess
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from memberships.models import Membership
+from tracker.models import Meal, Shopping, MemberTrack, CashDepositMember
+
+
+def percentile(values, percent):
+    """
+    Nearest rank percentile of an already sorted list.
+    """
+    if not values:
+        return None
+    rank = max(int(math.ceil(percent / 100.0 * len(values))), 1)
+    return values[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the chart, analytics, room detail and meal entry views through the test client "
+        "as the managers of seeded rooms and report latency percentiles and query counts as JSON. "
+        "Seed the data with seed_benchmark_data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=5, help="Seeded rooms to sample (default 5).")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed requests per room and scenario (default 20).")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per room and scenario (default 2).")
+        parser.add_argument('--prefix', default='bench', help="Prefix used by seed_benchmark_data (default 'bench').")
+        parser.add_argument('--scenario', action='append', help="Only run the named scenario, can be repeated.")
+        parser.add_argument('--output', help="Write the report to this file instead of stdout.")
+
+    def scenarios(self, member):
+        """
+        (name, method, url, data, setup) of every benchmarked request.
+        """
+        return [
+            ('meal_chart', 'get', reverse('tracker:meal_chart'), None, None),
+            ('cost_chart', 'get', reverse('tracker:cost_chart'), None, None),
+            ('shopping_chart', 'get', reverse('tracker:shopping_chart'), None, None),
+            ('deposit_chart', 'get', reverse('tracker:deposit_chart'), None, None),
+            ('analytics', 'get', reverse('tracker:analytics'), None, None),
+            ('room_detail', 'get', reverse('rooms:room_detail', kwargs={'slug': member.room.slug}), None, None),
+            (
+                'meal_create', 'post', reverse('tracker:meal_create'),
+                {'meal_today': '2', 'meal_next_day': '1', 'auto_entry_value': ''},
+                lambda: self.clear_meal_entry(member),
+            ),
+        ]
+
+    def clear_meal_entry(self, member):
+        # every timed POST has to create the entry instead of hitting "already exists"
+        today = datetime.date.today()
+        Meal.objects.filter(member=member, meal_date__gte=today).delete()
+
+    def handle(self, *args, **options):
+        managers = list(
+            Membership.objects.filter(
+                role=Membership.MANAGER, user__username__startswith=options['prefix'] + '-'
+            ).select_related('user', 'room').order_by('room__slug')[:options['rooms']]
+        )
+        if not managers:
+            raise CommandError("No seeded rooms found, run seed_benchmark_data first.")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        # the test environment is needed for the instrumented template rendering
+        setup_test_environment()
+        try:
+            results = {}
+            for member in managers:
+                client = Client()
+                client.force_login(member.user)
+                for name, method, url, data, setup in self.scenarios(member):
+                    if options['scenario'] and name not in options['scenario']:
+                        continue
+                    result = results.setdefault(name, {'url': url, 'timings': [], 'queries': [], 'status': {}})
+                    for run in range(options['warmup'] + options['repeat']):
+                        if setup is not None:
+                            setup()
+                        with CaptureQueriesContext(connection) as queries:
+                            start       = time.perf_counter()
+                            response    = getattr(client, method)(url, data or {})
+                            elapsed     = (time.perf_counter() - start) * 1000
+                        if run < options['warmup']:
+                            continue
+                        result['timings'].append(elapsed)
+                        result['queries'].append(len(queries))
+                        status = str(response.status_code)
+                        result['status'][status] = result['status'].get(status, 0) + 1
+        finally:
+            teardown_test_environment()
+
+        report = {
+            'meta'      : self.meta(managers, options),
+            'scenarios' : {name: self.summarize(result) for name, result in results.items()},
+        }
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS("Report written to %s" % options['output']))
+        else:
+            self.stdout.write(output)
+
+    def summarize(self, result):
+        timings = sorted(result['timings'])
+        queries = result['queries']
+        return {
+            'url'       : result['url'],
+            'requests'  : len(timings),
+            'status'    : result['status'],
+            'latency_ms': {
+                'p50'   : round(percentile(timings, 50), 3),
+                'p90'   : round(percentile(timings, 90), 3),
+                'p95'   : round(percentile(timings, 95), 3),
+                'p99'   : round(percentile(timings, 99), 3),
+                'max'   : round(timings[-1], 3),
+                'mean'  : round(sum(timings) / len(timings), 3),
+            },
+            'queries'   : {
+                'min'   : min(queries),
+                'max'   : max(queries),
+                'mean'  : round(sum(queries) / float(len(queries)), 2),
+            },
+        }
+
+    def meta(self, managers, options):
+        try:
+            revision = subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL
+            ).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            revision = None
+        members = Membership.objects.filter(user__username__startswith=options['prefix'] + '-')
+        return {
+            'revision'  : revision,
+            'database'  : connection.vendor,
+            'timestamp' : datetime.datetime.now().isoformat(),
+            'rooms'     : [member.room.slug for member in managers],
+            'repeat'    : options['repeat'],
+            'warmup'    : options['warmup'],
+            'scale'     : {
+                'rooms'         : members.filter(role=Membership.MANAGER).count(),
+                'members'       : members.count(),
+                'meals'         : Meal.objects.filter(member__in=members).count(),
+                'shoppings'     : Shopping.objects.filter(created_by__in=members).count(),
+                'member_tracks' : MemberTrack.objects.filter(member__in=members).count(),
+                'deposits'      : CashDepositMember.objects.filter(member__in=members).count(),
+            },
+        }
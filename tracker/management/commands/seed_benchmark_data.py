@@ -0,0 +1,205 @@
+import datetime
+import random
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from accounts.models import UserProfile
+from accounts.utils import time_ordered_ids, month_bounds
+from rooms.models import Room, ManagerialSetting
+from memberships.models import Membership
+from search.models import RoomSearchToken
+from tracker.models import (
+    Meal, Shopping, TrackerField, MemberTrack, CashDepositField, CashDepositMember, MonthlyLedger, TotalHolder
+)
+
+ITEMS           = ['rice', 'lentil', 'egg', 'fish', 'chicken', 'oil', 'onion', 'potato', 'milk', 'tea']
+COST_SECTORS    = ['Rent', 'Electricity', 'Gas', 'Internet']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic data set for benchmarks: rooms x members x months of meals, "
+        "shoppings, cost sectors and deposits. Rows are bulk inserted, derived tables "
+        "(ledger, search tokens) are rebuilt at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=1000, help="Rooms to create (default 1000).")
+        parser.add_argument('--members', type=int, default=15, help="Members per room (default 15).")
+        parser.add_argument('--months', type=int, default=12, help="Months of data up to the current one (default 12).")
+        parser.add_argument('--shoppings', type=int, default=4, help="Shoppings per member and month (default 4).")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed, the same seed gives the same data.")
+        parser.add_argument('--prefix', default='bench', help="Username, room and slug prefix (default 'bench').")
+        parser.add_argument('--flush', action='store_true', help="Delete the data of an earlier run with this prefix first.")
+        parser.add_argument('--force', action='store_true', help="Allow seeding a database other than SQLite.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' and not options['force']:
+            raise CommandError("Refusing to seed a %s database without --force." % connection.vendor)
+        if options['members'] < 1 or options['rooms'] < 1 or options['months'] < 1:
+            raise CommandError("Rooms, members and months must be at least 1.")
+        self.rng    = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        User        = get_user_model()
+        existing    = User.objects.filter(username__startswith=self.prefix + '-')
+        if options['flush']:
+            existing.delete()
+        elif existing.exists():
+            raise CommandError("Data with prefix '%s' exists, use --flush or another --prefix." % self.prefix)
+
+        months      = self.month_starts(options['months'])
+        totals      = {'rooms': 0, 'members': 0, 'meals': 0, 'shoppings': 0, 'member_tracks': 0, 'deposits': 0}
+        # one transaction per chunk of rooms keeps SQLite fast without one huge journal
+        chunk_size  = 20
+        for first in range(0, options['rooms'], chunk_size):
+            numbers = range(first, min(first + chunk_size, options['rooms']))
+            with transaction.atomic():
+                counts = self.seed_rooms(numbers, options['members'], months, options['shoppings'])
+            for key, value in counts.items():
+                totals[key] += value
+            self.stdout.write("  %s/%s rooms" % (numbers[-1] + 1, options['rooms']))
+
+        members = Membership.objects.filter(user__username__startswith=self.prefix + '-')
+        MonthlyLedger.objects.rebuild(members=members)
+        RoomSearchToken.objects.rebuild(rooms=Room.objects.get_queryset().filter(slug__startswith=self.prefix + '-'))
+        self.stdout.write(self.style.SUCCESS("Seeded " + ", ".join("%s %s" % (value, key) for key, value in totals.items())))
+
+    def month_starts(self, count):
+        start   = datetime.date.today().replace(day=1)
+        months  = [start]
+        for _ in range(count - 1):
+            months.append((months[-1] - datetime.timedelta(days=1)).replace(day=1))
+        return list(reversed(months))
+
+    def seed_rooms(self, numbers, member_count, months, shoppings):
+        User        = get_user_model()
+        rng         = self.rng
+        usernames   = [
+            '%s-%05d-%02d' % (self.prefix, number, index) for number in numbers for index in range(member_count)
+        ]
+        User.objects.bulk_create([
+            User(username=username, email='%s@example.com' % username, password='!', first_name=username)
+            for username in usernames
+        ])
+        users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, slug='%s-%s' % (username, suffix))
+            for (username, user), suffix in zip(users.items(), time_ordered_ids(len(users)))
+        ])
+
+        Room.objects.bulk_create([
+            Room(
+                title='%s room %s' % (self.prefix.title(), number),
+                slug='%s-room-%05d' % (self.prefix, number),
+                privacy=Room.PUBLIC if rng.random() < 0.8 else Room.SECRET,
+                description='Synthetic room %s for benchmarks' % number,
+                creator=users['%s-%05d-00' % (self.prefix, number)]
+            ) for number in numbers
+        ])
+        rooms = {room.slug: room for room in Room.objects.get_queryset().filter(slug__in=[
+            '%s-room-%05d' % (self.prefix, number) for number in numbers
+        ])}
+        ManagerialSetting.objects.bulk_create([
+            ManagerialSetting(room=room, shopping_type=rng.choice([0, 1])) for room in rooms.values()
+        ])
+
+        memberships = []
+        for number in numbers:
+            room = rooms['%s-room-%05d' % (self.prefix, number)]
+            for index in range(member_count):
+                username    = '%s-%05d-%02d' % (self.prefix, number, index)
+                role        = Membership.MANAGER if index == 0 else Membership.SUPERVISOR if index == 1 else Membership.MEMBER
+                memberships.append(Membership(user=users[username], room=room, role=role, slug=username))
+        Membership.objects.bulk_create(memberships)
+        members = list(Membership.objects.filter(user__username__in=usernames).select_related('room'))
+        TotalHolder.objects.bulk_create([TotalHolder(member=member) for member in members])
+
+        counts = {'rooms': len(rooms), 'members': len(members), 'meals': 0, 'shoppings': 0, 'member_tracks': 0, 'deposits': 0}
+        for month in months:
+            counts['meals']         += self.seed_meals(members, month)
+            counts['shoppings']     += self.seed_shoppings(members, month, shoppings)
+            counts['member_tracks'] += self.seed_cost_sectors(rooms.values(), members, month)
+            counts['deposits']      += self.seed_deposits(rooms.values(), members, month)
+        return counts
+
+    def seed_meals(self, members, month):
+        end     = month_bounds(month)[1]
+        days    = [month + datetime.timedelta(days=n) for n in range((end - month).days)]
+        meals   = []
+        for member in members:
+            for day in days:
+                meals.append(Meal(
+                    member=member,
+                    slug='%s-%s-' % (member.slug, day.strftime("%d")),
+                    meal_today=Decimal(self.rng.choice(['0.00', '1.00', '2.00', '2.00', '3.00'])),
+                    meal_next_day=None,
+                    meal_date=day,
+                    confirmed_by=member
+                ))
+        for meal, suffix in zip(meals, time_ordered_ids(len(meals))):
+            meal.slug += suffix
+        Meal.objects.bulk_create(meals)
+        return len(meals)
+
+    def seed_shoppings(self, members, month, per_member):
+        end         = month_bounds(month)[1]
+        days        = (end - month).days
+        shoppings   = []
+        for member in members:
+            for _ in range(per_member):
+                item = self.rng.choice(ITEMS)
+                shoppings.append(Shopping(
+                    created_by=member,
+                    item=item,
+                    slug='%s-reg-' % item,
+                    quantity=Decimal(self.rng.randint(1, 5)),
+                    quantity_unit='kg',
+                    cost=Decimal(self.rng.randint(50, 900)),
+                    shop_type=Shopping.MANAGERIAL if member.role == Membership.MANAGER else Shopping.INDIVIDUAL,
+                    date=datetime.datetime.combine(month, datetime.time(12)) + datetime.timedelta(days=self.rng.randrange(days))
+                ))
+        for shopping, suffix in zip(shoppings, time_ordered_ids(len(shoppings))):
+            shopping.slug += suffix
+        Shopping.objects.bulk_create(shoppings)
+        return len(shoppings)
+
+    def seed_cost_sectors(self, rooms, members, month):
+        created_at  = datetime.datetime.combine(month, datetime.time(9))
+        tag         = month.strftime("%Y%m")
+        fields      = [
+            TrackerField(room=room, title=title, slug='%s-%s-%s' % (room.slug, title.lower(), tag))
+            for room in rooms for title in COST_SECTORS
+        ]
+        TrackerField.objects.bulk_create(fields)
+        fields = TrackerField.objects.filter(slug__in=[field.slug for field in fields])
+        fields.update(created_at=created_at)
+        tracks = []
+        by_room = {}
+        for field in fields:
+            by_room.setdefault(field.room_id, []).append(field)
+        for member in members:
+            for field in by_room.get(member.room_id, []):
+                tracks.append(MemberTrack(tracker_field=field, member=member, cost=Decimal(self.rng.randint(100, 2000))))
+        MemberTrack.objects.bulk_create(tracks)
+        # auto_now_add fields can only be backdated after the insert
+        MemberTrack.objects.filter(tracker_field__in=fields).update(created_at=created_at)
+        return len(tracks)
+
+    def seed_deposits(self, rooms, members, month):
+        created_at  = datetime.datetime.combine(month, datetime.time(10))
+        title       = month.strftime("%b-%Y")
+        fields      = [
+            CashDepositField(room=room, title=title, slug='%s-deposit-%s' % (room.slug, month.strftime("%Y%m")))
+            for room in rooms
+        ]
+        CashDepositField.objects.bulk_create(fields)
+        fields = {field.room_id: field for field in CashDepositField.objects.filter(slug__in=[field.slug for field in fields])}
+        CashDepositField.objects.filter(pk__in=[field.pk for field in fields.values()]).update(created_at=created_at)
+        deposits = [
+            CashDepositMember(deposit_field=fields[member.room_id], member=member, amount=Decimal(self.rng.randint(500, 5000)))
+            for member in members
+        ]
+        CashDepositMember.objects.bulk_create(deposits)
+        CashDepositMember.objects.filter(deposit_field__in=fields.values()).update(created_at=created_at)
+        return len(deposits)
@@ -0,0 +1,68 @@
+# Generated by Django 2.1.3 on 2026-10-18 19:22
+
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import ExtractYear, ExtractMonth
+import django.db.models.deletion
+
+
+def build_ledger(apps, schema_editor):
+    MonthlyLedger       = apps.get_model('tracker', 'MonthlyLedger')
+    Meal                = apps.get_model('tracker', 'Meal')
+    Shopping            = apps.get_model('tracker', 'Shopping')
+    MemberTrack         = apps.get_model('tracker', 'MemberTrack')
+    CashDepositMember   = apps.get_model('tracker', 'CashDepositMember')
+    sources = (
+        (Meal.objects.filter(meal_date__isnull=False), 'member', 'meal_date', 'meal_today', 'meal_total'),
+        (Shopping.objects.filter(shop_type=0), 'created_by', 'date', 'cost', 'shopping_total'),
+        (Shopping.objects.filter(shop_type=1), 'created_by', 'date', 'cost', 'monthly_shopping_total'),
+        (MemberTrack.objects.filter(member__isnull=False), 'member', 'created_at', 'cost', 'cost_sector_total'),
+        (CashDepositMember.objects.filter(member__isnull=False), 'member', 'created_at', 'amount', 'deposit_total'),
+    )
+    rows = {}
+    for queryset, member_field, date_field, value_field, field in sources:
+        grouped = queryset.annotate(
+            ledger_year=ExtractYear(date_field), ledger_month=ExtractMonth(date_field)
+        ).order_by().values(member_field, 'ledger_year', 'ledger_month').annotate(total=Sum(value_field))
+        for group in grouped:
+            key = (group[member_field], group['ledger_year'], group['ledger_month'])
+            ledger = rows.setdefault(key, MonthlyLedger(member_id=key[0], year=key[1], month=key[2]))
+            setattr(ledger, field, group['total'] or 0)
+    MonthlyLedger.objects.bulk_create(rows.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memberships', '0001_initial'),
+        ('tracker', '0048_auto_20190124_0208'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyLedger',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='year')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='month')),
+                ('meal_total', models.DecimalField(decimal_places=2, default=0, max_digits=9, verbose_name='meal total')),
+                ('shopping_total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='shopping total')),
+                ('monthly_shopping_total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='monthly shopping total')),
+                ('cost_sector_total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='cost sector total')),
+                ('deposit_total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='deposit total')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='member_ledger', to='memberships.Membership', verbose_name='member')),
+            ],
+            options={
+                'verbose_name': 'Monthly Ledger',
+                'verbose_name_plural': 'Monthly Ledgers',
+                'ordering': ['-year', '-month'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlyledger',
+            unique_together={('member', 'year', 'month')},
+        ),
+        migrations.RunPython(build_ledger, migrations.RunPython.noop),
+    ]
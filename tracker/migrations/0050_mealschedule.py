@@ -0,0 +1,69 @@
+# Generated by Django 2.1.3 on 2026-10-18 19:26
+
+import datetime
+from decimal import Decimal
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def convert_auto_entries(apps, schema_editor):
+    """
+    Auto entry used to write meal rows up to the end of the month. Turn the
+    rows written ahead of time into schedules and clear them.
+    """
+    Meal            = apps.get_model('tracker', 'Meal')
+    MealSchedule    = apps.get_model('tracker', 'MealSchedule')
+    MonthlyLedger   = apps.get_model('tracker', 'MonthlyLedger')
+    after           = datetime.date.today() + datetime.timedelta(days=1)
+    future_meals    = Meal.objects.filter(
+        meal_date__gt=after, auto_entry=True, auto_entry_value__isnull=False
+    ).order_by()
+    member_ids      = set(future_meals.values_list('member', flat=True))
+    months          = set()
+    for member_id in member_ids:
+        member_meals    = future_meals.filter(member_id=member_id).order_by('meal_date')
+        first_meal      = member_meals.first()
+        last_meal       = member_meals.last()
+        MealSchedule.objects.create(
+            member_id=member_id, value=first_meal.auto_entry_value,
+            start_date=first_meal.meal_date, end_date=last_meal.meal_date
+        )
+        months.update((member_id, meal_date.year, meal_date.month) for meal_date in member_meals.values_list('meal_date', flat=True))
+    future_meals.update(meal_today=None, meal_next_day=None, auto_entry=False, auto_entry_value=None)
+    for member_id, year, month in months:
+        total = Meal.objects.filter(
+            member_id=member_id, meal_date__year=year, meal_date__month=month
+        ).aggregate(total=Sum('meal_today'))['total']
+        MonthlyLedger.objects.filter(member_id=member_id, year=year, month=month).update(meal_total=total or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memberships', '0001_initial'),
+        ('tracker', '0049_monthlyledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealSchedule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.DecimalField(decimal_places=2, max_digits=4, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))], verbose_name='value')),
+                ('start_date', models.DateField(verbose_name='start date')),
+                ('end_date', models.DateField(blank=True, null=True, verbose_name='end date')),
+                ('expanded_until', models.DateField(blank=True, null=True, verbose_name='expanded until')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='member_meal_schedule', to='memberships.Membership', verbose_name='member')),
+            ],
+            options={
+                'verbose_name': 'Meal Schedule',
+                'verbose_name_plural': 'Meal Schedules',
+                'ordering': ['-start_date'],
+            },
+        ),
+        migrations.RunPython(convert_auto_entries, migrations.RunPython.noop),
+    ]
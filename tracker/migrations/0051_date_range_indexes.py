@@ -0,0 +1,29 @@
+# Generated by Django 2.1.3 on 2026-10-18 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0050_mealschedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cashdepositmember',
+            index=models.Index(fields=['member', 'created_at'], name='deposit_member_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['member', 'meal_date'], name='meal_member_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membertrack',
+            index=models.Index(fields=['member', 'created_at'], name='membertrack_member_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopping',
+            index=models.Index(fields=['created_by', 'shop_type', 'date'], name='shopping_creator_type_date_idx'),
+        ),
+    ]
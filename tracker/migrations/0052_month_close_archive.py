@@ -0,0 +1,107 @@
+# Generated by Django 2.1.3 on 2026-10-18 19:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0006_auto_20190113_0315'),
+        ('memberships', '0001_initial'),
+        ('tracker', '0051_date_range_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCashDepositMember',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, default=0.0, max_digits=7, null=True, verbose_name='amount')),
+                ('created_at', models.DateTimeField(verbose_name='created at')),
+                ('updated_at', models.DateTimeField(verbose_name='updated at')),
+                ('deposit_field', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracker.CashDepositField', verbose_name='deposit field')),
+                ('member', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='memberships.Membership', verbose_name='member')),
+            ],
+            options={
+                'verbose_name': 'Archived Member Cash Deposit',
+                'verbose_name_plural': 'Archived Member Cash Deposits',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedMeal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(blank=True, unique=True, verbose_name='slug')),
+                ('meal_today', models.DecimalField(decimal_places=2, max_digits=4, null=True, verbose_name='meal today')),
+                ('meal_next_day', models.DecimalField(decimal_places=2, max_digits=4, null=True, verbose_name='meal next day')),
+                ('auto_entry', models.BooleanField(default=True, verbose_name='auto entry')),
+                ('auto_entry_value', models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True, verbose_name='auto entry value')),
+                ('meal_date', models.DateField(blank=True, null=True, verbose_name='meal date')),
+                ('created_at', models.DateTimeField(verbose_name='created at')),
+                ('updated_at', models.DateTimeField(verbose_name='updated at')),
+                ('confirmed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='memberships.Membership', verbose_name='confirmed by')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='memberships.Membership', verbose_name='member')),
+            ],
+            options={
+                'verbose_name': 'Archived Meal Entry',
+                'verbose_name_plural': 'Archived Meal Entries',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedShopping',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item', models.CharField(max_length=50, verbose_name='item')),
+                ('slug', models.SlugField(blank=True, unique=True, verbose_name='slug')),
+                ('quantity', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='quantity')),
+                ('quantity_unit', models.CharField(blank=True, max_length=10, null=True, verbose_name='quantity unit')),
+                ('cost', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='cost')),
+                ('shop_type', models.PositiveSmallIntegerField(choices=[(0, 'INDIVIDUAL'), (1, 'MANAGERIAL')], default=0, verbose_name='shop type')),
+                ('date', models.DateTimeField(verbose_name='date')),
+                ('created_at', models.DateTimeField(verbose_name='created at')),
+                ('updated_at', models.DateTimeField(verbose_name='updated at')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='memberships.Membership', verbose_name='created by')),
+            ],
+            options={
+                'verbose_name': 'Archived Shopping',
+                'verbose_name_plural': 'Archived Shoppings',
+            },
+        ),
+        migrations.CreateModel(
+            name='ClosedMonth',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='year')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='month')),
+                ('meals', models.PositiveIntegerField(default=0, verbose_name='archived meals')),
+                ('shoppings', models.PositiveIntegerField(default=0, verbose_name='archived shoppings')),
+                ('deposits', models.PositiveIntegerField(default=0, verbose_name='archived deposits')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='memberships.Membership', verbose_name='closed by')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closed_months', to='rooms.Room', verbose_name='room')),
+            ],
+            options={
+                'verbose_name': 'Closed Month',
+                'verbose_name_plural': 'Closed Months',
+                'ordering': ['-year', '-month'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='closedmonth',
+            unique_together={('room', 'year', 'month')},
+        ),
+        migrations.AddIndex(
+            model_name='archivedshopping',
+            index=models.Index(fields=['created_by', 'shop_type', 'date'], name='archived_shop_creator_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmeal',
+            index=models.Index(fields=['member', 'meal_date'], name='archived_meal_member_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcashdepositmember',
+            index=models.Index(fields=['member', 'created_at'], name='archived_deposit_member_idx'),
+        ),
+    ]
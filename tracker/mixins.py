@@ -0,0 +1,48 @@
+import datetime
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from accounts.middleware import get_member_context
+from .cache import CHART_CACHE_TIMEOUT, chart_cache_key, chart_cacheable
+
+
+class RoomChartCacheMixin(object):
+    """
+    Renders `chart_template_name` once per room, month and data version and
+    serves it from the cache until the room data changes. The page template
+    shows it as `chart_html`; the queryset and context of the view are only
+    built on a cache miss.
+    """
+    chart_cache_name    = None
+    chart_template_name = None
+
+    def get_chart_context(self):
+        # the snippets are rendered without base.html, which sets the flags
+        # they use from template tags; a change of the room setting bumps the
+        # room cache, so only the modifier flag needs its own copy
+        member_context  = get_member_context(self.request)
+        context         = self.get_context_data()
+        context.update({
+            'is_modifier'   : member_context.is_modifier,
+            'room_setting'  : member_context.room_setting,
+        })
+        return context
+
+    def get_chart_vary(self):
+        # pages showing modifier-only buttons inside the chart keep two copies
+        return (int(get_member_context(self.request).is_modifier),)
+
+    def get(self, request, *args, **kwargs):
+        room = get_member_context(request).room
+        if room is None:
+            return super(RoomChartCacheMixin, self).get(request, *args, **kwargs)
+        today       = datetime.date.today()
+        key         = chart_cache_key(self.chart_cache_name, room.pk, today, *self.get_chart_vary())
+        chart_html  = cache.get(key)
+        self.object_list = None
+        if chart_html is None:
+            self.object_list    = self.get_queryset()
+            chart_html          = render_to_string(self.chart_template_name, self.get_chart_context(), request)
+            if chart_cacheable(room.pk, today):
+                cache.set(key, chart_html, CHART_CACHE_TIMEOUT)
+        return self.render_to_response({'view': self, 'chart_html': mark_safe(chart_html)})
@@ -3,10 +3,16 @@ from rooms.models import Room, ManagerialSetting
 from memberships.models import Membership
 from django.core.validators import MinValueValidator
 from decimal import Decimal
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 import datetime
-from django.db.models import F, Sum
+import threading
+from contextlib import contextmanager
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum, Prefetch, OuterRef, Subquery
+from django.db.models.functions import ExtractYear, ExtractMonth, Coalesce
+from accounts.utils import time_ordered_ids, month_bounds, month_range
+from .cache import bump_room_cache
 
 
 class Meal(models.Model):
@@ -35,6 +41,7 @@ class Meal(models.Model):
         verbose_name        = "Meal Entry"
         verbose_name_plural = "Meal Entries"
         ordering            = ["-member__created_at"]
+        indexes             = [models.Index(fields=['member', 'meal_date'], name='meal_member_date_idx')]
 
     def __str__(self):
         return self.member.user.username
@@ -43,6 +50,173 @@ class Meal(models.Model):
     get_room.short_description = 'Room'
 
 
+class MealScheduleManager(models.Manager):
+    def start(self, member, value, start_date):
+        """
+        Replaces the auto entry of a member from start_date onwards by an
+        open ended schedule of value meals per day.
+        """
+        self.stop(member, start_date - datetime.timedelta(days=1))
+        return self.create(member=member, value=value, start_date=start_date)
+
+    def stop(self, member, after):
+        """
+        Ends every auto entry schedule of a member on the given date.
+        """
+        self.filter(member=member, start_date__gt=after).delete()
+        self.filter(
+            models.Q(end_date__isnull=True) | models.Q(end_date__gt=after), member=member
+        ).update(end_date=after, updated_at=datetime.datetime.now())
+        # the charts show the pending days of the schedules
+        bump_room_cache(member.room_id)
+
+    def pending(self, room, start_date, end_date):
+        """
+        {(member id, date): value} of the scheduled days of a room between
+        start_date and end_date (today at the latest) that are not written
+        as meals yet, read at display time instead of writing them. Days
+        holding a meal value are left out.
+        """
+        end_date    = min(end_date, datetime.date.today())
+        schedules   = self.filter(member__room=room, start_date__lte=end_date).filter(
+            models.Q(end_date__isnull=True) | models.Q(end_date__gte=start_date)
+        ).only('member', 'value', 'start_date', 'end_date', 'expanded_until').order_by('start_date')
+        days = {}
+        for schedule in schedules:
+            first   = max(start_date, schedule.start_date)
+            if schedule.expanded_until is not None:
+                first = max(first, schedule.expanded_until + datetime.timedelta(days=1))
+            last    = end_date if schedule.end_date is None else min(end_date, schedule.end_date)
+            while first <= last:
+                days[(schedule.member_id, first)] = schedule.value
+                first += datetime.timedelta(days=1)
+        if days:
+            filled = Meal.objects.filter(
+                member__room=room, meal_date__gte=start_date, meal_date__lte=end_date, meal_today__isnull=False
+            ).values_list('member_id', 'meal_date')
+            for key in filled:
+                days.pop(key, None)
+        return days
+
+    def pending_totals(self, room, start_date, end_date):
+        """
+        {member id: meals} of the days pending() returns, added to the meal
+        totals of the ledger, which only counts written meals.
+        """
+        totals = {}
+        for (member_id, day), value in self.pending(room, start_date, end_date).items():
+            totals[member_id] = totals.get(member_id, 0) + value
+        return totals
+
+    def expand(self, member=None, room=None, until=None):
+        """
+        Writes the scheduled meals that are due (up to `until`, today by
+        default) as Meal rows. Days already holding a meal are left alone.
+        Runs in a transaction, which also keeps its reads on the primary.
+
+        Only write paths expand (the meal forms and closing a month), the
+        pages and totals read the days not written yet with pending().
+        """
+        with transaction.atomic():
+            self._expand(member, room, until)
+
+    def _expand(self, member, room, until):
+        until       = until or datetime.date.today()
+        schedules   = self.filter(start_date__lte=until).filter(
+            models.Q(expanded_until__isnull=True) | models.Q(expanded_until__lt=until)
+        ).exclude(
+            expanded_until__isnull=False, end_date__isnull=False, expanded_until__gte=F('end_date')
+        ).select_related('member__user')
+        if member is not None:
+            schedules = schedules.filter(member=member)
+        if room is not None:
+            schedules = schedules.filter(member__room=room)
+        months = set()
+        rooms  = set()
+        for schedule in schedules:
+            start_date  = schedule.start_date
+            if schedule.expanded_until is not None:
+                start_date = max(start_date, schedule.expanded_until + datetime.timedelta(days=1))
+            end_date    = until if schedule.end_date is None else min(until, schedule.end_date)
+            if start_date <= end_date:
+                months.update(
+                    (schedule.member_id, year, month) for year, month in schedule.write_meals(start_date, end_date)
+                )
+                rooms.add(schedule.member.room_id)
+            schedule.expanded_until = end_date
+            schedule.save(update_fields=['expanded_until', 'updated_at'])
+        for member_id, year, month in months:
+            MonthlyLedger.objects.refresh(member_id, year, month)
+        # the meals are bulk created, no signal bumps the cached charts
+        for room_id in rooms:
+            bump_room_cache(room_id, *(datetime.date(year, month, 1) for member_id, year, month in months))
+
+
+class MealSchedule(models.Model):
+    member          = models.ForeignKey(
+        Membership, on_delete=models.CASCADE, related_name='member_meal_schedule', verbose_name=('member')
+    )
+    value           = models.DecimalField(
+        decimal_places=2, max_digits=4, validators=[MinValueValidator(Decimal('0.00'))], verbose_name=('value')
+    )
+    start_date      = models.DateField(verbose_name=('start date'))
+    end_date        = models.DateField(null=True, blank=True, verbose_name=('end date'))
+    expanded_until  = models.DateField(null=True, blank=True, verbose_name=('expanded until'))
+    created_at      = models.DateTimeField(auto_now_add=True, verbose_name=('created at'))
+    updated_at      = models.DateTimeField(auto_now=True, verbose_name=('updated at'))
+
+    objects = MealScheduleManager()
+
+    class Meta:
+        verbose_name        = "Meal Schedule"
+        verbose_name_plural = "Meal Schedules"
+        ordering            = ["-start_date"]
+
+    def __str__(self):
+        return self.member.user.username
+
+    def get_room(self):
+        return self.member.room.title
+    get_room.short_description = 'Room'
+
+    def covers(self, date):
+        return self.start_date <= date and (self.end_date is None or date <= self.end_date)
+
+    def write_meals(self, start_date, end_date):
+        member_meals = Meal.objects.filter(
+            member_id=self.member_id, meal_date__gte=start_date, meal_date__lte=end_date
+        )
+        existing_dates = set(member_meals.values_list('meal_date', flat=True))
+        member_meals.filter(meal_today__isnull=True).update(
+            meal_today          = self.value,
+            meal_next_day       = self.value,
+            auto_entry          = True,
+            auto_entry_value    = self.value,
+            confirmed_by        = self.member
+        )
+        missing_meals   = []
+        months          = set()
+        single_date = start_date
+        while single_date <= end_date:
+            months.add((single_date.year, single_date.month))
+            if single_date not in existing_dates:
+                missing_meals.append(Meal(
+                    member_id           = self.member_id,
+                    meal_today          = self.value,
+                    meal_next_day       = self.value,
+                    auto_entry          = True,
+                    auto_entry_value    = self.value,
+                    meal_date           = single_date,
+                    slug                = self.member.user.username.lower()+'-'+single_date.strftime("%d")+'-',
+                    confirmed_by_id     = self.member_id
+                ))
+            single_date += datetime.timedelta(days=1)
+        for meal, suffix in zip(missing_meals, time_ordered_ids(len(missing_meals))):
+            meal.slug += suffix
+        Meal.objects.bulk_create(missing_meals)
+        return months
+
+
 class MealUpdateRequest(models.Model):
     member  = models.ForeignKey(
         Membership, on_delete=models.CASCADE, related_name='member_meal_update', verbose_name=('member')
@@ -86,6 +260,48 @@ class TrackerField(models.Model):
     def __str__(self):
         return self.title
 
+class FieldAllocationManager(models.Manager):
+    """
+    Rows giving every member of a room an entry of a room field
+    (MemberTrack of a TrackerField, CashDepositMember of a CashDepositField).
+    """
+    field_name = None
+
+    def allocate(self, room, fields, members, **values):
+        """
+        Creates the missing (field, member) rows of `fields` x `members`
+        (instances or ids) with `values`. The pairs already allocated are
+        read in one query and the rest written with a single bulk_create,
+        whatever the room size. No signal is sent: keep the values at zero
+        or refresh the ledger afterwards. Returns the rows created.
+        """
+        field_ids   = [getattr(field, 'pk', field) for field in fields]
+        member_ids  = [getattr(member, 'pk', member) for member in members]
+        if not field_ids or not member_ids:
+            return []
+        field_key = self.field_name + '_id'
+        with transaction.atomic():
+            existing = set(self.filter(**{
+                field_key + '__in': field_ids, 'member_id__in': member_ids
+            }).values_list(field_key, 'member_id'))
+            missing = [
+                self.model(member_id=member_id, **dict(values, **{field_key: field_id}))
+                for field_id in field_ids for member_id in member_ids if (field_id, member_id) not in existing
+            ]
+            self.bulk_create(missing)
+            if missing:
+                bump_room_cache(getattr(room, 'pk', room))
+        return missing
+
+
+class MemberTrackManager(FieldAllocationManager):
+    field_name = 'tracker_field'
+
+
+class CashDepositMemberManager(FieldAllocationManager):
+    field_name = 'deposit_field'
+
+
 class MemberTrack(models.Model):
     tracker_field   = models.ForeignKey(
         TrackerField, on_delete=models.CASCADE, null=True, blank=True, related_name='member_track_field', verbose_name=('cost sector')
@@ -100,10 +316,13 @@ class MemberTrack(models.Model):
     created_at      = models.DateTimeField(auto_now_add=True, verbose_name=('created at'))
     updated_at      = models.DateTimeField(auto_now=True, verbose_name=('updated at'))
 
+    objects = MemberTrackManager()
+
     class Meta:
         verbose_name        = "Member Track"
         verbose_name_plural = "Member Tracks"
         ordering            = ["-member__room__created_at"]
+        indexes             = [models.Index(fields=['member', 'created_at'], name='membertrack_member_created_idx')]
 
     def __str__(self):
         return self.member.user.username
@@ -183,6 +402,7 @@ class Shopping(models.Model):
         verbose_name        = "Shopping"
         verbose_name_plural = "Shoppings"
         ordering            = ["-created_by__room__created_at"]
+        indexes             = [models.Index(fields=['created_by', 'shop_type', 'date'], name='shopping_creator_type_date_idx')]
 
     def __str__(self):
         return self.item
@@ -224,10 +444,13 @@ class CashDepositMember(models.Model):
     created_at      = models.DateTimeField(auto_now_add=True, verbose_name=('created at'))
     updated_at      = models.DateTimeField(auto_now=True, verbose_name=('updated at'))
 
+    objects = CashDepositMemberManager()
+
     class Meta:
         verbose_name        = "Member Cash Deposit"
         verbose_name_plural = "Member Cash Deposits"
         ordering            = ["-member__room__created_at"]
+        indexes             = [models.Index(fields=['member', 'created_at'], name='deposit_member_created_idx')]
 
     def __str__(self):
         return self.member.user.username
@@ -236,6 +459,344 @@ class CashDepositMember(models.Model):
         return self.member.room.title
     get_room.short_description = 'Room'
 
+class ArchivedMeal(models.Model):
+    """
+    Meal row of a closed month, same columns as Meal.
+    """
+    member              = models.ForeignKey(
+        Membership, on_delete=models.CASCADE, related_name='+', verbose_name=('member')
+    )
+    slug                = models.SlugField(blank=True, unique=True, verbose_name=('slug'))
+    meal_today          = models.DecimalField(decimal_places=2, max_digits=4, null=True, verbose_name=('meal today'))
+    meal_next_day       = models.DecimalField(decimal_places=2, max_digits=4, null=True, verbose_name=('meal next day'))
+    auto_entry          = models.BooleanField(default=True, verbose_name=('auto entry'))
+    auto_entry_value    = models.DecimalField(
+        null=True, blank=True, decimal_places=2, max_digits=4, verbose_name=('auto entry value')
+    )
+    meal_date           = models.DateField(null=True, blank=True, verbose_name=('meal date'))
+    confirmed_by        = models.ForeignKey(
+        Membership, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name=('confirmed by')
+    )
+    created_at          = models.DateTimeField(verbose_name=('created at'))
+    updated_at          = models.DateTimeField(verbose_name=('updated at'))
+
+    class Meta:
+        verbose_name        = "Archived Meal Entry"
+        verbose_name_plural = "Archived Meal Entries"
+        indexes             = [models.Index(fields=['member', 'meal_date'], name='archived_meal_member_date_idx')]
+
+    def __str__(self):
+        return self.member.user.username
+
+class ArchivedShopping(models.Model):
+    """
+    Shopping row of a closed month, same columns as Shopping.
+    """
+    created_by      = models.ForeignKey(
+        Membership, on_delete=models.CASCADE, related_name='+', verbose_name=('created by')
+    )
+    item            = models.CharField(max_length = 50, verbose_name = ('item'))
+    slug            = models.SlugField(blank=True, unique=True, verbose_name=('slug'))
+    quantity        = models.DecimalField(null=True, blank=True, decimal_places=2, max_digits=8, verbose_name=('quantity'))
+    quantity_unit   = models.CharField(null=True, blank=True, max_length = 10, verbose_name = ('quantity unit'))
+    cost            = models.DecimalField(decimal_places=2, max_digits=8, verbose_name=('cost'))
+    shop_type       = models.PositiveSmallIntegerField(
+        choices=Shopping.SHOP_TYPE_CHOICES, default=0, verbose_name=('shop type')
+    )
+    date            = models.DateTimeField(verbose_name=('date'))
+    created_at      = models.DateTimeField(verbose_name=('created at'))
+    updated_at      = models.DateTimeField(verbose_name=('updated at'))
+
+    class Meta:
+        verbose_name        = "Archived Shopping"
+        verbose_name_plural = "Archived Shoppings"
+        indexes             = [models.Index(fields=['created_by', 'shop_type', 'date'], name='archived_shop_creator_date_idx')]
+
+    def __str__(self):
+        return self.item
+
+class ArchivedCashDepositMember(models.Model):
+    """
+    Member cash deposit of a closed month, same columns as CashDepositMember.
+    """
+    deposit_field   = models.ForeignKey(
+        CashDepositField, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name=('deposit field')
+    )
+    amount          = models.DecimalField(
+        null=True, blank=True, decimal_places=2, max_digits=7, default=0.00, verbose_name=('amount')
+    )
+    member          = models.ForeignKey(
+        Membership, null=True, blank=True, on_delete=models.CASCADE, related_name='+', verbose_name=('member')
+    )
+    created_at      = models.DateTimeField(verbose_name=('created at'))
+    updated_at      = models.DateTimeField(verbose_name=('updated at'))
+
+    class Meta:
+        verbose_name        = "Archived Member Cash Deposit"
+        verbose_name_plural = "Archived Member Cash Deposits"
+        indexes             = [models.Index(fields=['member', 'created_at'], name='archived_deposit_member_idx')]
+
+    def __str__(self):
+        return self.member.user.username
+
+def _as_date(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.datetime.strptime(value[:10], "%Y-%m-%d").date()
+    return value
+
+def _as_decimal(value):
+    if value is None or value == '':
+        return Decimal('0.00')
+    return Decimal(str(value))
+
+def ledger_entry(instance):
+    """
+    Returns (member_id, year, month, ledger field, value) booked by a
+    Meal, Shopping, MemberTrack or CashDepositMember row, or None.
+    """
+    if isinstance(instance, Meal):
+        member_id, date, field, value = instance.member_id, _as_date(instance.meal_date), 'meal_total', instance.meal_today
+    elif isinstance(instance, Shopping):
+        field = 'monthly_shopping_total' if instance.shop_type == Shopping.MANAGERIAL else 'shopping_total'
+        member_id, date, value = instance.created_by_id, _as_date(instance.date), instance.cost
+    elif isinstance(instance, MemberTrack):
+        member_id, date, field, value = instance.member_id, _as_date(instance.created_at), 'cost_sector_total', instance.cost
+    elif isinstance(instance, CashDepositMember):
+        member_id, date, field, value = instance.member_id, _as_date(instance.created_at), 'deposit_total', instance.amount
+    else:
+        return None
+    if member_id is None or date is None:
+        return None
+    return (member_id, date.year, date.month, field, _as_decimal(value))
+
+
+class MonthlyLedgerQuerySet(models.query.QuerySet):
+    def for_month(self, year, month):
+        return self.filter(year=year, month=month)
+
+    def for_room(self, room):
+        return self.filter(member__room=room)
+
+    def totals(self):
+        totals = self.aggregate(
+            meal_total              = Sum('meal_total'),
+            shopping_total          = Sum('shopping_total'),
+            monthly_shopping_total  = Sum('monthly_shopping_total'),
+            cost_sector_total       = Sum('cost_sector_total'),
+            deposit_total           = Sum('deposit_total'),
+        )
+        return {field: total or 0 for field, total in totals.items()}
+
+
+class MonthlyLedgerManager(models.Manager):
+    def get_queryset(self):
+        return MonthlyLedgerQuerySet(self.model, using=self._db)
+
+    def for_month(self, year, month):
+        return self.get_queryset().for_month(year, month)
+
+    def for_room(self, room):
+        return self.get_queryset().for_room(room)
+
+    def add(self, member_id, year, month, field, delta):
+        return self.filter(member_id=member_id, year=year, month=month).update(
+            **{field: F(field) + delta, 'updated_at': datetime.datetime.now()}
+        )
+
+    def apply(self, member_id, year, month, field, delta, create=True):
+        """
+        Adds delta to one ledger column. A missing ledger row is created from
+        the source tables, which already hold the change (never on delete,
+        the member may be going away too). When a concurrent first write of
+        the month created the row in between, the unique key rejects ours
+        and the delta goes to that row instead: it was summed in the other
+        transaction, which could not see this change yet.
+        """
+        if not delta or self.add(member_id, year, month, field, delta) or not create:
+            return
+        rows    = self.calculate(Membership.objects.filter(pk=member_id), year, month)
+        ledger  = rows.get((member_id, year, month))
+        try:
+            with transaction.atomic():
+                if ledger is None:
+                    # the change is not in the sources, start the month from zero
+                    self.create(member_id=member_id, year=year, month=month)
+                    self.add(member_id, year, month, field, delta)
+                else:
+                    ledger.save(force_insert=True)
+        except IntegrityError:
+            self.add(member_id, year, month, field, delta)
+
+    def book(self, old_entry, new_entry, create=True):
+        if old_entry == new_entry:
+            return
+        if old_entry and new_entry and old_entry[:4] == new_entry[:4]:
+            self.apply(*new_entry[:4], new_entry[4] - old_entry[4], create=create)
+            return
+        if old_entry:
+            self.apply(*old_entry[:4], -old_entry[4], create=create)
+        if new_entry:
+            self.apply(*new_entry[:4], new_entry[4], create=create)
+
+    def refresh(self, member, year=None, month=None):
+        """
+        Recalculates the ledger of a member (optionally a single month) from
+        Meal, Shopping, MemberTrack and CashDepositMember rows.
+        """
+        member_id = getattr(member, 'pk', member)
+        members   = Membership.objects.filter(pk=member_id)
+        if not members.exists():
+            return
+        self.rebuild(members=members, year=year, month=month)
+
+    def calculate(self, members, year=None, month=None):
+        """
+        Unsaved ledger rows of the members by (member id, year, month),
+        summed from the source tables.
+        """
+        sources = (
+            (Meal.objects.filter(member__in=members, meal_date__isnull=False), 'member', 'meal_date', 'meal_today', 'meal_total'),
+            (Shopping.objects.filter(created_by__in=members, shop_type=Shopping.INDIVIDUAL), 'created_by', 'date', 'cost', 'shopping_total'),
+            (Shopping.objects.filter(created_by__in=members, shop_type=Shopping.MANAGERIAL), 'created_by', 'date', 'cost', 'monthly_shopping_total'),
+            (MemberTrack.objects.filter(member__in=members), 'member', 'created_at', 'cost', 'cost_sector_total'),
+            (CashDepositMember.objects.filter(member__in=members), 'member', 'created_at', 'amount', 'deposit_total'),
+            # rows of closed months
+            (ArchivedMeal.objects.filter(member__in=members, meal_date__isnull=False), 'member', 'meal_date', 'meal_today', 'meal_total'),
+            (ArchivedShopping.objects.filter(created_by__in=members, shop_type=Shopping.INDIVIDUAL), 'created_by', 'date', 'cost', 'shopping_total'),
+            (ArchivedShopping.objects.filter(created_by__in=members, shop_type=Shopping.MANAGERIAL), 'created_by', 'date', 'cost', 'monthly_shopping_total'),
+            (ArchivedCashDepositMember.objects.filter(member__in=members), 'member', 'created_at', 'amount', 'deposit_total'),
+        )
+        rows = {}
+        for queryset, member_field, date_field, value_field, field in sources:
+            # range filters first so the date indexes narrow the scan
+            if year and month:
+                queryset = queryset.filter(**month_range(date_field, datetime.date(year, month, 1)))
+            elif year:
+                queryset = queryset.filter(**{
+                    date_field + '__gte': datetime.date(year, 1, 1), date_field + '__lt': datetime.date(year + 1, 1, 1)
+                })
+            queryset = queryset.annotate(
+                ledger_year=ExtractYear(date_field), ledger_month=ExtractMonth(date_field)
+            )
+            if month and not year:
+                queryset = queryset.filter(ledger_month=month)
+            grouped = queryset.order_by().values(member_field, 'ledger_year', 'ledger_month').annotate(
+                total=Sum(value_field)
+            )
+            for group in grouped:
+                key = (group[member_field], group['ledger_year'], group['ledger_month'])
+                if key[0] is None:
+                    continue
+                ledger = rows.setdefault(key, self.model(member_id=key[0], year=key[1], month=key[2]))
+                setattr(ledger, field, getattr(ledger, field) + (group['total'] or 0))
+        return rows
+
+    def rebuild(self, members=None, year=None, month=None):
+        """
+        Drops and recalculates ledger rows. Returns the number of rows written.
+        """
+        if members is None:
+            members = Membership.objects.all()
+        rows = self.calculate(members, year, month)
+        with transaction.atomic():
+            stale = self.filter(member__in=members)
+            if year:
+                stale = stale.filter(year=year)
+            if month:
+                stale = stale.filter(month=month)
+            stale.delete()
+            self.bulk_create(rows.values())
+        return len(rows)
+
+
+class MonthlyLedger(models.Model):
+    member                  = models.ForeignKey(
+        Membership, on_delete=models.CASCADE, related_name='member_ledger', verbose_name=('member')
+    )
+    year                    = models.PositiveSmallIntegerField(verbose_name=('year'))
+    month                   = models.PositiveSmallIntegerField(verbose_name=('month'))
+    meal_total              = models.DecimalField(
+        decimal_places=2, max_digits=9, default=0, verbose_name=('meal total')
+    )
+    shopping_total          = models.DecimalField(
+        decimal_places=2, max_digits=12, default=0, verbose_name=('shopping total')
+    )
+    monthly_shopping_total  = models.DecimalField(
+        decimal_places=2, max_digits=12, default=0, verbose_name=('monthly shopping total')
+    )
+    cost_sector_total       = models.DecimalField(
+        decimal_places=2, max_digits=12, default=0, verbose_name=('cost sector total')
+    )
+    deposit_total           = models.DecimalField(
+        decimal_places=2, max_digits=12, default=0, verbose_name=('deposit total')
+    )
+    created_at              = models.DateTimeField(auto_now_add=True, verbose_name=('created at'))
+    updated_at              = models.DateTimeField(auto_now=True, verbose_name=('updated at'))
+
+    objects = MonthlyLedgerManager()
+
+    class Meta:
+        verbose_name        = "Monthly Ledger"
+        verbose_name_plural = "Monthly Ledgers"
+        ordering            = ["-year", "-month"]
+        unique_together     = ("member", "year", "month")
+
+    def __str__(self):
+        return "%s (%s-%02d)" %(self.member.user.username, self.year, self.month)
+
+    def get_room(self):
+        return self.member.room.title
+    get_room.short_description = 'Room'
+
+
+class TotalHolderQuerySet(models.query.QuerySet):
+    def with_ledger(self):
+        """
+        Loads the current month ledger and the meals entered for the rest of
+        the month along with the members, so the totals need no extra query.
+        """
+        today = datetime.date.today()
+        return self.select_related('member').prefetch_related(
+            Prefetch(
+                'member__member_ledger',
+                queryset=MonthlyLedger.objects.for_month(today.year, today.month),
+                to_attr='current_ledger'
+            ),
+            Prefetch(
+                'member__member_meal',
+                queryset=Meal.objects.filter(meal_date__gt=today, meal_date__lt=month_bounds(today)[1]).only('member', 'meal_today'),
+                to_attr='upcoming_meals'
+            ),
+        )
+
+    def with_cost_sector_total(self):
+        """
+        Annotates the all-time cost sector total of every member, read by
+        get_total_cost_sector() instead of one aggregate per member.
+        """
+        totals = MonthlyLedger.objects.filter(member=OuterRef('member')).order_by().values('member').annotate(
+            total=Sum('cost_sector_total')
+        ).values('total')
+        return self.annotate(cost_sector_total=Coalesce(
+            Subquery(totals, output_field=models.DecimalField(max_digits=12, decimal_places=2)), 0
+        ))
+
+
+class TotalHolderManager(models.Manager):
+    def get_queryset(self):
+        return TotalHolderQuerySet(self.model, using=self._db)
+
+    def with_ledger(self):
+        return self.get_queryset().with_ledger()
+
+    def with_cost_sector_total(self):
+        return self.get_queryset().with_cost_sector_total()
+
+
 class TotalHolder(models.Model):
     member          = models.ForeignKey(
         Membership, on_delete=models.CASCADE, related_name='member_total_holder', verbose_name=('member')
@@ -243,6 +804,8 @@ class TotalHolder(models.Model):
     created_at      = models.DateTimeField(auto_now_add=True, verbose_name=('created at'))
     updated_at      = models.DateTimeField(auto_now=True, verbose_name=('updated at'))
 
+    objects = TotalHolderManager()
+
     def __str__(self):
         return self.member.user.username
     
@@ -255,107 +818,191 @@ class TotalHolder(models.Model):
         return self.member.room.title
     get_room.short_description = 'Room'
 
+    def get_ledger(self):
+        if not hasattr(self, '_ledger'):
+            ledgers = getattr(self.member, 'current_ledger', None)
+            if ledgers is None:
+                now     = datetime.datetime.now()
+                ledgers = MonthlyLedger.objects.filter(member=self.member, year=now.year, month=now.month)
+            self._ledger = next(iter(ledgers), None)
+        return self._ledger
+
+    def get_room_ledger(self):
+        if not hasattr(self, '_room_ledger'):
+            now = datetime.datetime.now()
+            self._room_ledger = MonthlyLedger.objects.for_room(self.member.room).for_month(now.year, now.month).totals()
+        return self._room_ledger
+
+    def get_upcoming_meal(self):
+        upcoming_meals = getattr(self.member, 'upcoming_meals', None)
+        if upcoming_meals is not None:
+            return sum(_as_decimal(meal.meal_today) for meal in upcoming_meals)
+        today = datetime.date.today()
+        total = Meal.objects.filter(
+            member=self.member, meal_date__gt=today, meal_date__lt=month_bounds(today)[1]
+        ).aggregate(total=Sum(F('meal_today'))).get('total')
+        return total or 0
+
+    def get_pending_meals(self):
+        # auto entry days of the room up to today not written as meals yet
+        if not hasattr(self, '_pending_meals'):
+            today = datetime.date.today()
+            self._pending_meals = MealSchedule.objects.pending_totals(self.member.room_id, today.replace(day=1), today)
+        return self._pending_meals
+
     def get_total_meal(self):
-        now             = datetime.datetime.now()
-        member_meals_filter = Meal.objects.filter(
-            member=self.member, meal_date__day__lte=now.day, meal_date__month=now.month, meal_date__year=now.year
-        ).only('meal_today')
-        if member_meals_filter.exists():
-            total = member_meals_filter.aggregate(total=Sum(F('meal_today'))).get('total',0.00)
-            return total
-        return 0
+        pending = self.get_pending_meals().get(self.member_id, 0)
+        ledger  = self.get_ledger()
+        if ledger is None:
+            return pending
+        return ledger.meal_total - self.get_upcoming_meal() + pending
 
     def get_total_meal_room(self):
-        now             = datetime.datetime.now()
-        total = 0
-        member_meals_filter = Meal.objects.filter(
-            member__room=self.member.room, meal_date__day__lte=now.day, meal_date__month=now.month, meal_date__year=now.year
-        ).only('meal_today')
-        if member_meals_filter.exists():
-            total = member_meals_filter.aggregate(total=Sum(F('meal_today'))).get('total',0.00)
-        return total
+        if not hasattr(self, '_total_meal_room'):
+            today = datetime.date.today()
+            upcoming = Meal.objects.filter(
+                member__room=self.member.room, meal_date__gt=today, meal_date__lt=month_bounds(today)[1]
+            ).aggregate(total=Sum(F('meal_today'))).get('total')
+            self._total_meal_room = (
+                self.get_room_ledger()['meal_total'] - (upcoming or 0) + sum(self.get_pending_meals().values())
+            )
+        return self._total_meal_room
 
     def get_total_cost_sector(self):
-        tracker_filter = MemberTrack.objects.filter(
-            member=self.member, member__room=self.member.room
-        )
-        if tracker_filter.exists():
-            total = tracker_filter.aggregate(total=Sum(F('cost'))).get('total',0.00)
-            return total
-        return 0
+        if hasattr(self, 'cost_sector_total'):
+            return self.cost_sector_total
+        total = MonthlyLedger.objects.filter(
+            member=self.member
+        ).aggregate(total=Sum(F('cost_sector_total'))).get('total')
+        return total or 0
 
     def get_total_cost_sector_room(self):
-        total = 0
-        tracker_filter = MemberTrack.objects.filter(
-            member__room=self.member.room
-        )
-        if tracker_filter.exists():
-            total = tracker_filter.aggregate(total=Sum(F('cost'))).get('total',0.00)
-        return total
+        total = MonthlyLedger.objects.for_room(self.member.room).aggregate(total=Sum(F('cost_sector_total'))).get('total')
+        return total or 0
 
     def get_total_shopping(self):
-        now     = datetime.datetime.now()
-        total   = 0
-        shopping_filter = Shopping.objects.filter(
-            created_by=self.member, created_by__room=self.member.room, shop_type=0, date__month=now.month, date__year=now.year
-        )
-        if shopping_filter.exists():
-            total = shopping_filter.aggregate(total=Sum(F('cost'))).get('total',0.00)
-        return total
+        ledger = self.get_ledger()
+        if ledger is None:
+            return 0
+        return ledger.shopping_total
 
     def get_total_shopping_room(self):
-        now     = datetime.datetime.now()
-        total   = 0
-        shopping_filter = Shopping.objects.filter(
-            created_by__room=self.member.room, shop_type=0, date__month=now.month, date__year=now.year
-        )
-        if shopping_filter.exists():
-            total = shopping_filter.aggregate(total=Sum(F('cost'))).get('total',0.00)
-        return total
+        return self.get_room_ledger()['shopping_total']
 
     def get_total_monthly_shopping(self):
-        now     = datetime.datetime.now()
-        total   = 0
-        shopping_filter = Shopping.objects.filter(
-            created_by__room=self.member.room, shop_type=1, date__month=now.month, date__year=now.year
-        )
-        if shopping_filter.exists():
-            total = shopping_filter.aggregate(total=Sum(F('cost'))).get('total',0.00)
-        return total
+        return self.get_room_ledger()['monthly_shopping_total']
 
     def get_grand_total_shopping(self):
         total   = 0
-        now     = datetime.datetime.now()
         shopping_type_filter = ManagerialSetting.objects.filter(
             room=self.member.room
         )
         if shopping_type_filter.exists():
             shopping_type = shopping_type_filter.first().shopping_type
-            shopping_filter = Shopping.objects.filter(
-                created_by__room=self.member.room, date__month=now.month, date__year=now.year
-            )
-            if shopping_filter.exists():
-                if shopping_type == 0:
-                    total = self.get_total_shopping_room() + self.get_total_monthly_shopping()
-                else:
-                    total = self.get_total_monthly_shopping()
+            if shopping_type == 0:
+                total = self.get_total_shopping_room() + self.get_total_monthly_shopping()
+            else:
+                total = self.get_total_monthly_shopping()
         return total
 
     def get_deposit_total_member(self):
-        now     = datetime.datetime.now()
-        total   = 0
-        deposit_filter = CashDepositMember.objects.filter(member=self.member, created_at__month=now.month, created_at__year=now.year)
-        if deposit_filter.exists():
-            total = deposit_filter.aggregate(total=Sum(F('amount'))).get('total',0.00)
-        return total
+        ledger = self.get_ledger()
+        if ledger is None:
+            return 0
+        return ledger.deposit_total
 
     def get_deposit_total_room(self):
-        now     = datetime.datetime.now()
-        total   = 0
-        deposit_filter = CashDepositMember.objects.filter(member__room=self.member.room, created_at__month=now.month, created_at__year=now.year)
-        if deposit_filter.exists():
-            total = deposit_filter.aggregate(total=Sum(F('amount'))).get('total',0.00)
-        return total
+        return self.get_room_ledger()['deposit_total']
+
+
+class ClosedMonthManager(models.Manager):
+    # (counter, hot model, archive model, member field, date field)
+    ARCHIVES = (
+        ('meals', Meal, ArchivedMeal, 'member', 'meal_date'),
+        ('shoppings', Shopping, ArchivedShopping, 'created_by', 'date'),
+        ('deposits', CashDepositMember, ArchivedCashDepositMember, 'member', 'created_at'),
+    )
+
+    def months(self, room):
+        """
+        (year, month) of every closed month of a room.
+        """
+        return set(self.filter(room=room).values_list('year', 'month'))
+
+    def close(self, room, year, month, closed_by=None, batch_size=1000):
+        """
+        Closes a finished month of a room: its auto entry schedules are
+        written, the ledger rows of its members are recalculated as the
+        summary of the month, then its meals, shoppings and deposits move
+        to the archive tables, batch by batch, each batch in its own
+        transaction. Closing again archives rows written after the first
+        close. Returns the ClosedMonth.
+        """
+        start = datetime.date(year, month, 1)
+        if month_bounds(start)[1] > datetime.date.today():
+            raise ValueError("%s is not finished yet." % start.strftime("%B %Y"))
+        members = Membership.objects.filter(room=room)
+        MealSchedule.objects.expand(room=room, until=month_bounds(start)[1] - datetime.timedelta(days=1))
+        MonthlyLedger.objects.rebuild(members=members, year=year, month=month)
+        closed = self.get_or_create(room=room, year=year, month=month, defaults={'closed_by': closed_by})[0]
+        for counter, model, archive, member_field, date_field in self.ARCHIVES:
+            rows    = model.objects.filter(**{member_field + '__in': members}).filter(**month_range(date_field, start))
+            moved   = self.archive_rows(rows, archive, batch_size)
+            if moved:
+                self.filter(pk=closed.pk).update(**{counter: F(counter) + moved, 'updated_at': datetime.datetime.now()})
+        # the receivers were paused while the rows moved
+        bump_room_cache(room.pk, start)
+        closed.refresh_from_db()
+        return closed
+
+    def archive_rows(self, queryset, archive, batch_size):
+        """
+        Copies the rows of queryset into the archive model (keeping their ids)
+        and deletes them. Returns the number of rows moved.
+        """
+        model = queryset.model
+        moved = 0
+        while True:
+            with transaction.atomic():
+                rows = list(queryset.select_for_update().order_by('pk').values()[:batch_size])
+                if not rows:
+                    break
+                archive.objects.bulk_create([archive(**row) for row in rows])
+                # the rows only move, the ledger must not be booked down
+                with ledger_receivers_paused():
+                    model.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            moved += len(rows)
+        return moved
+
+
+class ClosedMonth(models.Model):
+    room        = models.ForeignKey(
+        Room, on_delete=models.CASCADE, related_name='closed_months', verbose_name=('room')
+    )
+    year        = models.PositiveSmallIntegerField(verbose_name=('year'))
+    month       = models.PositiveSmallIntegerField(verbose_name=('month'))
+    meals       = models.PositiveIntegerField(default=0, verbose_name=('archived meals'))
+    shoppings   = models.PositiveIntegerField(default=0, verbose_name=('archived shoppings'))
+    deposits    = models.PositiveIntegerField(default=0, verbose_name=('archived deposits'))
+    closed_by   = models.ForeignKey(
+        Membership, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name=('closed by')
+    )
+    created_at  = models.DateTimeField(auto_now_add=True, verbose_name=('created at'))
+    updated_at  = models.DateTimeField(auto_now=True, verbose_name=('updated at'))
+
+    objects = ClosedMonthManager()
+
+    class Meta:
+        verbose_name        = "Closed Month"
+        verbose_name_plural = "Closed Months"
+        ordering            = ["-year", "-month"]
+        unique_together     = ("room", "year", "month")
+
+    def __str__(self):
+        return "%s (%s-%02d)" %(self.room.title, self.year, self.month)
+
+    def get_date(self):
+        return datetime.date(self.year, self.month, 1)
 
 
 @receiver(post_save, sender=Membership)
@@ -366,15 +1013,100 @@ def create_or_update_total_holder(sender, instance, created, **kwargs):
 @receiver(post_save, sender=CashDepositField)
 def create_or_update_cash_deposit_field(sender, instance, created, **kwargs):
     if created:
-        members_filter = Membership.objects.filter(room=instance.room)
-        if members_filter.exists():
-            for member in members_filter:
-                CashDepositMember.objects.create(deposit_field=instance, member=member, amount=0)
+        CashDepositMember.objects.allocate(
+            instance.room_id, [instance], Membership.objects.filter(room_id=instance.room_id).values_list('pk', flat=True), amount=0
+        )
 
 @receiver(post_save, sender=Membership)
 def create_or_update_cash_deposit_member(sender, instance, created, **kwargs):
     if created:
-        deposit_fields = CashDepositField.objects.filter(room=instance.room)
-        if deposit_fields.exists():
-            for field in deposit_fields:
-                CashDepositMember.objects.create(member=instance, deposit_field=field, amount=0)
\ No newline at end of file
+        CashDepositMember.objects.allocate(
+            instance.room_id, CashDepositField.objects.filter(room_id=instance.room_id).values_list('pk', flat=True), [instance], amount=0
+        )
+
+_receivers = threading.local()
+
+@contextmanager
+def ledger_receivers_paused():
+    """
+    Turns the ledger and chart cache receivers below off for the current
+    thread, for code moving or removing rows in bulk that keeps the ledger
+    and bumps the room cache itself (closing a month, removing a member).
+    """
+    paused = getattr(_receivers, 'paused', False)
+    _receivers.paused = True
+    try:
+        yield
+    finally:
+        _receivers.paused = paused
+
+def receivers_paused():
+    return getattr(_receivers, 'paused', False)
+
+@receiver(pre_save, sender=Meal)
+@receiver(pre_save, sender=Shopping)
+@receiver(pre_save, sender=MemberTrack)
+@receiver(pre_save, sender=CashDepositMember)
+def remember_ledger_entry(sender, instance, **kwargs):
+    instance._ledger_entry = None
+    if receivers_paused():
+        return
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._ledger_entry = ledger_entry(previous)
+
+@receiver(post_save, sender=Meal)
+@receiver(post_save, sender=Shopping)
+@receiver(post_save, sender=MemberTrack)
+@receiver(post_save, sender=CashDepositMember)
+def update_ledger_on_save(sender, instance, created, **kwargs):
+    if receivers_paused():
+        return
+    MonthlyLedger.objects.book(getattr(instance, '_ledger_entry', None), ledger_entry(instance))
+    instance._ledger_entry = None
+
+@receiver(post_delete, sender=Meal)
+@receiver(post_delete, sender=Shopping)
+@receiver(post_delete, sender=MemberTrack)
+@receiver(post_delete, sender=CashDepositMember)
+def update_ledger_on_delete(sender, instance, **kwargs):
+    if receivers_paused():
+        return
+    MonthlyLedger.objects.book(ledger_entry(instance), None, create=False)
+
+def chart_cache_entry(instance):
+    """
+    Returns (room_id, date) of the charts a row of a charted model shows up in.
+    """
+    if isinstance(instance, (TrackerField, ManagerialSetting)):
+        return instance.room_id, _as_date(instance.created_at)
+    if isinstance(instance, Membership):
+        return instance.room_id, None
+    entry = ledger_entry(instance)
+    if entry is None:
+        return None, None
+    member = Membership.objects.filter(pk=entry[0]).only('room').first()
+    if member is None:
+        return None, None
+    return member.room_id, datetime.date(entry[1], entry[2], 1)
+
+@receiver(post_save, sender=Meal)
+@receiver(post_save, sender=Shopping)
+@receiver(post_save, sender=MemberTrack)
+@receiver(post_save, sender=CashDepositMember)
+@receiver(post_save, sender=TrackerField)
+@receiver(post_save, sender=ManagerialSetting)
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Meal)
+@receiver(post_delete, sender=Shopping)
+@receiver(post_delete, sender=MemberTrack)
+@receiver(post_delete, sender=CashDepositMember)
+@receiver(post_delete, sender=TrackerField)
+@receiver(post_delete, sender=ManagerialSetting)
+@receiver(post_delete, sender=Membership)
+def bump_chart_cache(sender, instance, **kwargs):
+    if receivers_paused():
+        return
+    room_id, date = chart_cache_entry(instance)
+    bump_room_cache(room_id, date)
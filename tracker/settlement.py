@@ -0,0 +1,143 @@
+import datetime
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from django.db.models import Sum
+from accounts.utils import month_bounds, month_range
+from memberships.models import Membership
+from rooms.models import ManagerialSetting
+from .models import (
+    Meal, MealSchedule, Shopping, MemberTrack, CashDepositMember,
+    ArchivedMeal, ArchivedShopping, ArchivedCashDepositMember
+)
+
+CENT        = Decimal('0.01')
+RATE_PLACES = Decimal('0.0001')
+ZERO        = Decimal('0.00')
+
+
+def grouped_totals(querysets, group_fields, value_field):
+    """
+    {group: total} of the rows of `querysets` (a table and its archive),
+    summed in one UNION ALL statement.
+    """
+    grouped = [
+        queryset.order_by().values(*group_fields).annotate(total=Sum(value_field)) for queryset in querysets
+    ]
+    totals = {}
+    for row in grouped[0].union(*grouped[1:], all=True):
+        key = tuple(row[field] for field in group_fields)
+        key = key[0] if len(key) == 1 else key
+        totals[key] = totals.get(key, ZERO) + (row['total'] or ZERO)
+    return totals
+
+
+def split_by_meals(amount, meals):
+    """
+    Splits `amount` over {member id: meals} proportionally to the meals,
+    in cents. The cents lost to rounding go to the largest remainders, so
+    the shares always add up to `amount`.
+    """
+    total_meals = sum(meals.values(), ZERO)
+    if not total_meals:
+        return {member_id: ZERO for member_id in meals}
+    shares      = {}
+    remainders  = []
+    for member_id, count in meals.items():
+        exact               = amount * count / total_meals
+        shares[member_id]   = exact.quantize(CENT, rounding=ROUND_DOWN)
+        remainders.append((exact - shares[member_id], member_id))
+    left = int((amount - sum(shares.values(), ZERO)) / CENT)
+    for _, member_id in sorted(remainders, key=lambda item: (-item[0], item[1]))[:left]:
+        shares[member_id] += CENT
+    return shares
+
+
+def settle_month(room, year, month):
+    """
+    Meal rate and per member balance of a room for a month.
+
+    The meal shopping of the month is divided by the meals eaten (meals
+    entered for the days after today are not counted, auto entry days up
+    to today are, written or not). In a member
+    dependent room both individual and monthly shopping are meal shopping
+    and every member is credited with what they bought; in a manager
+    dependent room only the monthly shopping counts and it is paid from
+    the deposits. Balance = credits - meal cost - cost sector share, a
+    negative balance is owed to the room.
+
+    Cost sectors (rent, bills) are standing costs: a member is allocated
+    once and the amount is edited in place. The share of a month is the
+    current allocation of every sector the member had by the end of the
+    month, the total the cost chart shows for it.
+
+    Each source table is read with one grouped query (together with its
+    archive for closed months), the rest is Decimal math in memory.
+    """
+    date                = datetime.date(year, month, 1)
+    today               = datetime.date.today()
+    setting             = ManagerialSetting.objects.filter(room=room).only('shopping_type').first()
+    shopping_type       = setting.shopping_type if setting is not None else ManagerialSetting.INDIVIDUAL_MEMBER_DEPENDENT_SHOPPING
+    member_dependent    = shopping_type == ManagerialSetting.INDIVIDUAL_MEMBER_DEPENDENT_SHOPPING
+    members             = list(
+        Membership.objects.filter(room=room).select_related('user__profile').prefetch_related(
+            'user__socialaccount_set'
+        ).order_by('user__username')
+    )
+
+    meals = grouped_totals(
+        [model.objects.filter(member__room=room, **month_range('meal_date', date, until=today))
+         for model in (Meal, ArchivedMeal)],
+        ('member_id',), 'meal_today'
+    )
+    # auto entry days not written as meals yet
+    for member_id, value in MealSchedule.objects.pending_totals(room, date, month_bounds(date)[1] - datetime.timedelta(days=1)).items():
+        meals[member_id] = meals.get(member_id, ZERO) + value
+    shoppings = grouped_totals(
+        [model.objects.filter(created_by__room=room, **month_range('date', date))
+         for model in (Shopping, ArchivedShopping)],
+        ('created_by_id', 'shop_type'), 'cost'
+    )
+    cost_sectors = grouped_totals(
+        [MemberTrack.objects.filter(member__room=room, created_at__lt=month_bounds(date)[1])],
+        ('member_id',), 'cost'
+    )
+    deposits = grouped_totals(
+        [model.objects.filter(member__room=room, **month_range('created_at', date))
+         for model in (CashDepositMember, ArchivedCashDepositMember)],
+        ('member_id',), 'amount'
+    )
+
+    meal_shop_types = (Shopping.INDIVIDUAL, Shopping.MANAGERIAL) if member_dependent else (Shopping.MANAGERIAL,)
+    paid = {}
+    for (member_id, shop_type), cost in shoppings.items():
+        if shop_type in meal_shop_types:
+            paid[member_id] = paid.get(member_id, ZERO) + cost
+    total_meals     = sum(meals.values(), ZERO)
+    total_shopping  = sum(paid.values(), ZERO)
+    meal_costs      = split_by_meals(total_shopping, {member.pk: meals.get(member.pk, ZERO) for member in members})
+
+    rows = []
+    for member in members:
+        shopping    = paid.get(member.pk, ZERO) if member_dependent else ZERO
+        deposit     = deposits.get(member.pk, ZERO)
+        cost_sector = cost_sectors.get(member.pk, ZERO)
+        meal_cost   = meal_costs[member.pk]
+        rows.append({
+            'member'        : member,
+            'meals'         : meals.get(member.pk, ZERO),
+            'meal_cost'     : meal_cost,
+            'shopping'      : shopping,
+            'cost_sector'   : cost_sector,
+            'deposit'       : deposit,
+            'balance'       : shopping + deposit - meal_cost - cost_sector,
+        })
+    return {
+        'month'             : date,
+        'shopping_type'     : shopping_type,
+        'member_dependent'  : member_dependent,
+        'total_meals'       : total_meals,
+        'total_shopping'    : total_shopping,
+        'meal_rate'         : (total_shopping / total_meals).quantize(RATE_PLACES, rounding=ROUND_HALF_UP) if total_meals else ZERO,
+        'total_cost_sector' : sum(cost_sectors.values(), ZERO),
+        'total_deposit'     : sum(deposits.values(), ZERO),
+        'members'           : rows,
+    }
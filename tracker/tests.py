@@ -1,3 +1,427 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from accounts.utils import month_bounds
+from memberships.models import Membership
+from utils.testing import make_room, make_meal, make_shopping, make_cost_sector, make_deposit_field
+from .models import (
+    CashDepositMember, MemberTrack, Meal, MealSchedule, MonthlyLedger, Shopping, TotalHolder, ClosedMonth, ArchivedMeal, ArchivedShopping
+)
+from .settlement import settle_month
+from .utils import seed_month_meals, save_meal_grid
 
-# Create your tests here.
+
+class LedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager, cls.member = make_room('manager', 'member')
+        cls.today = datetime.date.today()
+
+    def ledger(self, membership, field, date=None):
+        date = date or self.today
+        return MonthlyLedger.objects.filter(
+            member=membership, year=date.year, month=date.month
+        ).values_list(field, flat=True).first() or Decimal('0')
+
+    def assertMatchesSources(self):
+        booked = {
+            (ledger.member_id, ledger.year, ledger.month): ledger
+            for ledger in MonthlyLedger.objects.filter(member__room=self.manager.room)
+        }
+        rows = MonthlyLedger.objects.calculate([self.manager.pk, self.member.pk])
+        for key, row in rows.items():
+            for field in ('meal_total', 'shopping_total', 'monthly_shopping_total', 'cost_sector_total', 'deposit_total'):
+                self.assertEqual(getattr(booked[key], field), getattr(row, field), (key, field))
+
+    def test_save_books_the_difference(self):
+        meal = make_meal(self.member, self.today, '2.00')
+        make_meal(self.member, self.today - datetime.timedelta(days=40), '3.00')
+        self.assertEqual(self.ledger(self.member, 'meal_total'), Decimal('2.00'))
+        meal.meal_today = Decimal('3.50')
+        meal.save()
+        self.assertEqual(self.ledger(self.member, 'meal_total'), Decimal('3.50'))
+        shopping = make_shopping(self.member, self.today, '120.00')
+        shopping.shop_type = Shopping.MANAGERIAL
+        shopping.save()
+        self.assertEqual(self.ledger(self.member, 'shopping_total'), Decimal('0'))
+        self.assertEqual(self.ledger(self.member, 'monthly_shopping_total'), Decimal('120.00'))
+        self.assertMatchesSources()
+
+    def test_delete_takes_the_value_back(self):
+        meal = make_meal(self.member, self.today, '2.00')
+        make_meal(self.member, self.today, '1.00')
+        field = make_cost_sector(self.manager.room, 'Rent', {self.manager: '300.00', self.member: '200.00'})
+        meal.delete()
+        self.assertEqual(self.ledger(self.member, 'meal_total'), Decimal('1.00'))
+        field.delete()
+        self.assertEqual(self.ledger(self.member, 'cost_sector_total'), Decimal('0'))
+        self.assertEqual(self.ledger(self.manager, 'cost_sector_total'), Decimal('0'))
+        self.assertMatchesSources()
+
+    def test_moving_a_row_moves_its_value(self):
+        meal        = make_meal(self.member, self.today, '2.00')
+        shopping    = make_shopping(self.member, self.today, '120.00')
+        meal.member = self.manager
+        meal.save()
+        shopping.created_by = self.manager
+        shopping.save()
+        self.assertEqual(self.ledger(self.member, 'meal_total'), Decimal('0'))
+        self.assertEqual(self.ledger(self.manager, 'meal_total'), Decimal('2.00'))
+        self.assertEqual(self.ledger(self.member, 'shopping_total'), Decimal('0'))
+        self.assertEqual(self.ledger(self.manager, 'shopping_total'), Decimal('120.00'))
+        # to another month
+        last_month      = self.today.replace(day=1) - datetime.timedelta(days=1)
+        meal.meal_date  = last_month
+        meal.save()
+        self.assertEqual(self.ledger(self.manager, 'meal_total'), Decimal('0'))
+        self.assertEqual(self.ledger(self.manager, 'meal_total', last_month), Decimal('2.00'))
+        self.assertMatchesSources()
+
+
+class RoomChartCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager, cls.member = make_room('manager', 'supervisor', role=Membership.SUPERVISOR)
+        make_cost_sector(cls.manager.room, 'Rent', {cls.manager: '100.00', cls.member: '100.00'})
+        make_deposit_field(cls.manager.room, 'Cash', {cls.manager: '500.00'})
+
+    def setUp(self):
+        cache.clear()
+
+    def get_chart(self, url_name, membership):
+        self.client.force_login(membership.user)
+        response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_manager_sees_modifier_controls(self):
+        controls = {
+            'tracker:cost_chart'    : ['Action', 'Allocate'],
+            'tracker:deposit_chart' : ['Create Deposit Field', reverse('tracker:deposit_field_create'), '500.00'],
+            'tracker:shopping_chart': ['Members Shopping Chart'],
+        }
+        for url_name, texts in controls.items():
+            # the second request is served from the cache
+            for _ in range(2):
+                content = self.get_chart(url_name, self.manager)
+                for text in texts:
+                    self.assertIn(text, content, url_name)
+        self.get_chart('tracker:analytics', self.manager)
+
+    def test_member_does_not_get_the_manager_copy(self):
+        self.get_chart('tracker:cost_chart', self.manager)
+        self.get_chart('tracker:deposit_chart', self.manager)
+        self.assertNotIn('Allocate', self.get_chart('tracker:cost_chart', self.member))
+        self.assertNotIn('Create Deposit Field', self.get_chart('tracker:deposit_chart', self.member))
+        self.assertIn('Members Shopping Chart', self.get_chart('tracker:shopping_chart', self.member))
+
+
+class SettlementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager, cls.member = make_room('manager', 'member')
+        cls.room        = cls.manager.room
+        cls.this_month  = datetime.date.today().replace(day=1)
+        cls.last_month  = (cls.this_month - datetime.timedelta(days=1)).replace(day=1)
+        # a standing sector allocated last month, edited in place since, and one of this month
+        make_cost_sector(cls.room, 'Rent', {cls.manager: '300.00', cls.member: '200.00'},
+                         created_at=datetime.datetime.combine(cls.last_month, datetime.time(9)))
+        make_cost_sector(cls.room, 'Gas', {cls.manager: '40.00', cls.member: '60.00'})
+
+    def cost_sectors(self, date):
+        return {row['member'].pk: row['cost_sector'] for row in settle_month(self.room, date.year, date.month)['members']}
+
+    def test_later_month_keeps_the_cost_sectors_of_the_charts(self):
+        charts = {
+            holder.member_id: holder.get_total_cost_sector()
+            for holder in TotalHolder.objects.filter(member__room=self.room)
+        }
+        self.assertEqual(charts, {self.manager.pk: Decimal('340.00'), self.member.pk: Decimal('260.00')})
+        self.assertEqual(self.cost_sectors(month_bounds(self.this_month)[1]), charts)
+        self.assertEqual(self.cost_sectors(self.this_month), charts)
+
+    def test_sectors_created_after_the_month_are_not_counted(self):
+        self.assertEqual(self.cost_sectors(self.last_month), {self.manager.pk: Decimal('300.00'), self.member.pk: Decimal('200.00')})
+        before = self.last_month - datetime.timedelta(days=1)
+        self.assertEqual(self.cost_sectors(before), {self.manager.pk: Decimal('0.00'), self.member.pk: Decimal('0.00')})
+
+
+class MealScheduleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager, cls.member = make_room('manager', 'supervisor', role=Membership.SUPERVISOR)
+        cls.today   = datetime.date.today()
+        cls.start   = max(cls.today.replace(day=1), cls.today - datetime.timedelta(days=2))
+        if cls.start > cls.today.replace(day=1):
+            make_meal(cls.member, cls.today.replace(day=1), '1.00')
+        MealSchedule.objects.create(member=cls.member, value=Decimal('2.50'), start_date=cls.start)
+
+    def test_pages_read_the_schedule_without_writing_meals(self):
+        meals = Meal.objects.count()
+        self.client.force_login(self.member.user)
+        for url_name in ('tracker:meal_chart', 'tracker:meal_create', 'tracker:settlement'):
+            self.assertEqual(self.client.get(reverse(url_name)).status_code, 200)
+        self.assertEqual(Meal.objects.count(), meals)
+
+        response    = self.client.get(reverse('tracker:meal_chart'))
+        column      = [member.pk for member in response.context['chart']['members']].index(self.member.pk)
+        cells       = {row['date']: row['cells'][column] for row in response.context['chart']['rows']}
+        self.assertEqual(cells[self.today].meal_today, Decimal('2.50'))
+        self.assertIsNone(cells[self.today].pk)
+        entered     = sum(meal.meal_today for meal in Meal.objects.filter(
+            member=self.member, meal_date__gte=self.today.replace(day=1), meal_date__lt=self.start
+        ))
+        scheduled   = Decimal('2.50') * ((self.today - self.start).days + 1)
+        self.assertEqual(response.context['chart']['member_totals'][column], entered + scheduled)
+
+    def meal_totals(self):
+        holder = TotalHolder.objects.with_ledger().get(member=self.member)
+        return holder.get_total_meal(), holder.get_total_meal_room(), {
+            row['member'].pk: row['meals'] for row in settle_month(self.member.room, self.today.year, self.today.month)['members']
+        }[self.member.pk]
+
+    def test_totals_count_the_pending_days_until_they_are_written(self):
+        entered     = Decimal('1.00') if self.start > self.today.replace(day=1) else Decimal('0')
+        expected    = entered + Decimal('2.50') * ((self.today - self.start).days + 1)
+        self.assertEqual(self.meal_totals(), (expected, expected, expected))
+        pending = MealSchedule.objects.pending(self.member.room, self.start, self.today)
+        self.assertEqual(len(pending), (self.today - self.start).days + 1)
+
+        MealSchedule.objects.expand(member=self.member)
+        self.assertEqual(MealSchedule.objects.pending(self.member.room, self.start, self.today), {})
+        self.assertEqual(
+            set(Meal.objects.filter(member=self.member, meal_date__gte=self.start).values_list('meal_date', flat=True)),
+            {day for member_id, day in pending}
+        )
+        self.assertEqual(self.meal_totals(), (expected, expected, expected))
+
+
+class MealChartCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager, cls.member, cls.other = make_room('manager', 'member', 'other')
+        cls.today   = {
+            member.pk: reverse('tracker:meal_update_admin', kwargs={
+                'slug': make_meal(member, datetime.date.today(), '2.00').slug
+            }) for member in (cls.manager, cls.member, cls.other)
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def get_chart(self, membership):
+        self.client.force_login(membership.user)
+        response = self.client.get(reverse('tracker:meal_chart'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_edit_links_stay_out_of_the_members_copy(self):
+        # the manager's copy is cached first, the member must not get it
+        self.get_chart(self.manager)
+        content = self.get_chart(self.member)
+        for url in self.today.values():
+            self.assertNotIn(url, content)
+
+    def test_manager_gets_the_edit_links_of_the_others(self):
+        self.get_chart(self.member)
+        content = self.get_chart(self.manager)
+        for member_id, url in self.today.items():
+            if member_id == self.manager.pk:
+                self.assertNotIn(url, content)
+            else:
+                self.assertIn(url, content)
+
+
+class ClosedMonthTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager, cls.member = make_room('manager', 'member')
+        cls.room        = cls.manager.room
+        cls.this_month  = datetime.date.today().replace(day=1)
+        cls.last_month  = (cls.this_month - datetime.timedelta(days=1)).replace(day=1)
+        for day, value in ((1, '2.00'), (2, '3.00')):
+            make_meal(cls.member, cls.last_month.replace(day=day), value)
+        make_meal(cls.member, cls.this_month, '1.00')
+        make_shopping(cls.member, cls.last_month, '120.00')
+        make_shopping(cls.manager, cls.last_month, '800.00', shop_type=Shopping.MANAGERIAL)
+
+    def ledgers(self):
+        return {
+            (ledger.member_id, ledger.year, ledger.month): (ledger.meal_total, ledger.shopping_total, ledger.monthly_shopping_total)
+            for ledger in MonthlyLedger.objects.filter(member__room=self.room)
+        }
+
+    def test_close_moves_the_rows_and_keeps_the_ledger(self):
+        ledgers     = self.ledgers()
+        settlement  = settle_month(self.room, self.last_month.year, self.last_month.month)
+        self.assertEqual(ledgers[(self.member.pk, self.last_month.year, self.last_month.month)][:2], (Decimal('5.00'), Decimal('120.00')))
+        with mock.patch('tracker.models.bump_room_cache') as bump_room_cache:
+            closed = ClosedMonth.objects.close(self.room, self.last_month.year, self.last_month.month, self.manager, batch_size=1)
+        bump_room_cache.assert_called_with(self.room.pk, self.last_month)
+
+        self.assertEqual((closed.meals, closed.shoppings), (2, 2))
+        self.assertFalse(Meal.objects.filter(meal_date__lt=self.this_month).exists())
+        self.assertFalse(Shopping.objects.filter(date__lt=self.this_month).exists())
+        self.assertEqual(ArchivedMeal.objects.filter(member=self.member).count(), 2)
+        self.assertEqual(ArchivedShopping.objects.count(), 2)
+        self.assertEqual(Meal.objects.filter(member=self.member).count(), 1)
+        self.assertEqual(self.ledgers(), ledgers)
+        self.assertEqual(settle_month(self.room, self.last_month.year, self.last_month.month)['members'], settlement['members'])
+
+        # closing again archives only what was written since
+        make_meal(self.manager, self.last_month.replace(day=3), '1.50')
+        closed = ClosedMonth.objects.close(self.room, self.last_month.year, self.last_month.month, self.manager)
+        self.assertEqual((closed.meals, closed.shoppings), (3, 2))
+        self.assertEqual(
+            MonthlyLedger.objects.get(member=self.manager, year=self.last_month.year, month=self.last_month.month).meal_total,
+            Decimal('1.50')
+        )
+
+    def test_open_months_cannot_be_closed(self):
+        with self.assertRaises(ValueError):
+            ClosedMonth.objects.close(self.room, self.this_month.year, self.this_month.month)
+
+
+class SeedMonthMealsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager, cls.member = make_room('manager', 'member')
+        cls.month = (datetime.date.today().replace(day=1) - datetime.timedelta(days=1)).replace(day=1)
+        make_meal(cls.member, cls.month.replace(day=2), '2.00')
+
+    def inserts(self, queries):
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+
+    def test_seeds_the_missing_days_with_one_insert(self):
+        days = (month_bounds(self.month)[1] - self.month).days
+        with CaptureQueriesContext(connection) as queries:
+            seeded = seed_month_meals(self.manager.room, self.month.year, self.month.month)
+        self.assertEqual(len(self.inserts(queries)), 1)
+        self.assertEqual(len(seeded), 2 * days - 1)
+        for membership in (self.manager, self.member):
+            dates = Meal.objects.filter(member=membership).values_list('meal_date', flat=True)
+            self.assertEqual(len(dates), days)
+            self.assertEqual(len(set(dates)), days)
+        self.assertEqual(Meal.objects.get(member=self.member, meal_date=self.month.replace(day=2)).meal_today, Decimal('2.00'))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(seed_month_meals(self.manager.room, self.month.year, self.month.month), [])
+        self.assertEqual(self.inserts(queries), [])
+
+
+class SaveMealGridTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager, cls.member = make_room('manager', 'member')
+        cls.today       = datetime.date.today()
+        cls.tomorrow    = cls.today + datetime.timedelta(days=1)
+        make_meal(cls.manager, cls.today, '2.00')
+        make_meal(cls.manager, cls.tomorrow, '1.00')
+
+    def meals(self, membership):
+        return list(Meal.objects.filter(member=membership).order_by('meal_date').values_list('meal_today', 'meal_next_day'))
+
+    @mock.patch('tracker.utils.bump_room_cache')
+    def test_updates_with_one_case_and_adds_the_missing_rows(self, bump_room_cache):
+        entries = {
+            self.manager.pk : (Decimal('3.00'), Decimal('2.50')),
+            self.member.pk  : (Decimal('1.00'), Decimal('1.50')),
+        }
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(save_meal_grid(self.manager.room, self.manager, entries), 2)
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "tracker_meal"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('CASE WHEN', updates[0])
+        bump_room_cache.assert_called_once_with(self.manager.room.pk, self.today, self.tomorrow)
+
+        # tomorrow keeps its own meal_next_day, only its meal_today follows the grid
+        self.assertEqual(self.meals(self.manager), [(Decimal('3.00'), Decimal('2.50')), (Decimal('2.50'), Decimal('1.00'))])
+        self.assertEqual(self.meals(self.member), [(Decimal('1.00'), Decimal('1.50')), (Decimal('1.50'), None)])
+        self.assertEqual(
+            MonthlyLedger.objects.get(member=self.member, year=self.today.year, month=self.today.month).meal_total,
+            Meal.objects.filter(member=self.member, meal_date__month=self.today.month).aggregate(total=Sum('meal_today'))['total']
+        )
+        self.assertEqual(save_meal_grid(self.manager.room, self.manager, entries), 0)
+
+    @mock.patch('tracker.utils.bump_room_cache')
+    def test_members_of_other_rooms_are_skipped(self, bump_room_cache):
+        other, = make_room('other')
+        self.assertEqual(save_meal_grid(self.manager.room, self.manager, {other.pk: (Decimal('1.00'), Decimal('1.00'))}), 0)
+        self.assertFalse(Meal.objects.filter(member=other).exists())
+
+
+class ChartDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager, cls.member = make_room('manager', 'member')
+        make_meal(cls.member, datetime.date.today(), '2.00')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.member.user)
+        self.url = reverse('tracker:chart_data', kwargs={'chart': 'meals'})
+
+    def test_matching_etag_gets_not_modified_without_building_the_data(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('"rows"', response.content.decode())
+        etag = response['ETag']
+
+        meal_chart_data = mock.Mock()
+        with mock.patch.dict('tracker.views.CHART_DATA', {'meals': meal_chart_data}):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        meal_chart_data.assert_not_called()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        make_meal(self.manager, datetime.date.today(), '1.00')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_charts_of_other_roles_are_refused(self):
+        response = self.client.get(reverse('tracker:chart_data', kwargs={'chart': 'costs'}))
+        self.assertNotEqual(response.status_code, 200)
+
+
+class FieldAllocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager, cls.member, cls.newcomer = make_room('manager', 'member', 'newcomer')
+        cls.room    = cls.manager.room
+        cls.rent    = make_cost_sector(cls.room, 'Rent', {cls.manager: '300.00'})
+        cls.water   = make_cost_sector(cls.room, 'Water', {cls.manager: '50.00', cls.member: '50.00'})
+
+    @mock.patch('tracker.models.bump_room_cache')
+    def test_creates_only_the_missing_rows(self, bump_room_cache):
+        members = [self.manager, self.member.pk, self.newcomer]
+        with CaptureQueriesContext(connection) as queries:
+            created = MemberTrack.objects.allocate(self.room, [self.rent, self.water.pk], members, cost=0)
+        self.assertEqual(
+            sorted((track.tracker_field_id, track.member_id) for track in created),
+            sorted([(self.rent.pk, self.member.pk), (self.rent.pk, self.newcomer.pk), (self.water.pk, self.newcomer.pk)])
+        )
+        self.assertEqual(len([query for query in queries.captured_queries if query['sql'].startswith('INSERT')]), 1)
+        bump_room_cache.assert_called_once_with(self.room.pk)
+        self.assertEqual(MemberTrack.objects.get(tracker_field=self.rent, member=self.manager).cost, Decimal('300.00'))
+        self.assertEqual(MemberTrack.objects.filter(tracker_field__room=self.room).count(), 6)
+
+        bump_room_cache.reset_mock()
+        self.assertEqual(MemberTrack.objects.allocate(self.room, [self.rent, self.water], members), [])
+        bump_room_cache.assert_not_called()
+
+    def test_deposit_fields_reach_every_member(self):
+        cash = make_deposit_field(self.room, 'Cash', {self.manager: '500.00'})
+        user        = get_user_model().objects.create_user(username='latecomer', password='password')
+        latecomer   = Membership.objects.create(user=user, room=self.room, slug='latecomer')
+        self.assertEqual(
+            set(CashDepositMember.objects.filter(deposit_field=cash).values_list('member_id', 'amount')),
+            {(self.manager.pk, Decimal('500.00')), (self.member.pk, 0), (self.newcomer.pk, 0), (latecomer.pk, 0)}
+        )
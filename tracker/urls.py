@@ -7,6 +7,7 @@ from .views import (
     MealCreateView,
     MealUpdateView,
     MealUpdateAdminView,
+    MealGridView,
     MealUpdateRequestView,
     meal_update_request_cancel,
     MealUpdateRequestConfirmView,
@@ -25,7 +26,11 @@ from .views import (
     ShoppingChartView,
     DepositChartView,
     CashDepositFieldAssignView,
-    AnalyticsView
+    AnalyticsView,
+    ChartDataView,
+    RoomExportView,
+    SettlementView,
+    MonthCloseView
     )
 
 urlpatterns = [
@@ -36,6 +41,7 @@ urlpatterns = [
     path('allocate-cost-to-/<slug>/', AssignFieldToMemberView.as_view(), name='assign_field_to_member'),
     # meal-urls
     path('meal/entry/', MealCreateView.as_view(), name='meal_create'),
+    path('meal/grid/', MealGridView.as_view(), name='meal_grid'),
     path('meal/<slug>/update/', MealUpdateView.as_view(), name='meal_update'),
     path('meal/<slug>/update/maintainer/', MealUpdateAdminView.as_view(), name='meal_update_admin'),
     path('meal/<slug>/update/request/', MealUpdateRequestView.as_view(), name='meal_update_request'),
@@ -60,4 +66,10 @@ urlpatterns = [
     path('shopping/chart/', ShoppingChartView.as_view(), name='shopping_chart'),
     path('deposit/chart/', DepositChartView.as_view(), name='deposit_chart'),
     path('analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('chart/<chart>/data/', ChartDataView.as_view(), name='chart_data'),
+    path('settlement/', SettlementView.as_view(), name='settlement'),
+    # export-urls
+    path('export/<section>/', RoomExportView.as_view(), name='export'),
+    # month-closing-urls
+    path('month/close/', MonthCloseView.as_view(), name='month_close'),
 ]
@@ -0,0 +1,223 @@
+import calendar
+import datetime
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, When, Value, F, DecimalField
+from memberships.models import Membership
+from accounts.models import UserProfile
+from accounts.utils import time_ordered_ids
+from utils.models import Notification
+from .cache import bump_room_cache
+from .models import Meal, MealSchedule, MonthlyLedger
+
+
+def daterange(start_date, end_date):
+    for n in range(int((end_date - start_date).days) + 1):
+        yield start_date + datetime.timedelta(n)
+
+
+def build_meal_chart(room, start_date, end_date, total_until=None):
+    """
+    Pivots the meals of a room into a members x days matrix.
+
+    Returns a dict with `members`, `rows` (one per date holding a `cells`
+    list aligned with `members` plus the day `total`), `member_totals`
+    (aligned with `members`) and `grand_total`. Totals only count dates up
+    to `total_until` (defaults to `end_date`). Auto entry days not written
+    yet are shown from the schedules (see MealScheduleManager.pending), as
+    unsaved meals; nothing is written.
+    """
+    total_until = total_until or end_date
+    members     = list(
+        Membership.objects.filter(room=room).select_related(
+            'user__profile'
+        ).prefetch_related('user__socialaccount_set').order_by('created_at')
+    )
+    meals       = Meal.objects.filter(
+        member__room=room, meal_date__gte=start_date, meal_date__lte=end_date
+    ).select_related('member__user', 'confirmed_by__user__profile').order_by('meal_date', 'id')
+    columns     = {member.pk: index for index, member in enumerate(members)}
+    cells       = {}
+    for meal in meals:
+        # the last entry of a member wins when a day got duplicated
+        cells[(meal.meal_date, meal.member_id)] = meal
+    by_pk       = {member.pk: member for member in members}
+    for (member_id, date), value in MealSchedule.objects.pending(room, start_date, end_date).items():
+        meal = cells.get((date, member_id))
+        if meal is None:
+            member  = by_pk.get(member_id)
+            if member is None:
+                continue
+            meal    = cells[(date, member_id)] = Meal(
+                member_id=member_id, meal_date=date, auto_entry=True, auto_entry_value=value, confirmed_by_id=member_id
+            )
+            # cached rather than assigned, an assignment asks the router for a write database
+            Meal.member.field.set_cached_value(meal, member)
+            Meal.confirmed_by.field.set_cached_value(meal, member)
+        meal.meal_today = meal.meal_next_day = value
+
+    rows            = []
+    member_totals   = [Decimal('0.00')] * len(members)
+    for date in daterange(start_date, end_date):
+        row_cells   = [cells.get((date, member.pk)) for member in members]
+        day_total   = Decimal('0.00')
+        for meal in row_cells:
+            if meal is not None and meal.meal_today is not None:
+                day_total += meal.meal_today
+                if date <= total_until:
+                    member_totals[columns[meal.member_id]] += meal.meal_today
+        rows.append({'date': date, 'cells': row_cells, 'total': day_total})
+    return {
+        'members'       : members,
+        'rows'          : rows,
+        'member_totals' : member_totals,
+        'grand_total'   : sum(member_totals, Decimal('0.00')),
+    }
+
+
+def seed_month_meals(room, year, month, confirmed_by=None):
+    """
+    Creates the empty meal rows of a month for every member of a room that
+    does not have one yet. Existing (member, date) pairs are read in one
+    query and the missing ones are written with a single bulk_create.
+    `confirmed_by` defaults to the member itself. Returns the rows created.
+    """
+    start_date  = datetime.date(year, month, 1)
+    end_date    = datetime.date(year, month, calendar.monthrange(year, month)[1])
+    members     = Membership.objects.filter(room=room).select_related('user').only('user__username', 'room')
+    with transaction.atomic():
+        existing = set(
+            Meal.objects.filter(
+                member__room=room, meal_date__gte=start_date, meal_date__lte=end_date
+            ).values_list('member_id', 'meal_date')
+        )
+        missing_meals = []
+        for member in members:
+            for single_date in daterange(start_date, end_date):
+                if (member.pk, single_date) in existing:
+                    continue
+                missing_meals.append(Meal(
+                    member=member,
+                    slug=member.user.username.lower()+'-'+single_date.strftime("%d")+'-',
+                    meal_today=None,
+                    meal_next_day=None,
+                    auto_entry=False,
+                    auto_entry_value=None,
+                    meal_date=single_date,
+                    confirmed_by=confirmed_by or member
+                ))
+        if missing_meals:
+            for meal, suffix in zip(missing_meals, time_ordered_ids(len(missing_meals))):
+                meal.slug += suffix
+            Meal.objects.bulk_create(missing_meals)
+    return missing_meals
+
+
+def save_meal_grid(room, maintainer, entries):
+    """
+    Writes today's and tomorrow's meal counts of several members of a room
+    at once. `entries` maps member ids to (meal today, meal tomorrow).
+    Missing meal rows of the two days are added with one bulk_create, the
+    others changed with one UPDATE ... CASE; the ledger of the changed
+    members is rebuilt once and they get one batch of notifications.
+    Returns the number of members whose meals changed.
+    """
+    today       = datetime.date.today()
+    tomorrow    = today + datetime.timedelta(days=1)
+    now         = datetime.datetime.now()
+    members     = {
+        member.pk: member for member in
+        Membership.objects.filter(room=room, pk__in=list(entries)).select_related('user')
+    }
+    with transaction.atomic():
+        existing = {}
+        for meal in Meal.objects.select_for_update().filter(
+            member_id__in=list(members), meal_date__in=[today, tomorrow]
+        ).order_by('id'):
+            # the last entry of a member wins when a day got duplicated, as on the chart
+            existing[(meal.member_id, meal.meal_date)] = meal
+
+        new_meals   = []
+        meal_today  = {}
+        meal_next   = {}
+        changed     = {}
+        for member_id, (today_value, tomorrow_value) in entries.items():
+            member = members.get(member_id)
+            if member is None:
+                continue
+            today_meal      = existing.get((member_id, today))
+            tomorrow_meal   = existing.get((member_id, tomorrow))
+            if today_meal is None or today_meal.meal_today != today_value or today_meal.meal_next_day != tomorrow_value:
+                if today_meal is None:
+                    new_meals.append(Meal(
+                        member=member, meal_today=today_value, meal_next_day=tomorrow_value, auto_entry=False,
+                        meal_date=today, confirmed_by=maintainer,
+                        slug=member.user.username.lower()+'-'+today.strftime("%d")+'-'
+                    ))
+                else:
+                    meal_today[today_meal.pk]   = today_value
+                    meal_next[today_meal.pk]    = tomorrow_value
+                changed[member_id] = today_meal
+            if tomorrow_meal is None or tomorrow_meal.meal_today != tomorrow_value:
+                if tomorrow_meal is None:
+                    new_meals.append(Meal(
+                        member=member, meal_today=tomorrow_value, meal_next_day=None, auto_entry=False,
+                        meal_date=tomorrow, confirmed_by=maintainer,
+                        slug=member.user.username.lower()+'-'+tomorrow.strftime("%d")+'-'
+                    ))
+                else:
+                    meal_today[tomorrow_meal.pk] = tomorrow_value
+                changed.setdefault(member_id, today_meal)
+        if not changed:
+            return 0
+
+        if meal_today:
+            decimal = DecimalField(max_digits=4, decimal_places=2)
+            Meal.objects.filter(pk__in=list(meal_today)).update(
+                meal_today=Case(
+                    *[When(pk=pk, then=Value(value)) for pk, value in meal_today.items()], output_field=decimal
+                ),
+                meal_next_day=Case(
+                    *[When(pk=pk, then=Value(value)) for pk, value in meal_next.items()],
+                    default=F('meal_next_day'), output_field=decimal
+                ),
+                confirmed_by=maintainer,
+                updated_at=now
+            )
+        if new_meals:
+            for meal, suffix in zip(new_meals, time_ordered_ids(len(new_meals))):
+                meal.slug += suffix
+            Meal.objects.bulk_create(new_meals)
+
+        # the writes above bypass the model signals
+        changed_members = Membership.objects.filter(pk__in=list(changed))
+        for month in {(today.year, today.month), (tomorrow.year, tomorrow.month)}:
+            MonthlyLedger.objects.rebuild(members=changed_members, year=month[0], month=month[1])
+        bump_room_cache(room.pk, today, tomorrow)
+
+        receivers = {
+            profile.user_id: profile for profile in
+            UserProfile.objects.select_related('user').filter(
+                user__in=[members[member_id].user_id for member_id in changed if member_id != maintainer.pk]
+            )
+        }
+        sender = UserProfile.objects.filter(user_id=maintainer.user_id).first()
+        if sender is not None:
+            notifications = []
+            for member_id, today_meal in changed.items():
+                receiver = receivers.get(members[member_id].user_id)
+                if receiver is None:
+                    continue
+                today_value, tomorrow_value = entries[member_id]
+                notifications.append({
+                    'receiver'          : receiver,
+                    'notify_type'       : "meal_update_by_maintainer",
+                    'identifier'        : today_meal.slug if today_meal is not None else today.strftime("%Y-%m-%d"),
+                    'room_identifier'   : room.slug,
+                    'category'          : "message",
+                    'message'           : "updated your meal of %s to %s and of %s to %s." % (
+                        today.strftime("%B-%d-%Y"), today_value, tomorrow.strftime("%B-%d-%Y"), tomorrow_value
+                    ),
+                })
+            Notification.objects.notify_many(sender, notifications)
+    return len(changed)
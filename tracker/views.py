@@ -10,13 +10,24 @@ from .models import (
     Shopping,
     CashDepositField,
     CashDepositMember,
-    TotalHolder
+    TotalHolder,
+    MonthlyLedger,
+    MealSchedule,
+    ClosedMonth
 )
-from rooms.models import ManagerialSetting
 from memberships.models import Membership
-from suspicious.models import Suspicious
+from memberships.mixins import MemberPassesTestMixin
+from suspicious.utils import record_suspicious_attempt
 from accounts.models import UserProfile
+from accounts.middleware import get_member_context
 from utils.models import Notification
+from utils.routers import replica_stream
+from .utils import build_meal_chart, seed_month_meals, save_meal_grid
+from .mixins import RoomChartCacheMixin
+from .cache import chart_cacheable
+from .exports import EXPORT_SECTIONS, export_months, export_rows, stream_csv, parse_month
+from .settlement import settle_month
+from .charts import CHART_DATA, chart_etag
 from .forms import (
     TrackerFieldCreateForm, 
     AssignFieldToMemberForm, 
@@ -29,7 +40,8 @@ from .forms import (
     ShoppingCreateForm,
     ShoppingUpdateForm,
     CashDepositFieldCreateForm,
-    AssignCashDepositToMemberForm
+    AssignCashDepositToMemberForm,
+    MealGridFormSet
 )
 from django.urls import reverse
 from django.contrib import messages
@@ -37,11 +49,17 @@ from django.views.generic import (
     CreateView,
     DeleteView,
     ListView,
-    UpdateView
+    UpdateView,
+    TemplateView,
+    FormView,
+    View
 )
-from django.http import HttpResponseRedirect, Http404
-from accounts.utils import time_str_mix_slug
+from django.http import HttpResponseRedirect, Http404, StreamingHttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from accounts.utils import time_str_mix_slug, month_range, month_bounds
 from django.core.paginator import Paginator
+from django.utils.functional import SimpleLazyObject
 import datetime
 from django.db.models import Q, F, Sum
 import time
@@ -49,9 +67,11 @@ import calendar
 
 
 @method_decorator(login_required, name='dispatch')
-class TrackerCreateView(CreateView):
-    template_name   = 'tracker/create.html'
-    form_class      = TrackerFieldCreateForm
+class TrackerCreateView(MemberPassesTestMixin, CreateView):
+    template_name       = 'tracker/create.html'
+    form_class          = TrackerFieldCreateForm
+    allowed_roles       = (Membership.MANAGER,)
+    allow_room_creator  = True
 
     def get_success_url(self):
         return reverse('tracker:tracker_create')
@@ -71,39 +91,13 @@ class TrackerCreateView(CreateView):
             context['cost_sectors'] = field_filter
         return context
 
-    def user_passes_test(self, request):
-        if request.user.is_authenticated:
-            self.object = self.request.user.membership
-            room_slug = self.object.room.slug
-            member_filter = Membership.objects.filter(user=request.user, room__slug=room_slug)
-            if member_filter.exists():
-                member_instance = Membership.objects.get(user=request.user, room__slug=room_slug)
-                if member_instance.role == 2 or self.object.room.creator == request.user:
-                    return True
-        return False
-
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(TrackerCreateView, self).dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
-class TrackerUpdateView(UpdateView):
-    template_name   = 'tracker/update.html'
-    form_class      = TrackerFieldUpdateForm
+class TrackerUpdateView(MemberPassesTestMixin, UpdateView):
+    template_name       = 'tracker/update.html'
+    form_class          = TrackerFieldUpdateForm
+    allowed_roles       = (Membership.MANAGER,)
+    allow_room_creator  = True
 
     def get_object(self):
         return TrackerField.objects.get(slug=self.kwargs['slug'])
@@ -137,38 +131,18 @@ class TrackerUpdateView(UpdateView):
         return context
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(TrackerUpdateView, self).user_passes_test(request):
             self.object = self.get_object()
-            room_slug = self.object.room.slug
-            member_filter = Membership.objects.filter(user=request.user, room__slug=room_slug)
-            if member_filter.exists():
-                member_instance = Membership.objects.get(user=request.user, room__slug=room_slug)
-                if member_instance.role == 2 or self.object.room.creator == request.user:
-                    return True
+            return self.object.room_id == self.get_membership().room_id
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(TrackerUpdateView, self).dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
-class TrackerDeleteView(DeleteView):
-    model = TrackerField
-    template_name   = 'tracker/delete.html'
+class TrackerDeleteView(MemberPassesTestMixin, DeleteView):
+    model               = TrackerField
+    template_name       = 'tracker/delete.html'
+    allowed_roles       = (Membership.MANAGER,)
+    allow_room_creator  = True
 
     def get_object(self):
         return TrackerField.objects.get(slug=self.kwargs['slug'])
@@ -182,39 +156,18 @@ class TrackerDeleteView(DeleteView):
         return reverse('tracker:tracker_create')
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(TrackerDeleteView, self).user_passes_test(request):
             self.object = self.get_object()
-            room_slug = self.object.room.slug
-            member_filter = Membership.objects.filter(user=request.user, room__slug=room_slug)
-            if member_filter.exists():
-                member_instance = Membership.objects.get(user=request.user, room__slug=room_slug)
-                if member_instance.role == 2 or self.object.room.creator == request.user:
-                    return True
+            return self.object.room_id == self.get_membership().room_id
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(TrackerDeleteView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class AssignFieldToMemberView(CreateView):
-    template_name   = 'tracker/assign/assign_field_to_member.html'
-    form_class      = AssignFieldToMemberForm
+class AssignFieldToMemberView(MemberPassesTestMixin, CreateView):
+    template_name       = 'tracker/assign/assign_field_to_member.html'
+    form_class          = AssignFieldToMemberForm
+    allowed_roles       = (Membership.MANAGER,)
+    allow_room_creator  = True
     
     def get_success_url(self):
         if self.request.user.membership:
@@ -248,34 +201,6 @@ class AssignFieldToMemberView(CreateView):
         
         return context
 
-    def user_passes_test(self, request):
-        if request.user.is_authenticated:
-            self.membership = request.user.membership
-            room_slug = self.membership.room.slug
-            member_filter = Membership.objects.filter(user=request.user, room__slug=room_slug)
-            if member_filter.exists():
-                member_instance = Membership.objects.get(user=request.user, room__slug=room_slug)
-                if member_instance.role == 2 or self.membership.room.creator == request.user:
-                    return True
-        return False
-
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(AssignFieldToMemberView, self).dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
 class MealCreateView(CreateView):
@@ -295,28 +220,15 @@ class MealCreateView(CreateView):
                 auto_entry  = False
             else:
                 auto_entry  = True
-            # Auto Entry Defination Starts
-            day_range           = calendar.monthrange(now.year, now.month)[1]
-            now_day_binding     = int(now.day) + 2
-            auto_day_binding    = int(day_range) - 1
-            if now.day >= auto_day_binding and auto_entry == True:
-                auto_entry          = False
-                auto_entry_value    = None
-                messages.add_message(self.request, messages.WARNING,
-                "Auto entry is not workable in last two days of month! Please change it from next month.")
-            if not now.day >= auto_day_binding and not auto_entry == False:
-                day_binding         = now_day_binding
-                start_date          = datetime.date(now.year, now.month, day_binding)
-                end_date            = datetime.date(now.year, now.month, day_range)
-                def daterange(start_date, end_date):
-                    for n in range(int ((end_date - start_date).days) + 1):
-                        yield start_date + datetime.timedelta(n)
-            # Auto Entry Defination Ends
+            # auto entry is kept as a schedule starting the day after tomorrow
+            schedule_start  = next_day + datetime.timedelta(days=1)
             member_filter   = Membership.objects.filter(slug=slug).only('user')
             if member_filter.exists():
                 member_instance = Membership.objects.get(slug=slug)
+                # today is left to the entry, it overrides the schedule
+                MealSchedule.objects.expand(member=member_instance, until=now.date() - datetime.timedelta(days=1))
                 existed_meal_filter = Meal.objects.filter(
-                            Q(meal_date__day=now.day, meal_date__month=now.month, meal_date__year=now.year),
+                            Q(meal_date=now.date()),
                             member=member_instance
                             ).only('member', 'meal_date')
                 if existed_meal_filter.exists():
@@ -344,34 +256,16 @@ class MealCreateView(CreateView):
                         confirmed_by        = member_instance
                     )
                     if auto_entry == True:
-                        for single_date in daterange(start_date, end_date):
-                            slug_binding = member_instance.user.username.lower()+'-'+str(single_date.strftime("%d"))+'-'+time_str_mix_slug()
-                            Meal.objects.get_or_create(
-                                member              = member_instance,
-                                meal_today          = auto_entry_value,
-                                meal_next_day       = auto_entry_value,
-                                auto_entry          = auto_entry,
-                                auto_entry_value    = auto_entry_value,
-                                meal_date           = single_date,
-                                slug                = slug_binding,
-                                confirmed_by        = member_instance
-                            )
+                        MealSchedule.objects.start(member_instance, auto_entry_value, schedule_start)
+                    else:
+                        MealSchedule.objects.stop(member_instance, next_day)
                     if len(existed_meal_filter) >= 2:
                         existed_meal_filter.first().delete()
                     messages.add_message(self.request, messages.SUCCESS,
                                         "Meal information added successfully !")
                     return super().form_valid(form)
             else:
-                instance_user   = self.request.user
-                suspicious_user = Suspicious.objects.filter(user=instance_user).only('user')
-                if suspicious_user.exists():
-                    suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                    current_attempt             = suspicious_user_instance.attempt
-                    total_attempt               = current_attempt + 1
-                    update_time                 = datetime.datetime.now()
-                    suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-                else:
-                    Suspicious.objects.get_or_create(user=instance_user)
+                record_suspicious_attempt(self.request.user)
                 messages.add_message(self.request, messages.ERROR, 
                     "You are not allowed. Your account is being tracked for suspicious activity !"
                 )
@@ -385,32 +279,7 @@ class MealCreateView(CreateView):
         response    = super(MealCreateView, self).post(request, *args, **kwargs)
         user        = self.request.user
         now         = datetime.datetime.now()
-        day_range   = calendar.monthrange(now.year, now.month)[1]
-        members_filter = Membership.objects.filter(room=user.membership.room).only('room')
-        if members_filter.exists():
-            members_instance = Membership.objects.get(room=user.membership.room, user=user)
-            for member in members_filter:
-                start_date          = datetime.date(now.year, now.month, 1)
-                end_date            = datetime.date(now.year, now.month, day_range)
-                def daterange(start_date, end_date):
-                    for n in range(int ((end_date - start_date).days) + 1):
-                        yield start_date + datetime.timedelta(n)
-                for single_date in daterange(start_date, end_date):
-                    members_meal_filter = Meal.objects.filter(
-                        member=member, meal_date__day=single_date.day, meal_date__month=single_date.month, meal_date__year=single_date.year
-                    ).only('member', 'meal_date')
-                    if not members_meal_filter.exists():
-                        slug_binding = member.user.username.lower()+'-'+single_date.strftime("%d")+'-'+time_str_mix_slug()
-                        Meal.objects.get_or_create(
-                            member=member,
-                            slug=slug_binding,
-                            meal_today=None,
-                            meal_next_day=None,
-                            auto_entry=False,
-                            auto_entry_value=None,
-                            meal_date=single_date,
-                            confirmed_by=member
-                        )
+        seed_month_meals(user.membership.room, now.year, now.month)
         return response
 
     def get_success_url(self):
@@ -420,7 +289,7 @@ class MealCreateView(CreateView):
         if member_filter.exists():
             member_instance = Membership.objects.get(slug=member_slug)
             meal_filter     = Meal.objects.filter(
-                Q(meal_date__day=now.day, meal_date__month=now.month, meal_date__year=now.year),
+                Q(meal_date=now.date()),
                 member=member_instance
             ).only('member', 'meal_date')
             if meal_filter.exists():
@@ -444,11 +313,10 @@ class MealCreateView(CreateView):
             member_instance     = Membership.objects.get(slug=member_slug)
             context['member']   = member_instance.user.profile.get_smallname
             context['time']     = datetime.date.today()
-            meals               = Meal.objects.all()
             member_meal_filter  = Meal.objects.filter(
-                                    Q(meal_date__day__lte=day_to_view, meal_date__month=now.month, meal_date__year=now.year),
+                                    Q(**month_range('meal_date', now, until=now.replace(day=int(day_to_view)))),
                                     member=member_instance
-                                    ).only('member', 'meal_date').order_by('-meal_date')
+                                    ).order_by('-meal_date')
             if member_meal_filter.exists():
                 paginator       = Paginator(member_meal_filter, 7)
                 page            = self.request.GET.get('page')
@@ -473,14 +341,13 @@ class MealUpdateView(UpdateView):
         member_filter   = Membership.objects.filter(slug=slug).only('user')
         if member_filter.exists():
             member_instance     = Membership.objects.get(slug=slug)
-            meals               = Meal.objects.all()
             existed_meal_filter = Meal.objects.filter(
-                            Q(meal_date__day=now.day, meal_date__month=now.month, meal_date__year=now.year),
+                            Q(meal_date=now.date()),
                             member=member_instance
                             ).only('member', 'meal_date')
             if existed_meal_filter.exists():
                 existed_meal_check = Meal.objects.filter(
-                            Q(meal_date__day=now.day, meal_date__month=now.month, meal_date__year=now.year),
+                            Q(meal_date=now.date()),
                             member=member_instance
                             ).last()
                 return existed_meal_check
@@ -503,28 +370,14 @@ class MealUpdateView(UpdateView):
                 auto_entry  = False
             else:
                 auto_entry  = True
-            # Auto Entry Defination Starts
-            day_range           = calendar.monthrange(now.year, now.month)[1]
-            now_day_binding     = int(now.day) + 2
-            auto_day_binding    = int(day_range) - 1
-            if now.day >= auto_day_binding and auto_entry == True:
-                auto_entry          = False
-                auto_entry_value    = None
-                messages.add_message(self.request, messages.WARNING,
-                "Auto entry is not workable in last two days of month! Please change it from next month.")
-            if not now.day >= auto_day_binding and not auto_entry == False:
-                day_binding         = now_day_binding
-                start_date          = datetime.date(now.year, now.month, day_binding)
-                end_date            = datetime.date(now.year, now.month, day_range)
-                def daterange(start_date, end_date):
-                    for n in range(int ((end_date - start_date).days) + 1):
-                        yield start_date + datetime.timedelta(n)
-            # Auto Entry Defination Ends
+            # auto entry is kept as a schedule starting the day after tomorrow
+            schedule_start  = next_day + datetime.timedelta(days=1)
             member_filter = Membership.objects.filter(slug=member_slug).only('user')
             if member_filter.exists():
                 member_instance = Membership.objects.get(slug=member_slug)
+                MealSchedule.objects.expand(member=member_instance)
                 meal_filter_datetime = Meal.objects.filter(
-                    Q(meal_date__day=now.day, meal_date__month=now.month, meal_date__year=now.year),
+                    Q(meal_date=now.date()),
                     member=member_instance
                     ).only('member', 'meal_date')
                 if meal_filter_datetime.exists():
@@ -535,7 +388,7 @@ class MealUpdateView(UpdateView):
                         form.instance.auto_entry        = auto_entry
                         form.instance.auto_entry_value  = auto_entry_value
                         tomorrow_meal           = member_meal.filter(
-                            Q(meal_date__day=next_day.day, meal_date__month=next_day.month, meal_date__year=next_day.year)
+                            Q(meal_date=next_day)
                         ).only('meal_date')
                         if tomorrow_meal.exists():
                             tomorrow_meal.update(
@@ -559,54 +412,14 @@ class MealUpdateView(UpdateView):
                             )
                         if len(tomorrow_meal) >= 2:
                             tomorrow_meal.first().delete()
-                        if auto_entry == False:
-                            if not now.day == day_range:
-                                deletion_day = int(next_day.day) + 1
-                                auto_meals   = member_meal.filter(
-                                    Q(meal_date__day__gte=deletion_day, meal_date__month=now.month, meal_date__year=now.year)
-                                ).only('meal_date')
-                                if auto_meals.exists():
-                                    if now.day >= auto_day_binding:
-                                        auto_meals.exclude(meal_date__day=day_range).update(
-                                            meal_today=None,
-                                            meal_next_day=None,
-                                            auto_entry=False,
-                                            auto_entry_value=None,
-                                        )
-                                    else:
-                                        auto_meals.update(
-                                            meal_today=None,
-                                            meal_next_day=None,
-                                            auto_entry=False,
-                                            auto_entry_value=None,
-                                        )
                         if auto_entry == True:
-                            for single_date in daterange(start_date, end_date):
-                                slug_binding = member_instance.user.username.lower()+'-'+str(single_date.strftime("%d"))+'-'+time_str_mix_slug()
-                                auto_meals   = member_meal.filter(
-                                    Q(meal_date__day=single_date.day, meal_date__month=single_date.month, meal_date__year=single_date.year),
-                                ).only('meal_date')
-                                if auto_meals.exists():
-                                    auto_meals.update(
-                                        meal_today          = auto_entry_value,
-                                        meal_next_day       = auto_entry_value,
-                                        auto_entry          = auto_entry,
-                                        auto_entry_value    = auto_entry_value,
-                                        confirmed_by        = member_instance
-                                    )
-                                else:
-                                    Meal.objects.create(
-                                        member              = member_instance,
-                                        meal_today          = auto_entry_value,
-                                        meal_next_day       = auto_entry_value,
-                                        auto_entry          = auto_entry,
-                                        auto_entry_value    = auto_entry_value,
-                                        meal_date           = single_date,
-                                        slug                = slug_binding,
-                                        confirmed_by        = member_instance
-                                    )
-                            if len(auto_meals) >= 2:
-                                auto_meals.first().delete()
+                            MealSchedule.objects.start(member_instance, auto_entry_value, schedule_start)
+                        else:
+                            MealSchedule.objects.stop(member_instance, next_day)
+                        # queryset updates above bypass the ledger signals
+                        MonthlyLedger.objects.refresh(member_instance, now.year, now.month)
+                        if not next_day.month == now.month:
+                            MonthlyLedger.objects.refresh(member_instance, next_day.year, next_day.month)
                         messages.add_message(self.request, messages.SUCCESS,
                             "Meal information updated successfully !"
                         )
@@ -616,19 +429,10 @@ class MealUpdateView(UpdateView):
                         None, forms.ValidationError("You don't have any meal entry for today to update! Please Entry first.")
                     )
             else:
-                instance_user   = self.request.user
-                suspicious_user = Suspicious.objects.filter(user=instance_user).only('user')
-                if suspicious_user.exists():
-                    suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                    current_attempt             = suspicious_user_instance.attempt
-                    total_attempt               = current_attempt + 1
-                    update_time                 = datetime.datetime.now()
-                    suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-                else:
-                    Suspicious.objects.get_or_create(user=instance_user)
-                    messages.add_message(self.request, messages.ERROR, 
-                        "You are not allowed. Your account is being tracked for suspicious activity !"
-                    )
+                record_suspicious_attempt(self.request.user)
+                messages.add_message(self.request, messages.ERROR, 
+                    "You are not allowed. Your account is being tracked for suspicious activity !"
+                )
         else:
             form.add_error(
                 None, forms.ValidationError("Regular maintenance break ! Please try again 1 minute later.")
@@ -641,32 +445,8 @@ class MealUpdateView(UpdateView):
         now  = datetime.datetime.now()
         next_day  = (datetime.date.today() + datetime.timedelta(days=1))
         day_range = calendar.monthrange(now.year, now.month)[1]
-        members_filter = Membership.objects.filter(room=user.membership.room).only('user', 'room')
-        if members_filter.exists():
-            for member in members_filter:
-                if now.day == day_range:
-                    next_month_range    = calendar.monthrange(next_day.year, next_day.month)[1]
-                    start_date          = datetime.date(next_day.year, next_day.month, 1)
-                    end_date            = datetime.date(next_day.year, next_day.month, next_month_range)
-                    def daterange(start_date, end_date):
-                        for n in range(int ((end_date - start_date).days) + 1):
-                            yield start_date + datetime.timedelta(n)
-                    for single_date in daterange(start_date, end_date):
-                        members_meal_filter = Meal.objects.filter(
-                            member=member, meal_date__day=single_date.day, meal_date__month=single_date.month, meal_date__year=single_date.year
-                        ).only('member', 'meal_date')
-                        if not members_meal_filter.exists():
-                            slug_binding = member.user.username.lower()+'-'+single_date.strftime("%d")+'-'+time_str_mix_slug()
-                            Meal.objects.get_or_create(
-                                member=member,
-                                slug=slug_binding,
-                                meal_today=None,
-                                meal_next_day=None,
-                                auto_entry=False,
-                                auto_entry_value=None,
-                                meal_date=single_date,
-                                confirmed_by=member
-                            )
+        if now.day == day_range:
+            seed_month_meals(user.membership.room, next_day.year, next_day.month)
         return response
 
     def get_success_url(self):
@@ -688,11 +468,10 @@ class MealUpdateView(UpdateView):
             member_instance     = Membership.objects.get(slug=member_slug)
             context['member']   = member_instance.user.profile.get_smallname
             context['time']     = datetime.date.today()
-            meals               = Meal.objects.all()
             member_meal_filter  = Meal.objects.filter(
-                                    Q(meal_date__day__lte=day_to_view, meal_date__month=now.month, meal_date__year=now.year),
+                                    Q(**month_range('meal_date', now, until=now.replace(day=int(day_to_view)))),
                                     member=member_instance
-                                    ).only('member', 'meal_date').order_by('-meal_date')
+                                    ).order_by('-meal_date')
             if member_meal_filter.exists():
                 context['last_meal'] = member_meal_filter.first()
                 paginator       = Paginator(member_meal_filter, 7)
@@ -702,7 +481,7 @@ class MealUpdateView(UpdateView):
                 context['count']        = member_meal_filter.count()
             if now.day == day_range:
                 tomorrow_meal_filter    = Meal.objects.filter(
-                                        Q(meal_date__day=tomorrow.day, meal_date__month=tomorrow.month, meal_date__year=tomorrow.year),
+                                        Q(meal_date=tomorrow),
                                         member=member_instance
                                         ).only('member', 'meal_date').order_by('-meal_date')
                 context['tomorrow_meal'] = tomorrow_meal_filter.last()
@@ -725,9 +504,10 @@ class MealUpdateView(UpdateView):
 
 
 @method_decorator(login_required, name='dispatch')
-class MealUpdateAdminView(UpdateView):
+class MealUpdateAdminView(MemberPassesTestMixin, UpdateView):
     template_name   = 'tracker/meal/update-admin.html'
     form_class      = MealUpdateAdminForm
+    allowed_roles   = (Membership.MANAGER,)
 
     def get_object(self):
         user            = self.request.user
@@ -751,34 +531,16 @@ class MealUpdateAdminView(UpdateView):
                 # ----------- Notification Creation Starts -----------
                 user = self.request.user
                 object = self.get_object()
-                if UserProfile.objects.filter(user=user).exists():
-                    notify_sender_instance      = UserProfile.objects.get(user=user)
-                    if UserProfile.objects.filter(user=object.member.user).exists():
-                        notify_receiver_instance    = UserProfile.objects.get(user=object.member.user)
-                        notify_type = "meal_update_by_maintainer"
-                        room_slug   = user.membership.room.slug
-                        meal_notify_instance = Meal.objects.filter(slug=object.slug).last()
-                        notify_slug = notify_receiver_instance.user.username.lower()+'-'+time_str_mix_slug()
-                        notification_filter = Notification.objects.filter(identifier__iexact=object.slug,sender=notify_sender_instance, receiver=notify_receiver_instance, notify_type__iexact="meal_update_by_maintainer")
-                        if notification_filter.exists():
-                            counter = notification_filter.first().counter + 1
-                            notification_filter.update(
-                                counter = counter,
-                                updated_at = datetime.datetime.now(),
-                                message="updated your meal of %s and changed it to %s." %(meal_notify_instance.meal_date.strftime("%B-%d-%Y"), form.instance.meal_today)
-                            )
-                        else:
-                            Notification.objects.create(
-                                sender=notify_sender_instance,
-                                receiver=notify_receiver_instance,
-                                slug=notify_slug,
-                                category="message",
-                                notify_type=notify_type,
-                                identifier=object.slug,
-                                room_identifier=room_slug,
-                                counter=1,
-                                message="updated your meal of %s and changed it to %s." %(meal_notify_instance.meal_date.strftime("%B-%d-%Y"), form.instance.meal_today)
-                            )
+                notify_sender_instance      = UserProfile.objects.filter(user=user).first()
+                notify_receiver_instance    = UserProfile.objects.select_related('user').filter(user=object.member.user).first()
+                if notify_sender_instance and notify_receiver_instance:
+                    Notification.objects.notify(
+                        notify_sender_instance, notify_receiver_instance, "meal_update_by_maintainer",
+                        identifier=object.slug,
+                        room_identifier=user.membership.room.slug,
+                        category="message",
+                        message="updated your meal of %s and changed it to %s." %(object.meal_date.strftime("%B-%d-%Y"), form.instance.meal_today)
+                    )
                 # ----------- Notification Creation Ends -----------
                 return super().form_valid(form)
         else:
@@ -799,85 +561,90 @@ class MealUpdateAdminView(UpdateView):
         user_member_filter = Membership.objects.filter(user=user)
         if user_member_filter.exists():
             user_membership = user_member_filter.first()
-        members_filter = Membership.objects.filter(room=user.membership.room).only('user', 'room')
-        if members_filter.exists():
-            for member in members_filter:
-                if now.day == day_range:
-                    next_month_range    = calendar.monthrange(next_day.year, next_day.month)[1]
-                    start_date          = datetime.date(next_day.year, next_day.month, 1)
-                    end_date            = datetime.date(next_day.year, next_day.month, next_month_range)
-                    def daterange(start_date, end_date):
-                        for n in range(int ((end_date - start_date).days) + 1):
-                            yield start_date + datetime.timedelta(n)
-                    for single_date in daterange(start_date, end_date):
-                        members_meal_filter = Meal.objects.filter(
-                            member=member, meal_date__day=single_date.day, meal_date__month=single_date.month, meal_date__year=single_date.year
-                        ).only('member', 'meal_date')
-                        if not members_meal_filter.exists():
-                            slug_binding = member.user.username.lower()+'-'+single_date.strftime("%d")+'-'+time_str_mix_slug()
-                            Meal.objects.get_or_create(
-                                member=member,
-                                slug=slug_binding,
-                                meal_today=None,
-                                meal_next_day=None,
-                                auto_entry=False,
-                                auto_entry_value=None,
-                                meal_date=single_date,
-                                confirmed_by=user_membership
-                            )
-                if now.day < day_range:
-                    start_date          = datetime.date(next_day.year, next_day.month, 1)
-                    end_date            = datetime.date(next_day.year, next_day.month, day_range)
-                    def daterange(start_date, end_date):
-                        for n in range(int ((end_date - start_date).days) + 1):
-                            yield start_date + datetime.timedelta(n)
-                    for single_date in daterange(start_date, end_date):
-                        members_meal_filter = Meal.objects.filter(
-                            member=member, meal_date__day=single_date.day, meal_date__month=single_date.month, meal_date__year=single_date.year
-                        ).only('member', 'meal_date')
-                        if not members_meal_filter.exists():
-                            slug_binding = member.user.username.lower()+'-'+single_date.strftime("%d")+'-'+time_str_mix_slug()
-                            Meal.objects.get_or_create(
-                                member=member,
-                                slug=slug_binding,
-                                meal_today=None,
-                                meal_next_day=None,
-                                auto_entry=False,
-                                auto_entry_value=None,
-                                meal_date=single_date,
-                                confirmed_by=user_membership
-                            )
+            if now.day == day_range:
+                seed_month_meals(user_membership.room, next_day.year, next_day.month, confirmed_by=user_membership)
+            else:
+                seed_month_meals(user_membership.room, now.year, now.month, confirmed_by=user_membership)
         return response
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
-            now  = datetime.datetime.now()
+        if super(MealUpdateAdminView, self).user_passes_test(request):
+            now         = datetime.datetime.now()
+            membership  = self.get_membership()
             self.object = self.get_object()
-            if self.object.member.room == request.user.membership.room and request.user.membership.role == 2:
-                if self.object.meal_date.strftime("%d-%m-%Y") == now.strftime("%d-%m-%Y") and not self.object.member == request.user.membership:
-                    return True
+            if self.object.member.room_id == membership.room_id and not self.object.member_id == membership.pk:
+                return self.object.meal_date.strftime("%d-%m-%Y") == now.strftime("%d-%m-%Y")
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
+
+@method_decorator(login_required, name='dispatch')
+class MealGridView(MemberPassesTestMixin, FormView):
+    """
+    Today's and tomorrow's meals of every other member of the room on one
+    page, saved at once by save_meal_grid.
+    """
+    template_name       = 'tracker/meal/grid.html'
+    form_class          = MealGridFormSet
+    allowed_roles       = (Membership.MANAGER,)
+    allow_room_creator  = True
+
+    def get_members(self):
+        if not hasattr(self, 'members'):
+            membership      = self.get_membership()
+            self.members    = list(
+                Membership.objects.filter(room_id=membership.room_id).exclude(pk=membership.pk).select_related(
+                    'user__profile'
+                ).prefetch_related('user__socialaccount_set').order_by('user__username')
+            )
+        return self.members
+
+    def get_initial(self):
+        today       = datetime.date.today()
+        tomorrow    = today + datetime.timedelta(days=1)
+        meals       = {}
+        for meal in Meal.objects.filter(
+            member__in=self.get_members(), meal_date__in=[today, tomorrow]
+        ).order_by('id').only('member_id', 'meal_date', 'meal_today', 'meal_next_day'):
+            meals[(meal.member_id, meal.meal_date)] = meal
+        initial = []
+        for member in self.get_members():
+            today_meal      = meals.get((member.pk, today))
+            tomorrow_meal   = meals.get((member.pk, tomorrow))
+            if tomorrow_meal is not None:
+                meal_next_day = tomorrow_meal.meal_today
             else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
+                meal_next_day = today_meal.meal_next_day if today_meal is not None else None
+            initial.append({
+                'member'        : member.pk,
+                'meal_today'    : today_meal.meal_today if today_meal is not None else None,
+                'meal_next_day' : meal_next_day,
+            })
+        return initial
+
+    def get_form_kwargs(self):
+        kwargs              = super(MealGridView, self).get_form_kwargs()
+        kwargs['members']   = self.get_members()
+        return kwargs
+
+    def form_valid(self, form):
+        if time.strftime("%H-%M") == "00-00":
+            messages.add_message(self.request, messages.ERROR,
+                "Regular maintenance break ! Please try again 1 minute later."
             )
-            return HttpResponseRedirect(reverse('home'))
-        return super(MealUpdateAdminView, self).dispatch(request, *args, **kwargs)
+            return super(MealGridView, self).form_invalid(form)
+        membership  = self.get_membership()
+        changed     = save_meal_grid(membership.room, membership, form.get_entries())
+        messages.add_message(self.request, messages.SUCCESS,
+            "Meals of %s member(s) updated successfully !" % changed
+        )
+        return super(MealGridView, self).form_valid(form)
+
+    def get_success_url(self):
+        return reverse('tracker:meal_chart')
+
 
 @method_decorator(login_required, name='dispatch')
-class MealUpdateRequestView(CreateView):
+class MealUpdateRequestView(MemberPassesTestMixin, CreateView):
     template_name   = 'tracker/meal/update-request.html'
     form_class      = MealUpdateRequestForm
 
@@ -905,29 +672,11 @@ class MealUpdateRequestView(CreateView):
         return meal_instance
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(MealUpdateRequestView, self).user_passes_test(request):
             self.object = self.get_object()
-            return self.object.member.user == request.user
+            return self.object.member.user_id == request.user.pk
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user).only('user')
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(MealUpdateRequestView, self).dispatch(request, *args, **kwargs)
-
     def form_valid(self, form):
         meal_slug       = self.kwargs['slug']
         member          = self.request.user
@@ -941,31 +690,18 @@ class MealUpdateRequestView(CreateView):
             form.instance.member = member_instance
             form.instance.slug   = meal_slug
             # ----------- Notification Starts -----------
-            notify_type = "meal_update"
-            meal_date_filter = Meal.objects.filter(slug=meal_slug)
-            if meal_date_filter.exists():
-                identifier = meal_slug
+            if Meal.objects.filter(slug=meal_slug).exists():
                 notify_sender_instance      = UserProfile.objects.get(user__username=member)
-                notify_receiver_instance    = UserProfile.objects.get(user__username=request_to)
-                notify_slug = notify_receiver_instance.user.username.lower()+'-'+time_str_mix_slug()
-                notification_filter = Notification.objects.filter(sender=notify_sender_instance, notify_type__iexact="meal_update", identifier__iexact=identifier)
-                if notification_filter.exists():
-                    counter = notification_filter.first().counter + 1
-                    notification_filter.update(
-                        receiver = notify_receiver_instance,
-                        counter = counter,
-                        updated_at = datetime.datetime.now()
-                    )
-                else:
-                    Notification.objects.create(
-                        sender=notify_sender_instance,
-                        receiver=notify_receiver_instance,
-                        slug=notify_slug,
-                        notify_type=notify_type,
-                        identifier=identifier,
-                        room_identifier=member.membership.room.slug,
-                        counter=1
-                    )
+                notify_receiver_instance    = UserProfile.objects.select_related('user').get(user__username=request_to)
+                # the request may have gone to another maintainer before
+                Notification.objects.filter(
+                    sender=notify_sender_instance, notify_type="meal_update", identifier=meal_slug
+                ).exclude(receiver=notify_receiver_instance).delete()
+                Notification.objects.notify(
+                    notify_sender_instance, notify_receiver_instance, "meal_update",
+                    identifier=meal_slug,
+                    room_identifier=member.membership.room.slug
+                )
                 # ----------- Notification Ends -----------
                 messages.add_message(self.request, messages.SUCCESS,
                 "Your request created successfully and is under review")
@@ -980,7 +716,7 @@ class MealUpdateRequestView(CreateView):
         if Membership.objects.filter(user=member).exists():
             member_instance = Membership.objects.get(user=member)
             meal_filter     = Meal.objects.filter(
-                Q(meal_date__day=now.day, meal_date__month=now.month, meal_date__year=now.year),
+                Q(meal_date=now.date()),
                 member=member_instance
             )
             if meal_filter.exists():
@@ -1008,7 +744,7 @@ class MealUpdateRequestView(CreateView):
             context['time']     = datetime.date.today()
             # meals               = Meal.objects.all()
             member_meal_filter  = Meal.objects.filter(
-                                    Q(meal_date__day__lte=day_to_view, meal_date__month=now.month, meal_date__year=now.year),
+                                    Q(**month_range('meal_date', now, until=now.replace(day=int(day_to_view)))),
                                     member=member_instance
                                     ).order_by('-meal_date')
             if member_meal_filter.exists():
@@ -1053,28 +789,12 @@ def meal_update_request_cancel(request, slug):
                     "Meal Update Request cancelled successfully !")
                     url = request.META.get('HTTP_REFERER', '/')
                     # ----------- Notification Starts -----------
-                    notify_type = "meal_update"
-                    meal_date_filter = Meal.objects.filter(slug=slug)
-                    if meal_date_filter.exists():
-                        identifier = slug
-                        notify_sender_instance      = UserProfile.objects.get(user__username=user)
-                        notify_receiver_instance    = UserProfile.objects.get(user__username=meal_instance.request_to)
-                        notification_filter = Notification.objects.filter(
-                            sender=notify_sender_instance, notify_type__iexact="meal_update", identifier__iexact=identifier, room_identifier=member_instance.room.slug
-                        )
-                        if notification_filter.exists():
-                            notification_filter.delete()
-                        # ----------- Notification Ends -----------
+                    Notification.objects.filter(
+                        sender__user=user, receiver__user=meal_instance.request_to.user, notify_type="meal_update", identifier=slug
+                    ).delete()
+                    # ----------- Notification Ends -----------
             else:
-                suspicious_user = Suspicious.objects.filter(user=user)
-                if suspicious_user.exists():
-                    suspicious_user_instance    = Suspicious.objects.get(user=user)
-                    current_attempt             = suspicious_user_instance.attempt
-                    total_attempt               = current_attempt + 1
-                    update_time                 = datetime.datetime.now()
-                    suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-                else:
-                    Suspicious.objects.get_or_create(user=user)
+                record_suspicious_attempt(user)
                 messages.add_message(request, messages.ERROR, 
                     "You are not allowed. Your account is being tracked for suspicious activity !"
                 )
@@ -1132,36 +852,20 @@ class MealUpdateRequestConfirmView(UpdateView):
                 form.instance.confirmed_by  = member_instance
                 request_filter.delete()
                 # ----------- Notification Creation Starts -----------
-                if UserProfile.objects.filter(user=user).exists():
-                    notify_sender_instance      = UserProfile.objects.get(user=user)
-                    if UserProfile.objects.filter(user=request_instance.member.user).exists():
-                        notify_receiver_instance    = UserProfile.objects.get(user=request_instance.member.user)
-                        notification = Notification.objects.filter(identifier__iexact=slug, sender=notify_receiver_instance, receiver=notify_sender_instance, notify_type__iexact="meal_update")
-                        if notification.exists():
-                            notification.delete()
-                        notify_type = "meal_update_confirmed"
-                        room_slug   = user.membership.room.slug
-                        meal_notify_instance = Meal.objects.filter(slug=slug).last()
-                        notify_slug = notify_receiver_instance.user.username.lower()+'-'+time_str_mix_slug()
-                        notification_filter = Notification.objects.filter(identifier__iexact=slug,sender=notify_sender_instance, receiver=notify_receiver_instance, notify_type__iexact="meal_update_confirmed")
-                        if notification_filter.exists():
-                            counter = notification_filter.first().counter + 1
-                            notification_filter.update(
-                                counter = counter,
-                                updated_at = datetime.datetime.now()
-                            )
-                        else:
-                            Notification.objects.create(
-                                sender=notify_sender_instance,
-                                receiver=notify_receiver_instance,
-                                slug=notify_slug,
-                                category="message",
-                                notify_type=notify_type,
-                                identifier=slug,
-                                room_identifier=room_slug,
-                                counter=1,
-                                message="confirmed your request to update meal of %s and changed it to %s." %(meal_notify_instance.meal_date.strftime("%B-%d-%Y"), meal_today)
-                            )
+                notify_sender_instance      = UserProfile.objects.filter(user=user).first()
+                notify_receiver_instance    = UserProfile.objects.select_related('user').filter(user=request_instance.member.user).first()
+                if notify_sender_instance and notify_receiver_instance:
+                    Notification.objects.filter(
+                        sender=notify_receiver_instance, receiver=notify_sender_instance, notify_type="meal_update", identifier=slug
+                    ).delete()
+                    meal_notify_instance = Meal.objects.filter(slug=slug).last()
+                    Notification.objects.notify(
+                        notify_sender_instance, notify_receiver_instance, "meal_update_confirmed",
+                        identifier=slug,
+                        room_identifier=user.membership.room.slug,
+                        category="message",
+                        message="confirmed your request to update meal of %s and changed it to %s." %(meal_notify_instance.meal_date.strftime("%B-%d-%Y"), meal_today)
+                    )
                 # ----------- Notification Creation Ends -----------
                 messages.add_message(self.request, messages.SUCCESS,
                     "Meal updated successfully !"
@@ -1172,19 +876,10 @@ class MealUpdateRequestConfirmView(UpdateView):
                     "Content Expired !!!"
                 )
         else:
-            instance_user   = user
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-                messages.add_message(self.request, messages.ERROR, 
-                    "You are not allowed. Your account is being tracked for suspicious activity !"
-                )
+            record_suspicious_attempt(user)
+            messages.add_message(self.request, messages.ERROR, 
+                "You are not allowed. Your account is being tracked for suspicious activity !"
+            )
         messages.add_message(self.request, messages.WARNING,
             "Something went wrong !"
         )
@@ -1215,34 +910,19 @@ def meal_update_request_deny(request, slug):
         meal_instance = Meal.objects.filter(slug=slug).last()
         meal_request_filter.delete()
         url = reverse('utils:notification_list')
-        if UserProfile.objects.filter(user=user).exists():
-            notify_sender_instance      = UserProfile.objects.get(user=user)
-            if UserProfile.objects.filter(user=meal_request_notify_instance.member.user).exists():
-                notify_receiver_instance    = UserProfile.objects.get(user=meal_request_notify_instance.member.user)
-                notification = Notification.objects.filter(identifier__iexact=slug, sender=notify_receiver_instance, receiver=notify_sender_instance, notify_type__iexact="meal_update")
-                if notification.exists():
-                    notification.delete()
-                notify_type = "meal_request_cancel"
-                notify_slug = notify_receiver_instance.user.username.lower()+'-'+time_str_mix_slug()
-                notification_filter = Notification.objects.filter(identifier__iexact=slug, sender=notify_sender_instance, receiver=notify_receiver_instance, notify_type__iexact="meal_request_cancel")
-                if notification_filter.exists():
-                    counter = notification_filter.first().counter + 1
-                    notification_filter.update(
-                        counter = counter,
-                        updated_at = datetime.datetime.now()
-                    )
-                else:
-                    Notification.objects.create(
-                        sender=notify_sender_instance,
-                        receiver=notify_receiver_instance,
-                        slug=notify_slug,
-                        category="message",
-                        notify_type=notify_type,
-                        identifier=slug,
-                        room_identifier=room_slug,
-                        counter=1,
-                        message="rejected your request to update meal of %s" %(meal_instance.meal_date.strftime("%B-%d-%Y"))
-                    )
+        notify_sender_instance      = UserProfile.objects.filter(user=user).first()
+        notify_receiver_instance    = UserProfile.objects.select_related('user').filter(user=meal_request_notify_instance.member.user).first()
+        if notify_sender_instance and notify_receiver_instance:
+            Notification.objects.filter(
+                sender=notify_receiver_instance, receiver=notify_sender_instance, notify_type="meal_update", identifier=slug
+            ).delete()
+            Notification.objects.notify(
+                notify_sender_instance, notify_receiver_instance, "meal_request_cancel",
+                identifier=slug,
+                room_identifier=room_slug,
+                category="message",
+                message="rejected your request to update meal of %s" %(meal_instance.meal_date.strftime("%B-%d-%Y"))
+            )
             messages.add_message(request, messages.SUCCESS,
             "Request cancelled successfully !")
             return HttpResponseRedirect(url)
@@ -1251,8 +931,21 @@ def meal_update_request_deny(request, slug):
     return HttpResponseRedirect(url)
 
 
+def shopping_list_context(request, shopping_filter, member_instance):
+    """
+    Paginated shopping list and totals of the shopping entry pages. They
+    are read only when the cached list fragment is rendered again.
+    """
+    paginator = Paginator(shopping_filter, 7)
+    return {
+        'shoppings' : SimpleLazyObject(lambda: paginator.get_page(request.GET.get('page'))),
+        'count'     : SimpleLazyObject(lambda: paginator.count),
+        'total'     : SimpleLazyObject(lambda: TotalHolder.objects.filter(member=member_instance).first()),
+    }
+
+
 @method_decorator(login_required, name='dispatch')
-class ShoppingCreateView(CreateView):
+class ShoppingCreateView(MemberPassesTestMixin, CreateView):
     template_name   = 'tracker/shopping/create.html'
     form_class      = ShoppingCreateForm
 
@@ -1295,54 +988,18 @@ class ShoppingCreateView(CreateView):
             now             = datetime.datetime.now()
             member_instance = member_filter.first()
             shopping_filter = Shopping.objects.filter(
-                created_by=member_instance, shop_type=0, created_by__room=member_instance.room, date__month=now.month, date__year=now.year
+                created_by=member_instance, shop_type=0, created_by__room=member_instance.room, **month_range('date', now)
             ).order_by('-created_at')
-            if shopping_filter.exists():
-                paginator               = Paginator(shopping_filter, 7)
-                page                    = self.request.GET.get('page')
-                paginated_shoppings     = paginator.get_page(page)
-                context['shoppings']    = paginated_shoppings
-                context['count']        = shopping_filter.count()
-            total_filter = TotalHolder.objects.filter(
-                member=member_instance
-            )
-            if total_filter.exists():
-                context['total'] = total_filter.first()
+            context.update(shopping_list_context(self.request, shopping_filter, member_instance))
             context['time'] = now
         return context
 
-    def user_passes_test(self, request):
-        if request.user.is_authenticated:
-            self.member = self.request.user.membership
-            room_slug = self.member.room.slug
-            member_filter = Membership.objects.filter(user=request.user, room__slug=room_slug).only('user', 'room')
-            if member_filter.exists():
-                return True
-        return False
-
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(ShoppingCreateView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class MonthlyShoppingCreateView(CreateView):
+class MonthlyShoppingCreateView(MemberPassesTestMixin, CreateView):
     template_name   = 'tracker/shopping/create.html'
     form_class      = ShoppingCreateForm
+    allowed_roles   = (Membership.MANAGER,)
 
     def form_valid(self, form):
         user = self.request.user
@@ -1383,54 +1040,15 @@ class MonthlyShoppingCreateView(CreateView):
             now             = datetime.datetime.now()
             member_instance = member_filter.first()
             shopping_filter = Shopping.objects.filter(
-                created_by__room=member_instance.room, shop_type=1, date__month=now.month, date__year=now.year
+                created_by__room=member_instance.room, shop_type=1, **month_range('date', now)
             ).order_by('-created_at')
-            if shopping_filter.exists():
-                paginator               = Paginator(shopping_filter, 7)
-                page                    = self.request.GET.get('page')
-                paginated_shoppings     = paginator.get_page(page)
-                context['shoppings']    = paginated_shoppings
-                context['count']        = shopping_filter.count()
-            total_filter = TotalHolder.objects.filter(
-                member=member_instance
-            )
-            if total_filter.exists():
-                context['total'] = total_filter.first()
+            context.update(shopping_list_context(self.request, shopping_filter, member_instance))
             context['time'] = now
         return context
 
-    def user_passes_test(self, request):
-        if request.user.is_authenticated:
-            self.member = self.request.user.membership
-            room_slug = self.member.room.slug
-            member_filter = Membership.objects.filter(user=request.user, room__slug=room_slug)
-            if member_filter.exists():
-                member_instance = member_filter.first()
-                if member_instance.role == 2:
-                    return True
-        return False
-
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(MonthlyShoppingCreateView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class ShoppingUpdateView(UpdateView):
+class ShoppingUpdateView(MemberPassesTestMixin, UpdateView):
     template_name   = 'tracker/shopping/update.html'
     form_class      = ShoppingUpdateForm
 
@@ -1481,54 +1099,24 @@ class ShoppingUpdateView(UpdateView):
             now             = datetime.datetime.now()
             member_instance = member_filter.first()
             shopping_filter = Shopping.objects.filter(
-                created_by=member_instance, shop_type=0, created_by__room=member_instance.room, date__month=now.month, date__year=now.year
+                created_by=member_instance, shop_type=0, created_by__room=member_instance.room, **month_range('date', now)
             ).order_by('-created_at')
-            if shopping_filter.exists():
-                paginator       = Paginator(shopping_filter, 7)
-                page            = self.request.GET.get('page')
-                paginated_shoppings     = paginator.get_page(page)
-                context['shoppings']    = paginated_shoppings
-                context['count']        = shopping_filter.count()
-            total_filter = TotalHolder.objects.filter(
-                member=member_instance
-            )
-            if total_filter.exists():
-                context['total'] = total_filter.first()
+            context.update(shopping_list_context(self.request, shopping_filter, member_instance))
             context['time'] = now
         return context
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(ShoppingUpdateView, self).user_passes_test(request):
             self.object = self.get_object()
-            member_filter = Membership.objects.filter(user=request.user)
-            if member_filter.exists():
-                member_instance = member_filter.first()
-                return self.object.created_by == member_instance
+            return self.object.created_by_id == self.get_membership().pk
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(ShoppingUpdateView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class MonthlyShoppingUpdateView(UpdateView):
+class MonthlyShoppingUpdateView(MemberPassesTestMixin, UpdateView):
     template_name   = 'tracker/shopping/update.html'
     form_class      = ShoppingUpdateForm
+    allowed_roles   = (Membership.MANAGER,)
 
     def get_object(self):
         slug = self.kwargs['slug']
@@ -1577,53 +1165,21 @@ class MonthlyShoppingUpdateView(UpdateView):
             now             = datetime.datetime.now()
             member_instance = member_filter.first()
             shopping_filter = Shopping.objects.filter(
-                shop_type=1, created_by__room=member_instance.room, date__month=now.month, date__year=now.year
+                shop_type=1, created_by__room=member_instance.room, **month_range('date', now)
             ).order_by('-created_at')
-            if shopping_filter.exists():
-                paginator               = Paginator(shopping_filter, 7)
-                page                    = self.request.GET.get('page')
-                paginated_shoppings     = paginator.get_page(page)
-                context['shoppings']    = paginated_shoppings
-                context['count']        = shopping_filter.count()
-            total_filter = TotalHolder.objects.filter(
-                member=member_instance
-            )
-            if total_filter.exists():
-                context['total'] = total_filter.first()
+            context.update(shopping_list_context(self.request, shopping_filter, member_instance))
             context['time'] = now
         return context
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(MonthlyShoppingUpdateView, self).user_passes_test(request):
             self.object = self.get_object()
-            member_filter = Membership.objects.filter(user=request.user)
-            if member_filter.exists():
-                member_instance = member_filter.first()
-                if self.object.created_by.room == member_instance.room and member_instance.role == 2:
-                    return True
+            return self.object.created_by.room_id == self.get_membership().room_id
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(MonthlyShoppingUpdateView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class ShoppingDeleteView(DeleteView):
+class ShoppingDeleteView(MemberPassesTestMixin, DeleteView):
     model           = Shopping
     template_name   = 'tracker/shopping/delete.html'
 
@@ -1644,38 +1200,17 @@ class ShoppingDeleteView(DeleteView):
         return reverse('tracker:shopping_create')
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(ShoppingDeleteView, self).user_passes_test(request):
             self.object = self.get_object()
-            room_slug = self.object.created_by.room.slug
-            member_filter = Membership.objects.filter(user=request.user, room__slug=room_slug)
-            if member_filter.exists():
-                return self.object.created_by.user == request.user
+            return self.object.created_by_id == self.get_membership().pk
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(ShoppingDeleteView, self).dispatch(request, *args, **kwargs)
-
-
 
 @method_decorator(login_required, name='dispatch')
-class MonthlyShoppingDeleteView(DeleteView):
+class MonthlyShoppingDeleteView(MemberPassesTestMixin, DeleteView):
     model           = Shopping
     template_name   = 'tracker/shopping/delete.html'
+    allowed_roles   = (Membership.MANAGER,)
 
     def get_object(self):
         slug = self.kwargs['slug']
@@ -1694,38 +1229,17 @@ class MonthlyShoppingDeleteView(DeleteView):
         return reverse('tracker:monthly_shopping_create')
 
     def user_passes_test(self, request):
-        if request.user.is_authenticated:
+        if super(MonthlyShoppingDeleteView, self).user_passes_test(request):
             self.object = self.get_object()
-            room_slug = self.object.created_by.room.slug
-            member_filter = Membership.objects.filter(user=request.user, room__slug=room_slug)
-            if member_filter.exists():
-                if self.object.created_by.room == request.user.membership.room and request.user.membership.role ==2:
-                    return True
+            return self.object.created_by.room_id == self.get_membership().room_id
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(MonthlyShoppingDeleteView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class CashDepositFieldCreateView(CreateView):
+class CashDepositFieldCreateView(MemberPassesTestMixin, CreateView):
     template_name   = 'tracker/deposit/create.html'
     form_class      = CashDepositFieldCreateForm
+    allowed_roles   = (Membership.MANAGER,)
 
     def form_valid(self, form):
         room_instance       = self.request.user.membership.room
@@ -1756,36 +1270,12 @@ class CashDepositFieldCreateView(CreateView):
             context['deposit_fields']   = deposit_fields_filter
         return context
 
-    def user_passes_test(self, request):
-        user = request.user
-        if user.membership:
-            if user.membership.role == 2:
-                return True
-        return False
-
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(CashDepositFieldCreateView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class CashDepositFieldUpdateView(UpdateView):
+class CashDepositFieldUpdateView(MemberPassesTestMixin, UpdateView):
     template_name   = 'tracker/deposit/update.html'
     form_class      = CashDepositFieldCreateForm
+    allowed_roles   = (Membership.MANAGER,)
 
     def get_object(self):
         slug = self.kwargs['slug']
@@ -1820,34 +1310,16 @@ class CashDepositFieldUpdateView(UpdateView):
         return context
 
     def user_passes_test(self, request):
-        user = request.user
-        if user.membership:
-            object = self.get_object()
-            if user.membership.role == 2 and object.room == user.membership.room:
-                return True
+        if super(CashDepositFieldUpdateView, self).user_passes_test(request):
+            self.object = self.get_object()
+            return self.object.room_id == self.get_membership().room_id
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(CashDepositFieldUpdateView, self).dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
-class CashDepositFieldDeleteView(DeleteView):
+class CashDepositFieldDeleteView(MemberPassesTestMixin, DeleteView):
     template_name   = 'tracker/deposit/delete.html'
+    allowed_roles   = (Membership.MANAGER,)
 
     def get_object(self):
         slug = self.kwargs['slug']
@@ -1860,36 +1332,17 @@ class CashDepositFieldDeleteView(DeleteView):
         return reverse('tracker:deposit_field_create')
 
     def user_passes_test(self, request):
-        user = request.user
-        if user.membership:
-            object = self.get_object()
-            if user.membership.role == 2 and object.room == user.membership.room:
-                return True
+        if super(CashDepositFieldDeleteView, self).user_passes_test(request):
+            self.object = self.get_object()
+            return self.object.room_id == self.get_membership().room_id
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(CashDepositFieldDeleteView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class CashDepositFieldAssignView(CreateView):
+class CashDepositFieldAssignView(MemberPassesTestMixin, CreateView):
     template_name   = 'tracker/deposit/assign.html'
     form_class      = AssignCashDepositToMemberForm
+    allowed_roles   = (Membership.MANAGER,)
 
     def get_success_url(self):
         if self.request.user.membership:
@@ -1923,317 +1376,314 @@ class CashDepositFieldAssignView(CreateView):
         return context
 
     def user_passes_test(self, request):
-        user = request.user
-        if user.membership:
-            slug = self.kwargs['slug']
-            membership_filter = Membership.objects.filter(slug=slug)
-            if membership_filter.exists():
-                member = membership_filter.first()
-            if user.membership.role == 2 and user.membership.room == member.room:
-                return True
+        if super(CashDepositFieldAssignView, self).user_passes_test(request):
+            return Membership.objects.filter(
+                slug=self.kwargs['slug'], room_id=self.get_membership().room_id
+            ).exists()
         return False
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(CashDepositFieldAssignView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class CostChartView(ListView):
-    template_name   = 'tracker/cost-chart.html'
+class CostChartView(MemberPassesTestMixin, RoomChartCacheMixin, ListView):
+    template_name       = 'tracker/cost-chart.html'
+    chart_template_name = 'tracker/snippets/cost-chart-table.html'
+    chart_cache_name    = 'cost_chart'
+    allowed_roles       = (Membership.SUPERVISOR, Membership.MANAGER)
+    replica_reads       = True
     
     def get_queryset(self, *args, **kwargs):
-        user = self.request.user
-        user_membership_filter = Membership.objects.filter(user=user).only('user')
-        if user_membership_filter.exists():
-            user_membership = Membership.objects.get(slug=user.membership.slug)
-            room_instance   = user_membership.room
-            member_trackers_filter = MemberTrack.objects.filter(member__room=room_instance).only('member')
-            if member_trackers_filter.exists():
-                query = member_trackers_filter
-                return query
+        room_instance           = self.get_membership().room
+        member_trackers_filter  = MemberTrack.objects.filter(member__room=room_instance)
+        if member_trackers_filter.exists():
+            return member_trackers_filter
         return None
 
     def get_context_data(self, **kwargs):
         context             = super(CostChartView, self).get_context_data(**kwargs)
-        user                = self.request.user
-        now                 = datetime.datetime.now()
-        user_membership_filter = Membership.objects.filter(user=user).only('user')
-        if user_membership_filter.exists():
-            user_membership = Membership.objects.get(slug=user.membership.slug)
-            room_instance   = user_membership.room
-            room_trackers_filter = TrackerField.objects.filter(room=room_instance).only('room')
-            if room_trackers_filter.exists():
-                context['fields'] = room_trackers_filter
-            room_members_filter = Membership.objects.filter(room=room_instance).only('room')
-            if room_members_filter.exists():
-                context['members'] = room_members_filter
-            total_filter = TotalHolder.objects.filter(member__room=room_instance).only('member')
-            if total_filter.exists():
-                context['totals'] = total_filter
-                context['total_cost_room'] = total_filter.first().get_total_cost_sector_room
+        room_instance       = self.get_membership().room
+        room_trackers_filter = TrackerField.objects.filter(room=room_instance)
+        if room_trackers_filter.exists():
+            context['fields'] = room_trackers_filter
+        room_members = list(Membership.objects.filter(room=room_instance).select_related(
+            'user__profile'
+        ).prefetch_related('user__socialaccount_set'))
+        if room_members:
+            context['members'] = room_members
+        totals = list(TotalHolder.objects.with_cost_sector_total().filter(
+            member__room=room_instance
+        ).select_related('member'))
+        if totals:
+            context['totals'] = totals
+            context['total_cost_room'] = totals[0].get_total_cost_sector_room
         return context
 
-    def user_passes_test(self, request):
-        user = request.user
-        if user.membership:
-            if user.membership.role == 1 or user.membership.role == 2:
-                return True
-        return False
-
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(CostChartView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class MealChartView(ListView):
-    template_name   = 'tracker/meal/meal-chart-overview.html'
-    
-    def get_queryset(self, *args, **kwargs):
-        user        = self.request.user
+class MealChartView(MemberPassesTestMixin, ListView):
+    """
+    The chart is built on first use only: the template caches it per room
+    (see the room_cache tag), so a cached chart runs none of its queries.
+    """
+    template_name       = 'tracker/meal/meal-chart-overview.html'
+    # a model lookup on the lazy rows would build the chart
+    context_object_name = 'rows'
+    replica_reads       = True
+
+    def get_template_names(self):
+        return [self.template_name]
+
+    def get_chart(self):
         now         = datetime.datetime.now()
         next_day    = (datetime.date.today() + datetime.timedelta(days=1))
         day_range   = calendar.monthrange(now.year, now.month)[1]
-        user_membership_filter = Membership.objects.filter(user=user)
-        if user_membership_filter.exists():
-            user_membership = Membership.objects.get(slug=user.membership.slug)
-            room_instance   = user_membership.room
-            if now.day < day_range:
-                member_meals_filter = Meal.objects.filter(
-                    member__room=room_instance, meal_date__day__lte=next_day.day, meal_date__month=now.month, meal_date__year=now.year
-                )
-            else:
-                member_meals_filter = Meal.objects.filter(
-                    member__room=room_instance, meal_date__day__lte=now.day, meal_date__month=now.month, meal_date__year=now.year
-                )
-            if member_meals_filter.exists():
-                query = member_meals_filter.order_by('member__created_at')
-                return query
-        return None
-
-    def get_context_data(self, **kwargs):
-        context         = super(MealChartView, self).get_context_data(**kwargs)
-        user            = self.request.user
-        now             = datetime.datetime.now()
-        next_day        = (datetime.date.today() + datetime.timedelta(days=1))
-        day_range       = calendar.monthrange(now.year, now.month)[1]
-        def daterange(start_date, end_date):
-            for n in range(int ((end_date - start_date).days) + 1):
-                yield start_date + datetime.timedelta(n)
-        start_date      = datetime.date(now.year, now.month, 1)
+        start_date  = datetime.date(now.year, now.month, 1)
         if now.day < day_range:
-            end_date        = datetime.date(now.year, now.month, next_day.day)
+            end_date    = next_day
         else:
-            end_date        = datetime.date(now.year, now.month, now.day)
-        user_membership_filter = Membership.objects.filter(user=user).only('user')
-        if user_membership_filter.exists():
-            user_membership = Membership.objects.get(slug=user.membership.slug)
-            room_instance   = user_membership.room
-            room_members_filter = Membership.objects.filter(room=room_instance).only('user')
-            if room_members_filter.exists():
-                context['members'] = room_members_filter.order_by('created_at')
-            context['dates'] = daterange(start_date, end_date)
-            context['time'] = now
-            if now.day == day_range:
-                meal_next_month = Meal.objects.filter(
-                    member__room=room_instance, meal_date__day=next_day.day, meal_date__month=next_day.month, meal_date__year=next_day.year
-                ).only('meal_today')
-                if meal_next_month.exists():
-                    context['next_month_meal'] = meal_next_month
-                    context['next_date'] = next_day
-            total_filter = TotalHolder.objects.filter(member__room=room_instance)
-            if total_filter.exists():
-                context['totals'] = total_filter.order_by('member__created_at')
-                context['total_meal_room'] = total_filter.first().get_total_meal_room
-        return context
+            end_date    = now.date()
+        room_instance   = self.get_membership().room
+        chart           = build_meal_chart(room_instance, start_date, end_date, total_until=now.date())
+        chart['next_month_meal'] = None
+        if now.day == day_range:
+            next_month_chart = build_meal_chart(room_instance, next_day, next_day)
+            if any(next_month_chart['rows'][0]['cells']):
+                chart['next_month_meal'] = next_month_chart['rows'][0]
+        return chart
 
-    def user_passes_test(self, request):
-        user = request.user
-        membership_filter = Membership.objects.filter(user=user)
-        if membership_filter.exists():
-            return True
-        return False
+    def get_queryset(self, *args, **kwargs):
+        self.chart = SimpleLazyObject(self.get_chart)
+        return SimpleLazyObject(lambda: self.chart['rows'])
 
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(MealChartView, self).dispatch(request, *args, **kwargs)
+    def get_context_data(self, **kwargs):
+        context                 = super(MealChartView, self).get_context_data(**kwargs)
+        context['time']         = datetime.datetime.now()
+        context['chart']        = self.chart
+        context['next_date']    = datetime.date.today() + datetime.timedelta(days=1)
+        # members share the cached chart, a modifier gets a copy with the
+        # edit links of the others
+        context['chart_editor'] = self.request.user.pk if get_member_context(self.request).is_modifier else 0
+        return context
 
 
 @method_decorator(login_required, name='dispatch')
-class ShoppingChartView(ListView):
-    template_name   = 'tracker/shopping/chart.html'
+class ShoppingChartView(MemberPassesTestMixin, RoomChartCacheMixin, ListView):
+    template_name       = 'tracker/shopping/chart.html'
+    chart_template_name = 'tracker/shopping/snippets/chart-tables.html'
+    chart_cache_name    = 'shopping_chart'
+    allowed_roles       = (Membership.SUPERVISOR, Membership.MANAGER)
+    replica_reads       = True
+
+    def get_chart_vary(self):
+        return ()
 
     def get_queryset(self, *args, **kwargs):
-        user = self.request.user
-        now  = datetime.datetime.now()
-        membership_filter = Membership.objects.filter(user=user)
-        if membership_filter.exists():
-            membership_instance = Membership.objects.get(user=user)
-            shop_type_filter = ManagerialSetting.objects.filter(room=membership_instance.room)
-            if shop_type_filter.exists():
-                shop_type = shop_type_filter.first().shopping_type
-                if shop_type == 0:
-                    shopping_filter = Shopping.objects.filter(created_by__room=membership_instance.room, shop_type=0, date__month=now.month, date__year=now.year)
-                else:
-                    shopping_filter = Shopping.objects.filter(created_by__room=membership_instance.room, shop_type=1, date__month=now.month, date__year=now.year)
-            if shopping_filter.exists():
-                query = shopping_filter.order_by('-created_at')
+        now             = datetime.datetime.now()
+        room_instance   = self.get_membership().room
+        room_setting    = get_member_context(self.request).room_setting
+        if room_setting:
+            shop_type = 0 if room_setting.shopping_type == 0 else 1
+            shopping_filter = Shopping.objects.filter(created_by__room=room_instance, shop_type=shop_type, **month_range('date', now))
+            query = shopping_filter.order_by('-created_at')
+            if query:
                 return query
         return None
 
     def get_context_data(self, **kwargs):
         context             = super(ShoppingChartView, self).get_context_data(**kwargs)
-        user                = self.request.user
         now                 = datetime.datetime.now()
-        user_membership_filter = Membership.objects.filter(user=user).only('user')
-        if user_membership_filter.exists():
-            user_membership = Membership.objects.get(slug=user.membership.slug)
-            room_instance   = user_membership.room
-            room_members_filter = Membership.objects.filter(room=room_instance).only('room')
-            if room_members_filter.exists():
-                context['members'] = room_members_filter
-            total_filter = TotalHolder.objects.filter(member__room=room_instance).only('member')
-            if total_filter.exists():
-                context['totals'] = total_filter
-                context['room_total_shopping'] = total_filter.first()
-            shop_type_filter = ManagerialSetting.objects.filter(room=room_instance)
-            if shop_type_filter.exists():
-                shop_type = shop_type_filter.first().shopping_type
-                if shop_type == 0:
-                    shopping_filter = Shopping.objects.filter(created_by__room=room_instance, shop_type=1, date__month=now.month, date__year=now.year)
-                    if shopping_filter.exists():
-                        context['managerial_shop'] = shopping_filter
+        room_instance       = self.get_membership().room
+        room_members = list(Membership.objects.filter(room=room_instance).select_related(
+            'user__profile'
+        ).prefetch_related('user__socialaccount_set'))
+        if room_members:
+            context['members'] = room_members
+        totals = list(TotalHolder.objects.with_ledger().filter(member__room=room_instance))
+        if totals:
+            context['totals'] = totals
+            context['room_total_shopping'] = totals[0]
+        room_setting = get_member_context(self.request).room_setting
+        if room_setting and room_setting.shopping_type == 0:
+            shopping_filter = Shopping.objects.filter(created_by__room=room_instance, shop_type=1, **month_range('date', now))
+            if shopping_filter:
+                context['managerial_shop'] = shopping_filter
         return context
 
-    def user_passes_test(self, request):
-        user = request.user
-        if user.membership:
-            if user.membership.role == 1 or user.membership.role == 2:
-                return True
-        return False
-
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(ShoppingChartView, self).dispatch(request, *args, **kwargs)
-
 
 @method_decorator(login_required, name='dispatch')
-class DepositChartView(ListView):
-    template_name   = 'tracker/deposit/chart.html'
+class DepositChartView(MemberPassesTestMixin, RoomChartCacheMixin, ListView):
+    template_name       = 'tracker/deposit/chart.html'
+    chart_template_name = 'tracker/deposit/snippets/chart-table.html'
+    chart_cache_name    = 'deposit_chart'
+    allowed_roles       = (Membership.SUPERVISOR, Membership.MANAGER)
+    replica_reads       = True
 
     def get_queryset(self, *args, **kwargs):
-        user = self.request.user
         now  = datetime.datetime.now()
-        member_deposit_filter = CashDepositMember.objects.filter(member__room=user.membership.room, created_at__month=now.month, created_at__year=now.year)
-        if member_deposit_filter.exists():
+        member_deposit_filter = CashDepositMember.objects.filter(
+            member__room=self.get_membership().room, **month_range('created_at', now)
+        )
+        if member_deposit_filter:
             return member_deposit_filter
         return None
 
     def get_context_data(self, **kwargs):
         context             = super(DepositChartView, self).get_context_data(**kwargs)
-        user                = self.request.user
-        # now                 = datetime.datetime.now()
-        room_members_filter = Membership.objects.filter(room=user.membership.room)
-        if room_members_filter.exists():
-            context['members'] = room_members_filter
-            deposit_field_filter = CashDepositField.objects.filter(room=user.membership.room)
-            if deposit_field_filter.exists():
+        room_instance       = self.get_membership().room
+        room_members = list(Membership.objects.filter(room=room_instance).select_related(
+            'user__profile'
+        ).prefetch_related('user__socialaccount_set'))
+        if room_members:
+            context['members'] = room_members
+            deposit_field_filter = CashDepositField.objects.filter(room=room_instance)
+            if deposit_field_filter:
                 context['fields'] = deposit_field_filter
-        total_filter = TotalHolder.objects.filter(member__room=user.membership.room).only('member')
-        if total_filter.exists():
-            context['totals'] = total_filter
-            context['total_room_deposit'] = total_filter.first().get_deposit_total_room
+        totals = list(TotalHolder.objects.with_ledger().filter(member__room=room_instance))
+        if totals:
+            context['totals'] = totals
+            context['total_room_deposit'] = totals[0].get_deposit_total_room
         return context
 
-    def user_passes_test(self, request):
-        user = request.user
-        if user.membership:
-            if user.membership.role == 1 or user.membership.role == 2:
-                return True
-        return False
-
-    def dispatch(self, request, *args, **kwargs):
-        instance_user   = self.request.user
-        if not self.user_passes_test(request):
-            suspicious_user = Suspicious.objects.filter(user=instance_user)
-            if suspicious_user.exists():
-                suspicious_user_instance    = Suspicious.objects.get(user=instance_user)
-                current_attempt             = suspicious_user_instance.attempt
-                total_attempt               = current_attempt + 1
-                update_time                 = datetime.datetime.now()
-                suspicious_user.update(attempt=total_attempt, last_attempt=update_time)
-            else:
-                Suspicious.objects.get_or_create(user=instance_user)
-            messages.add_message(self.request, messages.ERROR, 
-                "You are not allowed. Your account is being tracked for suspicious activity !"
-            )
-            return HttpResponseRedirect(reverse('home'))
-        return super(DepositChartView, self).dispatch(request, *args, **kwargs)
 
 @method_decorator(login_required, name='dispatch')
-class AnalyticsView(ListView):
-    template_name   = 'tracker/analytics/analytics.html'
-    queryset        = MemberTrack.objects.all()
+class AnalyticsView(RoomChartCacheMixin, ListView):
+    template_name       = 'tracker/analytics/analytics.html'
+    chart_template_name = 'tracker/analytics/snippets/analytics-panel.html'
+    chart_cache_name    = 'analytics'
+    queryset            = MemberTrack.objects.all()
+    replica_reads       = True
+
+    def get_chart_vary(self):
+        return ()
 
     def get_queryset(self, *args, **kwargs):
         request = self.request
         room_instance   = request.user.membership.room
-        query   = MemberTrack.objects.filter(member__room=room_instance)
-        return query
\ No newline at end of file
+        query   = MemberTrack.objects.filter(member__room=room_instance).select_related('tracker_field')
+        return query
+
+
+@method_decorator(login_required, name='dispatch')
+class ChartDataView(MemberPassesTestMixin, View):
+    """
+    Data of the meal, cost, shopping or deposit chart as JSON. A request
+    whose If-None-Match matches the chart ETag gets 304 Not Modified
+    before any aggregate runs (see tracker.charts.chart_etag).
+    """
+    # roles of the matching chart pages, None lets any member in
+    chart_roles = {
+        'meals'     : None,
+        'costs'     : (Membership.SUPERVISOR, Membership.MANAGER),
+        'shopping'  : (Membership.SUPERVISOR, Membership.MANAGER),
+        'deposits'  : (Membership.SUPERVISOR, Membership.MANAGER),
+    }
+    replica_reads = True
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.kwargs['chart'] not in CHART_DATA:
+            raise Http404("Not found !!!")
+        self.allowed_roles = self.chart_roles[self.kwargs['chart']]
+        return super(ChartDataView, self).dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        chart   = self.kwargs['chart']
+        room    = self.get_membership().room
+        if not chart_cacheable(room.pk, datetime.date.today()):
+            # data read from a lagging replica must not be revalidated later
+            response = JsonResponse(CHART_DATA[chart](room))
+            patch_cache_control(response, private=True, no_store=True)
+            return response
+        etag    = quote_etag(chart_etag(room, chart))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse(CHART_DATA[chart](room))
+        response['ETag'] = etag
+        # private: the data is the room of the requesting user
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+@method_decorator(login_required, name='dispatch')
+class RoomExportView(MemberPassesTestMixin, View):
+    """
+    Streams a section (meals, shopping, costs, deposits or totals) of the
+    room data as CSV for ?start=YYYY-MM&end=YYYY-MM, by default the
+    current month.
+    """
+    allowed_roles   = (Membership.SUPERVISOR, Membership.MANAGER)
+    replica_reads   = True
+
+    def get(self, request, *args, **kwargs):
+        section = self.kwargs['section']
+        if section not in EXPORT_SECTIONS:
+            raise Http404("Not found !!!")
+        try:
+            months = export_months(request.GET.get('start'), request.GET.get('end'))
+        except ValueError as error:
+            messages.add_message(request, messages.ERROR, "Export failed: %s" % error)
+            return HttpResponseRedirect(reverse('tracker:meal_chart'))
+        room        = self.get_membership().room
+        filename    = '%s-%s-%s.csv' % (room.slug, section, months[0].strftime("%Y%m"))
+        if len(months) > 1:
+            filename = filename[:-4] + months[-1].strftime("-%Y%m") + '.csv'
+        response = StreamingHttpResponse(
+            replica_stream(stream_csv(export_rows(room, section, months))), content_type='text/csv'
+        )
+        response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+        return response
+
+
+@method_decorator(login_required, name='dispatch')
+class SettlementView(MemberPassesTestMixin, TemplateView):
+    """
+    Meal rate and member balances of ?month=YYYY-MM, by default the
+    current month (see tracker.settlement.settle_month).
+    """
+    template_name       = 'tracker/settlement.html'
+    allowed_roles       = (Membership.SUPERVISOR, Membership.MANAGER)
+    allow_room_creator  = True
+    replica_reads       = True
+
+    def get_month(self):
+        try:
+            return parse_month(self.request.GET['month'])
+        except (KeyError, ValueError):
+            return datetime.date.today().replace(day=1)
+
+    def get_context_data(self, **kwargs):
+        context                 = super(SettlementView, self).get_context_data(**kwargs)
+        month                   = self.get_month()
+        context['settlement']   = settle_month(self.get_membership().room, month.year, month.month)
+        context['previous']     = (month - datetime.timedelta(days=1)).strftime("%Y-%m")
+        context['next']         = month_bounds(month)[1].strftime("%Y-%m")
+        return context
+
+
+@method_decorator(login_required, name='dispatch')
+class MonthCloseView(MemberPassesTestMixin, TemplateView):
+    """
+    Lets the room manager close the previous month (see ClosedMonthManager.close).
+    """
+    template_name       = 'tracker/month-close.html'
+    allowed_roles       = (Membership.MANAGER,)
+    allow_room_creator  = True
+
+    def get_month(self):
+        return datetime.date.today().replace(day=1) - datetime.timedelta(days=1)
+
+    def get_context_data(self, **kwargs):
+        context                     = super(MonthCloseView, self).get_context_data(**kwargs)
+        room                        = self.get_membership().room
+        context['month']            = self.get_month()
+        context['closed_months']    = ClosedMonth.objects.filter(room=room).select_related('closed_by__user')
+        return context
+
+    def post(self, request, *args, **kwargs):
+        membership  = self.get_membership()
+        month       = self.get_month()
+        closed      = ClosedMonth.objects.close(membership.room, month.year, month.month, closed_by=membership)
+        messages.add_message(request, messages.SUCCESS,
+            "%s closed: %s meals, %s shoppings and %s deposits archived." % (
+                month.strftime("%B %Y"), closed.meals, closed.shoppings, closed.deposits
+            )
+        )
+        return HttpResponseRedirect(reverse('tracker:month_close'))
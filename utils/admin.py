@@ -1,9 +1,16 @@
 from django.contrib import admin
-from .models import Notification
+from .models import Notification, NotificationInbox
 
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ['sender', 'receiver', 'category', 'notify_type', 'identifier', 'room_identifier', 'slug', 'counter', 'created_at', 'updated_at']
+    list_display = ['sender', 'receiver', 'category', 'notify_type', 'identifier', 'room_identifier', 'slug', 'counter', 'is_read', 'created_at', 'updated_at']
     class Meta:
         model = Notification
 
 admin.site.register(Notification, NotificationAdmin)
+
+class NotificationInboxAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'unread', 'updated_at']
+    class Meta:
+        model = NotificationInbox
+
+admin.site.register(NotificationInbox, NotificationInboxAdmin)
@@ -0,0 +1,68 @@
+import datetime
+from django.db.models import Q
+from .models import Notification
+
+# notifications shown in the navbar dropdown
+NOTIFICATION_PREVIEW_SIZE   = 5
+CURSOR_FORMAT               = "%Y%m%d%H%M%S%f"
+
+
+def encode_cursor(notification):
+    return '%s-%s' % (notification.updated_at.strftime(CURSOR_FORMAT), notification.pk)
+
+
+def decode_cursor(cursor):
+    """
+    Returns (updated_at, id) of a cursor made by encode_cursor(), or None
+    when it is missing or malformed.
+    """
+    try:
+        timestamp, pk = cursor.split('-')
+        return datetime.datetime.strptime(timestamp, CURSOR_FORMAT), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+class InboxPage(object):
+    def __init__(self, notifications, has_newer, has_older):
+        self.notifications  = notifications
+        self.has_newer      = has_newer and bool(notifications)
+        self.has_older      = has_older and bool(notifications)
+
+    @property
+    def newer_cursor(self):
+        if self.has_newer:
+            return encode_cursor(self.notifications[0])
+        return None
+
+    @property
+    def older_cursor(self):
+        if self.has_older:
+            return encode_cursor(self.notifications[-1])
+        return None
+
+
+def inbox_page(receiver, size, before=None, after=None):
+    """
+    One page of the inbox of receiver, newest first, using keyset
+    pagination on (updated_at, id): `before` gives the page older than a
+    cursor, `after` the page newer than it. Each page is a single indexed
+    range read of size + 1 rows whatever its depth, no OFFSET or COUNT.
+    """
+    queryset    = Notification.objects.inbox(receiver).select_related(
+        'sender__user__profile'
+    ).prefetch_related('sender__user__socialaccount_set')
+    before      = decode_cursor(before)
+    after       = decode_cursor(after)
+    if after is not None:
+        updated_at, pk  = after
+        newer           = list(queryset.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk)
+        ).order_by('updated_at', 'id')[:size + 1])
+        notifications   = newer[:size][::-1]
+        return InboxPage(notifications, has_newer=len(newer) > size, has_older=True)
+    if before is not None:
+        updated_at, pk  = before
+        queryset        = queryset.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lt=pk))
+    older = list(queryset[:size + 1])
+    return InboxPage(older[:size], has_newer=before is not None, has_older=len(older) > size)
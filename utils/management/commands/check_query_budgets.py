@@ -0,0 +1,128 @@
+import datetime
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from memberships.models import Membership, MemberRequest
+from tracker.models import Meal, MealUpdateRequest, Shopping, TrackerField, CashDepositField
+from utils.profiling import check_query_budgets, QUERY_BUDGETS
+
+
+class Command(BaseCommand):
+    help = (
+        "Request the tracker, rooms and memberships views as a room manager and fail when "
+        "one of them runs more statements than its budget in utils.profiling.QUERY_BUDGETS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="A room manager, e.g. one created by seed_benchmark_data.")
+
+    def handle(self, *args, **options):
+        member = Membership.objects.filter(
+            user__username=options['username'], role=Membership.MANAGER
+        ).select_related('user', 'room').first()
+        if member is None:
+            raise CommandError("%s is not a room manager." % options['username'])
+        client = Client()
+        client.force_login(member.user)
+        try:
+            counts = check_query_budgets(
+                client, url_kwargs=self.url_kwargs(member), changing=self.changing_views(member)
+            )
+        except AssertionError as error:
+            raise CommandError(str(error))
+        for name, count in sorted(counts.items()):
+            self.stdout.write("%-40s %4s / %s" % (name, count, QUERY_BUDGETS[name]))
+        self.stdout.write(self.style.SUCCESS("All %s requested views are within budget." % len(counts)))
+
+    def url_kwargs(self, member):
+        """
+        Route kwargs of the views taking arguments whose GET changes nothing,
+        from the rows of the room of `member`.
+        """
+        today       = datetime.date.today()
+        other       = Membership.objects.filter(room=member.room).exclude(pk=member.pk).order_by('pk').first()
+        field       = TrackerField.objects.filter(room=member.room).order_by('pk').first()
+        deposit     = CashDepositField.objects.filter(room=member.room).order_by('pk').first()
+        monthly     = Shopping.objects.filter(created_by__room=member.room, shop_type=Shopping.MANAGERIAL).order_by('pk').first()
+        meal        = Meal.objects.filter(member=member, meal_date=today).order_by('pk').last()
+        other_meal  = Meal.objects.filter(member=other, meal_date=today).order_by('pk').last() if other else None
+        url_kwargs  = {
+            'rooms:room_detail'         : {'slug': member.room.slug},
+            'rooms:room_update'         : {'slug': member.room.slug},
+            'memberships:member_update' : {'slug': member.slug},
+            'rooms:room_delete'         : {'slug': member.room.slug},
+            'memberships:member_request_create': {'slug': member.room.slug},
+            'tracker:chart_data'        : {'chart': 'meals'},
+            # the section running the most statements for the current month
+            'tracker:export'            : {'section': 'totals'},
+        }
+        by_row = (
+            (other, ('tracker:assign_field_to_member', 'tracker:deposit_field_assign')),
+            (field, ('tracker:tracker_update', 'tracker:tracker_delete')),
+            (deposit, ('tracker:deposit_field_update', 'tracker:deposit_field_delete')),
+            (monthly, ('tracker:monthly_shopping_update', 'tracker:monthly_shopping_delete')),
+            (meal, ('tracker:meal_update', 'tracker:meal_update_request')),
+            (other_meal, ('tracker:meal_update_admin',)),
+        )
+        for row, names in by_row:
+            if row is not None:
+                url_kwargs.update({name: {'slug': row.slug} for name in names})
+        return url_kwargs
+
+    def changing_views(self, member):
+        """
+        Row factories of the views whose GET changes data or works on rows
+        the room may not have, see check_query_budgets(changing=...).
+        """
+        today   = datetime.date.today()
+        other   = Membership.objects.filter(room=member.room).exclude(pk=member.pk).order_by('pk').first()
+        if other is None:
+            return {}
+
+        def meal_of(membership):
+            meal = Meal.objects.filter(member=membership, meal_date=today).order_by('pk').last()
+            if meal is None:
+                meal = Meal.objects.create(
+                    member=membership, meal_date=today, meal_today=Decimal('1.00'), meal_next_day=Decimal('1.00'),
+                    confirmed_by=membership, slug='%s-budget-meal' % membership.slug
+                )
+            return meal
+
+        def shopping():
+            return {'slug': Shopping.objects.create(
+                created_by=member, item='budget', cost=Decimal('1.00'), shop_type=Shopping.INDIVIDUAL,
+                date=datetime.datetime.now(), slug='%s-budget-shopping' % member.slug
+            ).slug}
+
+        def own_meal_request():
+            return {'slug': MealUpdateRequest.objects.create(
+                member=member, slug=meal_of(member).slug, meal_should_be=Decimal('2.00'), request_to=other
+            ).slug}
+
+        def meal_request_to_member():
+            return {'slug': MealUpdateRequest.objects.create(
+                member=other, slug=meal_of(other).slug, meal_should_be=Decimal('2.00'), request_to=member
+            ).slug}
+
+        def member_request():
+            user = get_user_model().objects.create_user(username='%s-budget-request' % member.slug, password=None)
+            return {'slug': MemberRequest.objects.create(
+                user=user, room=member.room, slug='%s-budget-request' % member.slug
+            ).slug}
+
+        def room_member_request():
+            member_request()
+            return {'slug': member.room.slug}
+
+        return {
+            'tracker:shopping_update'               : shopping,
+            'tracker:shopping_delete'               : shopping,
+            'tracker:meal_update_request_cancel'    : own_meal_request,
+            'tracker:meal_update_request_confirm'   : meal_request_to_member,
+            'tracker:meal_update_request_deny'      : meal_request_to_member,
+            'memberships:member_request_confirm'    : member_request,
+            'memberships:member_request_delete'     : member_request,
+            'memberships:member_request_delete_all' : room_member_request,
+            'memberships:member_delete'             : lambda: {'slug': other.slug},
+        }
@@ -0,0 +1,28 @@
+import sqlite3
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+from utils.routers import REPLICA_DB_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary database over the SQLite replica, standing in for the "
+        "replication when both are local files (see the Read Replica settings)."
+    )
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("There is no '%s' database in DATABASES." % REPLICA_DB_ALIAS)
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[REPLICA_DB_ALIAS]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError("Only SQLite databases can be copied, a real replica follows the primary itself.")
+        replica.close()
+        primary.ensure_connection()
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(self.style.SUCCESS(
+            "Copied %s to %s." % (primary.settings_dict['NAME'], replica.settings_dict['NAME'])
+        ))
@@ -0,0 +1,70 @@
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from .profiling import QueryRecorder, query_report, UNRESOLVED
+from . import routers
+
+
+class QueryProfileMiddleware(object):
+    """
+    Records the statement count, database time, repeated statements and
+    the remaining (python and template) time of every request under its
+    url name in `query_report`. Staff users get the numbers of their own
+    request as X-Query-* response headers.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        total_time  = time.perf_counter() - start
+        match       = request.resolver_match
+        view_name   = match.view_name if match is not None and match.url_name else UNRESOLVED
+        query_report.add(view_name, recorder, total_time)
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and user.is_staff:
+            response['X-Query-View']        = view_name
+            response['X-Query-Count']       = recorder.count
+            response['X-Query-Duplicates']  = recorder.duplicates
+            response['X-Query-Similar']     = recorder.similar
+            response['X-Query-Time-Ms']     = '%.3f' % (recorder.db_time * 1000)
+            response['X-Render-Time-Ms']    = '%.3f' % (max(total_time - recorder.db_time, 0) * 1000)
+        return response
+
+
+class ReplicaMiddleware(object):
+    """
+    Turns on replica reads (utils.routers) for the views opted in with
+    `replica_reads`, unless the user wrote something within the last
+    REPLICA_STICKY_SECONDS: a request that writes pins its user to the
+    primary, so the redirect after e.g. a meal update shows the new data.
+    """
+    def __init__(self, get_response):
+        if not routers.replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.start_request()
+        try:
+            response = self.get_response(request)
+            user = getattr(request, 'user', None)
+            if routers.request_wrote() and user is not None and user.is_authenticated:
+                routers.pin_to_primary(user.pk)
+        finally:
+            routers.start_request()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not routers.view_reads_from_replica(view_func):
+            return None
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and routers.pinned_to_primary(user.pk):
+            return None
+        routers.use_replica()
+        return None
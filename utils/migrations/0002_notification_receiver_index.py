@@ -0,0 +1,17 @@
+# Generated by Django 2.1.3 on 2026-10-18 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['receiver', 'updated_at'], name='notification_receiver_upd_idx'),
+        ),
+    ]
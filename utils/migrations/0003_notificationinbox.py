@@ -0,0 +1,47 @@
+# Generated by Django 2.1.3 on 2026-10-18 19:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def count_unread(apps, schema_editor):
+    Notification        = apps.get_model('utils', 'Notification')
+    NotificationInbox   = apps.get_model('utils', 'NotificationInbox')
+    counts              = Notification.objects.filter(
+        is_read=False, receiver__isnull=False
+    ).order_by().values('receiver').annotate(total=Count('id'))
+    NotificationInbox.objects.bulk_create([
+        NotificationInbox(profile_id=row['receiver'], unread=row['total']) for row in counts
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('utils', '0002_notification_receiver_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationInbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread', models.PositiveIntegerField(default=0, verbose_name='unread')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_inbox', to='accounts.UserProfile', verbose_name='profile')),
+            ],
+            options={
+                'verbose_name': 'Notification Inbox',
+                'verbose_name_plural': 'Notification Inboxes',
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='is_read',
+            field=models.BooleanField(default=False, verbose_name='is read'),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.1.3 on 2026-10-18 19:38
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def merge_duplicates(apps, schema_editor):
+    Notification        = apps.get_model('utils', 'Notification')
+    NotificationInbox   = apps.get_model('utils', 'NotificationInbox')
+    Notification.objects.filter(identifier__isnull=True).update(identifier='')
+    kept                = {}
+    for notification in Notification.objects.order_by('-updated_at', '-id'):
+        key     = (notification.sender_id, notification.receiver_id, notification.notify_type, notification.identifier)
+        newest  = kept.get(key)
+        if newest is None:
+            kept[key] = notification
+            continue
+        newest.counter  = min(newest.counter + notification.counter, 32767)
+        newest.is_read  = newest.is_read and notification.is_read
+        notification.delete()
+        Notification.objects.filter(pk=newest.pk).update(counter=newest.counter, is_read=newest.is_read)
+    counts = Notification.objects.filter(
+        is_read=False, receiver__isnull=False
+    ).order_by().values('receiver').annotate(total=Count('id'))
+    NotificationInbox.objects.all().delete()
+    NotificationInbox.objects.bulk_create([
+        NotificationInbox(profile_id=row['receiver'], unread=row['total']) for row in counts
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('utils', '0003_notificationinbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='notification',
+            unique_together={('sender', 'receiver', 'notify_type', 'identifier')},
+        ),
+    ]
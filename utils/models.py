@@ -1,5 +1,151 @@
-from django.db import models
+import datetime
+from django.db import models, connections, router, transaction, IntegrityError
+from django.db.models import F, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Least
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 from accounts.models import UserProfile
+from accounts.utils import time_str_mix_slug
+
+# the largest counter a PositiveSmallIntegerField holds on every backend
+NOTIFICATION_COUNTER_MAX = 32767
+
+# INSERT ... that adds to the counter of the row with the same
+# (sender, receiver, notify_type, identifier) instead, per backend; the
+# counter stops at NOTIFICATION_COUNTER_MAX
+NOTIFY_UPSERT_SQL = {
+    'mysql': (
+        "INSERT INTO {table} ({columns}) VALUES ({values}) "
+        "ON DUPLICATE KEY UPDATE counter = LEAST(counter + 1, %(max)s), is_read = VALUES(is_read), "
+        "updated_at = VALUES(updated_at), message = COALESCE(VALUES(message), message)"
+    ),
+    'sqlite': (
+        "INSERT INTO {table} ({columns}) VALUES ({values}) "
+        "ON CONFLICT (sender_id, receiver_id, notify_type, identifier) DO UPDATE SET "
+        "counter = MIN(counter + 1, %(max)s), is_read = excluded.is_read, "
+        "updated_at = excluded.updated_at, message = COALESCE(excluded.message, message)"
+    ),
+    'postgresql': (
+        "INSERT INTO {table} ({columns}) VALUES ({values}) "
+        "ON CONFLICT (sender_id, receiver_id, notify_type, identifier) DO UPDATE SET "
+        "counter = LEAST({table}.counter + 1, %(max)s), is_read = excluded.is_read, "
+        "updated_at = excluded.updated_at, message = COALESCE(excluded.message, {table}.message)"
+    ),
+}
+NOTIFY_UPSERT_SQL = {vendor: sql % {'max': NOTIFICATION_COUNTER_MAX} for vendor, sql in NOTIFY_UPSERT_SQL.items()}
+
+
+class NotificationQuerySet(models.query.QuerySet):
+    def unread(self):
+        return self.filter(is_read=False)
+
+    def inbox(self, receiver):
+        return self.filter(receiver=receiver).order_by('-updated_at', '-id')
+
+
+class NotificationManager(models.Manager):
+    def get_queryset(self):
+        return NotificationQuerySet(self.model, using=self._db)
+
+    def inbox(self, receiver):
+        return self.get_queryset().inbox(receiver)
+
+    def notify(self, sender, receiver, notify_type, identifier=None, room_identifier=None, category=None, message=None):
+        """
+        Creates a notification, or coalesces it into the existing one with
+        the same (sender, receiver, notify_type, identifier): its counter
+        goes up by one, it turns unread again and takes the new message if
+        one is given. This is one INSERT ... ON DUPLICATE KEY / ON CONFLICT
+        statement backed by the unique key, so concurrent requests can
+        neither lose an increment nor create a duplicate. The receiver's
+        unread counter is refreshed afterwards.
+        """
+        self.notify_many(sender, [{
+            'receiver'          : receiver,
+            'notify_type'       : notify_type,
+            'identifier'        : identifier,
+            'room_identifier'   : room_identifier,
+            'category'          : category,
+            'message'           : message,
+        }])
+
+    def notify_many(self, sender, notifications):
+        """
+        notify() for a batch of notifications from one sender, given as dicts
+        with the keyword arguments of notify(): one executemany of the upsert
+        and one UPDATE for the unread counters of all receivers.
+        """
+        if not notifications:
+            return
+        now     = datetime.datetime.now()
+        rows    = []
+        for notification in notifications:
+            receiver = notification['receiver']
+            rows.append({
+                'sender_id'         : getattr(sender, 'pk', sender),
+                'receiver_id'       : getattr(receiver, 'pk', receiver),
+                'slug'              : self.notification_slug(receiver),
+                'category'          : notification.get('category'),
+                'notify_type'       : notification['notify_type'],
+                # NULLs never collide in a unique key
+                'identifier'        : notification.get('identifier') or '',
+                'room_identifier'   : notification.get('room_identifier'),
+                'counter'           : 1,
+                'message'           : notification.get('message'),
+                'is_read'           : False,
+                'created_at'        : now,
+                'updated_at'        : now,
+            })
+        db          = router.db_for_write(self.model)
+        connection  = connections[db]
+        sql         = NOTIFY_UPSERT_SQL.get(connection.vendor)
+        if sql is None:
+            for values in rows:
+                self.db_manager(db).coalesce(values)
+        else:
+            quote   = connection.ops.quote_name
+            sql     = sql.format(
+                table=quote(self.model._meta.db_table),
+                columns=', '.join(quote(column) for column in rows[0]),
+                values=', '.join(['%s'] * len(rows[0]))
+            )
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, [list(values.values()) for values in rows])
+        NotificationInbox.objects.db_manager(db).refresh(*{values['receiver_id'] for values in rows})
+
+    def coalesce(self, values):
+        # check-then-write fallback of notify() for backends without upsert
+        key     = {name: values[name] for name in ('sender_id', 'receiver_id', 'notify_type', 'identifier')}
+        changes = {
+            'counter'   : Least(F('counter') + 1, NOTIFICATION_COUNTER_MAX),
+            'is_read'   : False,
+            'updated_at': values['updated_at'],
+        }
+        if values['message'] is not None:
+            changes['message'] = values['message']
+        if self.filter(**key).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                self.bulk_create([self.model(**values)])
+        except IntegrityError:
+            self.filter(**key).update(**changes)
+
+    def notification_slug(self, receiver):
+        if not isinstance(receiver, UserProfile):
+            receiver = UserProfile.objects.select_related('user').get(pk=receiver)
+        return receiver.user.username.lower()+'-'+time_str_mix_slug()
+
+    def mark_read(self, receiver, ids):
+        """
+        Marks notifications of receiver as read with one UPDATE and takes
+        them off the unread counter. Returns the number marked.
+        """
+        marked = self.filter(receiver=receiver, pk__in=ids, is_read=False).update(is_read=True)
+        if marked:
+            NotificationInbox.objects.add(receiver.pk, -marked)
+        return marked
+
 
 class Notification(models.Model):
     sender = models.ForeignKey(
@@ -15,14 +161,120 @@ class Notification(models.Model):
     room_identifier = models.CharField(max_length=200, null=True, blank=True, verbose_name=('room identifier'))
     counter         = models.PositiveSmallIntegerField(default=1, verbose_name=('counter'))
     message         = models.CharField(max_length=200, null=True, blank=True, verbose_name=('message'))
+    is_read         = models.BooleanField(default=False, verbose_name=('is read'))
     created_at      = models.DateTimeField(auto_now_add=True, verbose_name=('created at'))
     updated_at      = models.DateTimeField(auto_now=True, verbose_name=('updated at'))
 
+    objects         = NotificationManager()
+
     class Meta:
         verbose_name        = "Notification"
         verbose_name_plural = "Notifications"
         ordering            = ["updated_at"]
+        indexes             = [models.Index(fields=['receiver', 'updated_at'], name='notification_receiver_upd_idx')]
+        unique_together     = ("sender", "receiver", "notify_type", "identifier")
 
     def __str__(self):
         return self.notify_type
 
+
+class NotificationInboxManager(models.Manager):
+    def add(self, profile_id, delta):
+        """
+        Moves the unread counter of a profile by delta with one UPDATE,
+        creating the inbox on its first notification.
+        """
+        if profile_id is None or not delta:
+            return
+        if delta < 0:
+            self.filter(profile_id=profile_id, unread__gte=-delta).update(unread=F('unread') + delta)
+            return
+        if self.filter(profile_id=profile_id).update(unread=F('unread') + delta):
+            return
+        try:
+            with transaction.atomic():
+                self.create(profile_id=profile_id, unread=delta)
+        except IntegrityError:
+            self.filter(profile_id=profile_id).update(unread=F('unread') + delta)
+
+    def refresh(self, *profile_ids):
+        """
+        Sets the unread counters of profiles from their notifications with a
+        single UPDATE ... SELECT COUNT(*).
+        """
+        profile_ids = {profile_id for profile_id in profile_ids if profile_id is not None}
+        if not profile_ids:
+            return
+        unread = Notification.objects.filter(
+            receiver_id=OuterRef('profile_id'), is_read=False
+        ).order_by().values('receiver_id').annotate(total=Count('id')).values('total')
+        if self.filter(profile_id__in=profile_ids).update(unread=Coalesce(Subquery(unread), 0)) == len(profile_ids):
+            return
+        missing = profile_ids - set(self.filter(profile_id__in=profile_ids).values_list('profile_id', flat=True))
+        for profile_id in missing:
+            try:
+                with transaction.atomic():
+                    self.create(
+                        profile_id=profile_id,
+                        unread=Notification.objects.filter(receiver_id=profile_id, is_read=False).count()
+                    )
+            except IntegrityError:
+                self.filter(profile_id=profile_id).update(unread=Coalesce(Subquery(unread), 0))
+
+    def recount(self, profiles=None):
+        """
+        Recalculates unread counters from the notifications (of the given
+        profiles, all by default). Returns the number of inboxes written.
+        """
+        counts      = Notification.objects.unread().filter(receiver__isnull=False)
+        inboxes     = self.all()
+        if profiles is not None:
+            counts  = counts.filter(receiver__in=profiles)
+            inboxes = inboxes.filter(profile__in=profiles)
+        counts = counts.order_by().values('receiver').annotate(total=Count('id'))
+        with transaction.atomic():
+            inboxes.delete()
+            self.bulk_create([self.model(profile_id=row['receiver'], unread=row['total']) for row in counts])
+        return len(counts)
+
+
+class NotificationInbox(models.Model):
+    profile     = models.OneToOneField(
+        UserProfile, on_delete=models.CASCADE, related_name='notification_inbox', verbose_name=('profile')
+    )
+    unread      = models.PositiveIntegerField(default=0, verbose_name=('unread'))
+    updated_at  = models.DateTimeField(auto_now=True, verbose_name=('updated at'))
+
+    objects     = NotificationInboxManager()
+
+    class Meta:
+        verbose_name        = "Notification Inbox"
+        verbose_name_plural = "Notification Inboxes"
+        ordering            = ["-updated_at"]
+
+    def __str__(self):
+        return str(self.profile)
+
+
+@receiver(pre_save, sender=Notification)
+def remember_unread_receiver(sender, instance, **kwargs):
+    instance._old_unread_receiver = None
+    if instance.pk:
+        old = Notification.objects.filter(pk=instance.pk).values('receiver_id', 'is_read').first()
+        if old and not old['is_read']:
+            instance._old_unread_receiver = old['receiver_id']
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_on_save(sender, instance, **kwargs):
+    new_receiver = None if instance.is_read else instance.receiver_id
+    old_receiver = getattr(instance, '_old_unread_receiver', None)
+    if old_receiver != new_receiver:
+        NotificationInbox.objects.add(old_receiver, -1)
+        NotificationInbox.objects.add(new_receiver, 1)
+
+
+@receiver(post_delete, sender=Notification)
+def update_unread_on_delete(sender, instance, **kwargs):
+    if not instance.is_read:
+        NotificationInbox.objects.add(instance.receiver_id, -1)
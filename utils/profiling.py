@@ -0,0 +1,245 @@
+import threading
+import time
+from contextlib import ExitStack
+from django.db import connections, transaction
+from django.urls import reverse, get_resolver, URLPattern, URLResolver
+
+# views requested without a resolved url name (404s, static files)
+UNRESOLVED = '<unresolved>'
+
+# Declared statement budgets of the views in tracker.urls, rooms.urls and
+# memberships.urls: the count measured by check_query_budgets (cold cache)
+# as the room manager, on both a room of seed_benchmark_data (15 members,
+# three months of data) and the two-member room of
+# utils.tests.QueryBudgetTests, the larger of the two plus a margin of 2
+# statements. Lower a budget together with the change that makes a view
+# cheaper, never raise one to make a check pass.
+QUERY_BUDGETS = {
+    'tracker:tracker_create'               : 15,
+    'tracker:tracker_update'               : 17,
+    'tracker:tracker_delete'               : 15,
+    'tracker:assign_field_to_member'       : 23,
+    'tracker:meal_create'                  : 29,
+    'tracker:meal_update'                  : 41,
+    'tracker:meal_update_admin'            : 21,
+    'tracker:meal_grid'                    : 16,
+    'tracker:shopping_create'              : 21,
+    'tracker:monthly_shopping_create'      : 22,
+    'tracker:monthly_shopping_update'      : 27,
+    'tracker:monthly_shopping_delete'      : 18,
+    'tracker:deposit_field_create'         : 15,
+    'tracker:deposit_field_update'         : 18,
+    'tracker:deposit_field_delete'         : 17,
+    'tracker:deposit_field_assign'         : 24,
+    'tracker:cost_chart'                   : 23,
+    'tracker:meal_chart'                   : 17,
+    'tracker:shopping_chart'               : 24,
+    'tracker:deposit_chart'                : 22,
+    'tracker:analytics'                    : 14,
+    'tracker:chart_data'                   : 10,
+    'tracker:settlement'                   : 21,
+    'tracker:month_close'                  : 14,
+    'rooms:room_create'                    : 13,
+    'rooms:room_update'                    : 17,
+    'rooms:room_list'                      : 20,
+    'rooms:room_detail'                    : 16,
+    'rooms:managerial_setting'             : 26,
+    'memberships:member_update'            : 20,
+    'tracker:meal_update_request'          : 34,
+    'tracker:meal_update_request_cancel'   : 19,
+    'tracker:meal_update_request_confirm'  : 32,
+    'tracker:meal_update_request_deny'     : 22,
+    'tracker:shopping_update'              : 25,
+    'tracker:shopping_delete'              : 17,
+    'tracker:export'                       : 8,
+    'rooms:room_delete'                    : 15,
+    'memberships:member_request_create'    : 10,
+    'memberships:member_request_confirm'   : 30,
+    'memberships:member_request_delete'    : 11,
+    'memberships:member_request_delete_all': 9,
+    'memberships:member_delete'            : 31,
+}
+BUDGETED_NAMESPACES = ('tracker', 'rooms', 'memberships')
+
+
+class QueryRecorder(object):
+    """
+    Counts the statements, database time and repeated statements run on
+    every connection while it is active. A statement is a duplicate when
+    the same SQL ran with the same parameters before, and similar when
+    only the parameters differ (the usual sign of a query in a loop).
+    """
+    def __init__(self):
+        self.count      = 0
+        self.db_time    = 0.0
+        self.duplicates = 0
+        self.similar    = 0
+        self.seen       = set()
+        self.seen_sql   = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.count   += 1
+            try:
+                key = (sql, tuple(params) if params is not None and not many else None)
+                hash(key)
+            except TypeError:
+                key = (sql, repr(params))
+            if key in self.seen:
+                self.duplicates += 1
+            elif sql in self.seen_sql:
+                self.similar += 1
+            self.seen.add(key)
+            self.seen_sql.add(sql)
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+
+class QueryReport(object):
+    """
+    Aggregated request statistics per url name, kept in the memory of the
+    process.
+    """
+    def __init__(self):
+        self.lock   = threading.Lock()
+        self.views  = {}
+
+    def add(self, view_name, recorder, total_time):
+        render_time = max(total_time - recorder.db_time, 0)
+        with self.lock:
+            stats = self.views.setdefault(view_name, {
+                'requests'      : 0,
+                'queries'       : 0,
+                'max_queries'   : 0,
+                'duplicates'    : 0,
+                'similar'       : 0,
+                'db_time'       : 0.0,
+                'max_db_time'   : 0.0,
+                'render_time'   : 0.0,
+                'max_render_time': 0.0,
+            })
+            stats['requests']           += 1
+            stats['queries']            += recorder.count
+            stats['max_queries']        = max(stats['max_queries'], recorder.count)
+            stats['duplicates']         += recorder.duplicates
+            stats['similar']            += recorder.similar
+            stats['db_time']            += recorder.db_time
+            stats['max_db_time']        = max(stats['max_db_time'], recorder.db_time)
+            stats['render_time']        += render_time
+            stats['max_render_time']    = max(stats['max_render_time'], render_time)
+
+    def summary(self):
+        """
+        Per view averages and maxima, times in milliseconds, the views
+        running the most statements first.
+        """
+        with self.lock:
+            views = {name: dict(stats) for name, stats in self.views.items()}
+        rows = []
+        for name, stats in views.items():
+            requests = stats['requests']
+            rows.append({
+                'view'              : name,
+                'requests'          : requests,
+                'mean_queries'      : round(stats['queries'] / requests, 2),
+                'max_queries'       : stats['max_queries'],
+                'budget'            : QUERY_BUDGETS.get(name),
+                'mean_duplicates'   : round(stats['duplicates'] / requests, 2),
+                'mean_similar'      : round(stats['similar'] / requests, 2),
+                'mean_db_ms'        : round(stats['db_time'] * 1000 / requests, 3),
+                'max_db_ms'         : round(stats['max_db_time'] * 1000, 3),
+                'mean_render_ms'    : round(stats['render_time'] * 1000 / requests, 3),
+                'max_render_ms'     : round(stats['max_render_time'] * 1000, 3),
+            })
+        return sorted(rows, key=lambda row: (-row['mean_queries'], row['view']))
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+
+query_report = QueryReport()
+
+
+def budgeted_url_names(namespaces=BUDGETED_NAMESPACES):
+    """
+    (url name, route kwargs) of every view in the given url namespaces.
+    """
+    names       = []
+    resolver    = get_resolver()
+
+    def collect(patterns, namespace):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                collect(pattern.url_patterns, pattern.namespace or namespace)
+            elif isinstance(pattern, URLPattern) and pattern.name and namespace in namespaces:
+                names.append(('%s:%s' % (namespace, pattern.name), sorted(pattern.pattern.converters)))
+    collect(resolver.url_patterns, None)
+    return names
+
+
+def request_view(client, name, kwargs):
+    """
+    GETs a view and reads a streamed response to the end, the statements
+    of a streaming view run while its content is read.
+    """
+    response = client.get(reverse(name, kwargs=kwargs))
+    if response.streaming:
+        for chunk in response.streaming_content:
+            pass
+    return response
+
+
+def check_query_budgets(client, url_kwargs=None, budgets=None, namespaces=BUDGETED_NAMESPACES, changing=None):
+    """
+    Requests (GET) every view of the budgeted namespaces with `client` and
+    raises AssertionError listing the views running more statements than
+    their budget, or having no budget at all. Views whose url takes
+    arguments are only requested when `url_kwargs` has an entry for them,
+    e.g. {'rooms:room_detail': {'slug': room.slug}}.
+
+    `changing` maps the views whose GET changes data to a callable that
+    creates the rows the view works on and returns its route kwargs; the
+    rows and the request run in a transaction that is rolled back, only
+    the request is counted. Returns {url name: statement count} of the
+    requested views.
+    """
+    url_kwargs  = url_kwargs or {}
+    changing    = changing or {}
+    budgets     = budgets or QUERY_BUDGETS
+    counts      = {}
+    failures    = []
+    for name, arguments in budgeted_url_names(namespaces):
+        if name not in budgets:
+            failures.append("%s has no query budget" % name)
+            continue
+        if name in changing:
+            with transaction.atomic():
+                kwargs = changing[name]()
+                with QueryRecorder() as recorder:
+                    request_view(client, name, kwargs)
+                transaction.set_rollback(True)
+        elif arguments and name not in url_kwargs:
+            continue
+        else:
+            with QueryRecorder() as recorder:
+                request_view(client, name, url_kwargs.get(name))
+        counts[name] = recorder.count
+        if recorder.count > budgets[name]:
+            failures.append("%s ran %s queries, its budget is %s (%s duplicates, %s similar)" % (
+                name, recorder.count, budgets[name], recorder.duplicates, recorder.similar
+            ))
+    if failures:
+        raise AssertionError("Query budget exceeded:\n" + "\n".join(failures))
+    return counts
@@ -0,0 +1,126 @@
+import threading
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS    = 'replica'
+# apps whose tables may be read from the replica; sessions, auth and the
+# allauth account tables always come from the primary (a new login is not
+# replicated yet when the next request reads it)
+REPLICA_APP_LABELS  = ('accounts', 'memberships', 'rooms', 'socialaccount', 'tracker', 'utils')
+
+_state = threading.local()
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def reading_from_replica():
+    """
+    True while the running request reads from the replica.
+    """
+    return getattr(_state, 'replica', False) and replica_configured()
+
+
+def replica_reads(view):
+    """
+    Lets a function view read from the replica, e.g.
+
+        @login_required
+        @replica_reads
+        def view(request): ...
+
+    Class based views set `replica_reads = True` instead. Only views that
+    write nothing the user reads back in the same request should opt in;
+    the reads following a write go to the primary all the same.
+    """
+    view.replica_reads = True
+    return view
+
+
+def view_reads_from_replica(view_func):
+    view_class = getattr(view_func, 'view_class', None)
+    return getattr(view_func, 'replica_reads', False) or getattr(view_class, 'replica_reads', False)
+
+
+def pin_key(user_id):
+    return 'replica-pin:%s' % user_id
+
+
+def pin_to_primary(user_id):
+    """
+    Sends the reads of the user to the primary for REPLICA_STICKY_SECONDS,
+    the time the replica is allowed to lag behind.
+    """
+    cache.set(pin_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def pinned_to_primary(user_id):
+    return bool(cache.get(pin_key(user_id)))
+
+
+def start_request():
+    _state.replica  = False
+    _state.wrote    = False
+
+
+def use_replica(active=True):
+    _state.replica = active
+
+
+def request_wrote():
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter(object):
+    """
+    Sends the reads of the views opted in with `replica_reads` to the
+    'replica' database (see utils.middleware.ReplicaMiddleware) and
+    everything else to the primary. Reads inside a transaction or after a
+    write of the request stay on the primary, so read-modify-write code
+    never sees stale rows.
+    Without a 'replica' alias in DATABASES everything uses the primary.
+    """
+    def db_for_read(self, model, **hints):
+        if not reading_from_replica() or model._meta.app_label not in REPLICA_APP_LABELS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # a view that writes reads its own rows back: the rest of the
+        # request reads from the primary
+        _state.wrote    = True
+        _state.replica  = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def replica_stream(rows):
+    """
+    Wraps the iterable of a streaming response so it keeps reading from
+    the replica when the request did: it is only consumed once the view
+    and the middleware have returned.
+    """
+    active = reading_from_replica()
+
+    def stream():
+        iterator = iter(rows)
+        while True:
+            use_replica(active)
+            try:
+                row = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                use_replica(False)
+            yield row
+    return stream()
@@ -0,0 +1,66 @@
+import datetime
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from rooms.models import Room
+from memberships.models import Membership
+from tracker.models import Meal, Shopping, TrackerField, MemberTrack, CashDepositField, CashDepositMember
+
+# small explicit fixtures for the tests, each test creates only the rows it is about
+
+
+def make_room(*usernames, title=None, role=Membership.MEMBER):
+    """
+    A room created by the first user (made its manager by the signals),
+    the other users joining it with `role`. Returns the memberships in the
+    order of `usernames`.
+    """
+    users   = [get_user_model().objects.create_user(username=username, password='password') for username in usernames]
+    room    = Room.objects.create(
+        title=title or '%s room' % usernames[0], slug='%s-room' % usernames[0], creator=users[0]
+    )
+    return [Membership.objects.select_related('user', 'room').get(user=users[0])] + [
+        Membership.objects.create(user=user, room=room, slug=user.username, role=role)
+        for user in users[1:]
+    ]
+
+
+def make_meal(member, date, value, **fields):
+    return Meal.objects.create(
+        member=member, meal_date=date, meal_today=Decimal(value), meal_next_day=Decimal(value), auto_entry=False,
+        confirmed_by=member, slug='%s-%s-%s' % (member.slug, date.strftime("%Y%m%d"), Meal.objects.count()), **fields
+    )
+
+
+def make_shopping(member, date, cost, shop_type=Shopping.INDIVIDUAL):
+    return Shopping.objects.create(
+        created_by=member, item='rice', cost=Decimal(cost), shop_type=shop_type,
+        date=datetime.datetime.combine(date, datetime.time(12)),
+        slug='%s-shopping-%s' % (member.slug, Shopping.objects.count())
+    )
+
+
+def make_cost_sector(room, title, costs, created_at=None):
+    """
+    A cost sector of the room allocated to the members of `costs`
+    ({membership: cost}), backdated to `created_at` when given.
+    """
+    field = TrackerField.objects.create(room=room, title=title, slug='%s-%s' % (room.slug, title.lower()))
+    for member, cost in costs.items():
+        MemberTrack.objects.create(tracker_field=field, member=member, cost=Decimal(cost))
+    if created_at is not None:
+        TrackerField.objects.filter(pk=field.pk).update(created_at=created_at)
+        MemberTrack.objects.filter(tracker_field=field).update(created_at=created_at)
+    return field
+
+
+def make_deposit_field(room, title, amounts=None):
+    """
+    A deposit field of the room (allocated to every member at 0 by the
+    signals), with the amounts of `amounts` ({membership: amount}) saved.
+    """
+    field = CashDepositField.objects.create(room=room, title=title, slug='%s-%s' % (room.slug, title.lower()))
+    for member, amount in (amounts or {}).items():
+        deposit         = CashDepositMember.objects.get(deposit_field=field, member=member)
+        deposit.amount  = Decimal(amount)
+        deposit.save()
+    return field
@@ -1,3 +1,101 @@
+import datetime
+import io
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from memberships.models import Membership
+from tracker.models import Shopping, MealSchedule
+from .models import Notification, NotificationInbox, NOTIFICATION_COUNTER_MAX
+from .testing import make_room, make_meal, make_shopping, make_cost_sector, make_deposit_field
+from . import routers
+from .routers import ReplicaRouter
 
-# Create your tests here.
+
+@mock.patch('utils.routers.replica_configured', return_value=True)
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        routers.start_request()
+        self.addCleanup(routers.start_request)
+
+    def test_write_sends_the_following_reads_to_the_primary(self, configured):
+        routers.use_replica()
+        self.assertTrue(routers.reading_from_replica())
+        ReplicaRouter().db_for_write(get_user_model())
+        self.assertTrue(routers.request_wrote())
+        self.assertFalse(routers.reading_from_replica())
+
+    def test_meal_chart_writes_nothing(self, configured):
+        manager, member = make_room('manager', 'member')
+        make_meal(manager, datetime.date.today(), '2.00')
+        # an auto entry with today pending, the chart shows it without writing
+        MealSchedule.objects.create(member=member, value=Decimal('1.00'), start_date=datetime.date.today())
+        self.client.force_login(member.user)
+        with mock.patch.object(ReplicaRouter, 'db_for_write', return_value='default') as db_for_write:
+            self.assertEqual(self.client.get(reverse('tracker:meal_chart')).status_code, 200)
+        self.assertEqual(db_for_write.call_args_list, [])
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # one row of every kind check_query_budgets requests a view for
+        cls.manager, cls.member = make_room('manager', 'member', role=Membership.SUPERVISOR)
+        today = datetime.date.today()
+        for membership in (cls.manager, cls.member):
+            make_meal(membership, today, '2.00')
+            make_shopping(membership, today, '120.00')
+        make_shopping(cls.manager, today, '800.00', shop_type=Shopping.MANAGERIAL)
+        make_cost_sector(cls.manager.room, 'Rent', {cls.manager: '300.00', cls.member: '200.00'})
+        make_deposit_field(cls.manager.room, 'Cash', {cls.manager: '500.00', cls.member: '400.00'})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_views_stay_within_their_query_budget(self):
+        out = io.StringIO()
+        call_command('check_query_budgets', 'manager', stdout=out)
+        self.assertIn('tracker:cost_chart', out.getvalue())
+        self.assertIn('within budget', out.getvalue())
+
+
+class NotificationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager, cls.member = make_room('manager', 'member')
+        cls.sender, cls.receiver = cls.manager.user.profile, cls.member.user.profile
+
+    def notify(self, message=None):
+        Notification.objects.notify(self.sender, self.receiver, 'meal_request', identifier='meal-1', message=message)
+
+    def unread(self):
+        return NotificationInbox.objects.get(profile=self.receiver).unread
+
+    def assert_coalesces(self):
+        self.notify('first')
+        self.notify()
+        notification = Notification.objects.get(receiver=self.receiver)
+        self.assertEqual((notification.counter, notification.message), (2, 'first'))
+        self.assertEqual(self.unread(), 1)
+
+        self.assertEqual(Notification.objects.mark_read(self.receiver, [notification.pk]), 1)
+        self.assertEqual(self.unread(), 0)
+        self.notify('second')
+        notification.refresh_from_db()
+        self.assertEqual((notification.counter, notification.is_read, notification.message), (3, False, 'second'))
+        self.assertEqual(self.unread(), 1)
+
+        Notification.objects.filter(pk=notification.pk).update(counter=NOTIFICATION_COUNTER_MAX)
+        self.notify()
+        notification.refresh_from_db()
+        self.assertEqual(notification.counter, NOTIFICATION_COUNTER_MAX)
+
+    def test_notify_coalesces_into_one_row(self):
+        self.assert_coalesces()
+
+    def test_coalesce_fallback_without_upsert(self):
+        with mock.patch.dict('utils.models.NOTIFY_UPSERT_SQL', clear=True):
+            self.assert_coalesces()
@@ -2,9 +2,11 @@ from django.urls import path
 from .views import (
     notification_delete,
     NotificationListView,
+    query_report_view,
 )
 
 urlpatterns = [
     path('notification/<slug>/remove/', notification_delete, name='notification_delete'),
-    path('notification/all/', NotificationListView.as_view(), name='notification_list')
-]
\ No newline at end of file
+    path('notification/all/', NotificationListView.as_view(), name='notification_list'),
+    path('queries/report/', query_report_view, name='query_report'),
+]
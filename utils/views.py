@@ -1,9 +1,12 @@
 from django.shortcuts import render
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from utils.models import Notification
+from .inbox import inbox_page
+from .profiling import query_report
 from django.views.generic import ListView
 from accounts.models import UserProfile
 
@@ -21,15 +24,40 @@ def notification_delete(request, slug):
 
 class NotificationListView(ListView):
     template_name       = 'notifications/list.html'
-    paginate_by         = 4
+    page_size           = 4
     model               = Notification
     # context_object_name = 'objects'
 
     def get_queryset(self, *args, **kwargs):
-        request = self.request
-        user_profile = UserProfile.objects.filter(user=request.user)
-        if user_profile.exists():
-            user_instance = UserProfile.objects.get(user=request.user)
-            query   = Notification.objects.filter(receiver=user_instance).order_by('-updated_at')
-        return query
+        request     = self.request
+        self.page   = None
+        if not request.user.is_authenticated:
+            return Notification.objects.none()
+        user_profile = UserProfile.objects.filter(user=request.user).first()
+        if user_profile is None:
+            return Notification.objects.none()
+        self.page = inbox_page(
+            user_profile, self.page_size, before=request.GET.get('before'), after=request.GET.get('after')
+        )
+        # showing a notification in the list reads it
+        Notification.objects.mark_read(
+            user_profile, [notification.pk for notification in self.page.notifications if not notification.is_read]
+        )
+        return self.page.notifications
 
+    def get_context_data(self, *args, **kwargs):
+        context         = super(NotificationListView, self).get_context_data(*args, **kwargs)
+        context['page'] = self.page
+        return context
+
+
+@staff_member_required
+def query_report_view(request):
+    """
+    Statement counts and timings per view collected by this process,
+    ?reset=1 starts a new collection.
+    """
+    views = query_report.summary()
+    if request.GET.get('reset'):
+        query_report.reset()
+    return JsonResponse({'views': views})